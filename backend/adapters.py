@@ -0,0 +1,195 @@
+"""Low-rank (LoRA) adapters over a frozen, shared base encoder.
+
+An adapter job trains only rank-``r`` updates ``B @ A`` of the attention query
+and value projections, plus the entity and intent heads. It saves those in
+``adapter/`` (a few MB) instead of a full encoder copy. For serving, one base
+encoder holds the adapters of many jobs stacked together. Each batch row picks
+its adapter, so requests for different jobs share one encoder pass.
+"""
+
+import os
+import json
+import math
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+ADAPTER_FILE = "adapter.json"
+WEIGHTS_FILE = "adapter.safetensors"
+
+DEFAULT_RANK = 8
+DEFAULT_ALPHA = 16.0
+# Attention projections that get adapters: DistilBERT names, then BERT names
+TARGET_MODULES = ("q_lin", "v_lin", "query", "value")
+HEAD_PREFIXES = ("token_head.", "intent_pre.", "intent_head.")
+
+
+class LoRALinear(torch.nn.Module):
+    """Frozen ``base`` linear layer plus a trainable low-rank update scaled by ``alpha / rank``"""
+
+    def __init__(self, base: torch.nn.Linear, rank: int, alpha: float):
+        super().__init__()
+        self.base = base
+        self.scaling = alpha / rank
+        self.lora_A = torch.nn.Parameter(torch.empty(rank, base.in_features))
+        # B starts at zero, so training starts from exactly the base model
+        self.lora_B = torch.nn.Parameter(torch.zeros(base.out_features, rank))
+        torch.nn.init.kaiming_uniform_(self.lora_A, a=math.sqrt(5))
+
+    def forward(self, x):
+        return self.base(x) + (x @ self.lora_A.T @ self.lora_B.T) * self.scaling
+
+
+class Routing:
+    """Adapter index of each batch row, shared by all ``MultiLoRALinear`` layers of one encoder"""
+    ids: Optional[torch.Tensor] = None
+
+
+class MultiLoRALinear(torch.nn.Module):
+    """Frozen ``base`` linear layer plus the updates of several adapters, one picked per batch row"""
+
+    def __init__(self, base: torch.nn.Linear, routing: Routing):
+        super().__init__()
+        self.base = base
+        self.routing = routing
+        # (adapters, rank, in) and (adapters, out, rank); scaling is folded into B
+        self.A = None
+        self.B = None
+
+    def forward(self, x):
+        out = self.base(x)
+        if self.A is None:
+            return out
+        ids = self.routing.ids
+        low = torch.einsum("bsi,bri->bsr", x, self.A[ids])
+        return out + torch.einsum("bsr,bor->bso", low, self.B[ids])
+
+
+def _replace(root: torch.nn.Module, name: str, module: torch.nn.Module):
+    parent_name, _, child = name.rpartition(".")
+    setattr(root.get_submodule(parent_name) if parent_name else root, child, module)
+
+
+def _targets(encoder: torch.nn.Module) -> List[str]:
+    return [
+        name for name, module in encoder.named_modules()
+        if isinstance(module, torch.nn.Linear) and name.rpartition(".")[2] in TARGET_MODULES
+    ]
+
+
+def add_adapters(model, rank: int = DEFAULT_RANK, alpha: float = DEFAULT_ALPHA) -> List[str]:
+    """Freeze ``model``'s encoder and wrap its attention projections with trainable adapters"""
+    for param in model.encoder.parameters():
+        param.requires_grad = False
+    names = _targets(model.encoder)
+    if not names:
+        raise ValueError(f"{type(model.encoder).__name__} has no {'/'.join(TARGET_MODULES)} projections for adapters")
+    for name in names:
+        _replace(model.encoder, name, LoRALinear(model.encoder.get_submodule(name), rank, alpha))
+    return names
+
+
+def save_adapter(model, path: str, base_model: str, rank: int, alpha: float):
+    """Write the adapter and head weights of ``model`` to ``path``; the encoder stays with ``base_model``"""
+    from safetensors.torch import save_file
+    os.makedirs(path, exist_ok=True)
+    tensors = {
+        key: value.contiguous() for key, value in model.state_dict().items()
+        if ".lora_" in key or key.startswith(HEAD_PREFIXES)
+    }
+    save_file(tensors, os.path.join(path, WEIGHTS_FILE))
+    with open(os.path.join(path, ADAPTER_FILE), "w") as f:
+        json.dump({
+            "base_model": base_model,
+            "rank": rank,
+            "alpha": alpha,
+            "num_tags": model.num_tags,
+            "num_intents": model.num_intents
+        }, f, indent=2)
+
+
+def load_adapter(path: str) -> Tuple[Dict, Dict[str, torch.Tensor]]:
+    from safetensors.torch import load_file
+    with open(os.path.join(path, ADAPTER_FILE)) as f:
+        meta = json.load(f)
+    return meta, load_file(os.path.join(path, WEIGHTS_FILE))
+
+
+def load_merged(path: str):
+    """Standalone joint model of one adapter job, with the adapter merged into the base weights"""
+    from joint_model import JointModel
+    meta, tensors = load_adapter(path)
+    model = JointModel.from_encoder(meta["base_model"], meta["num_tags"], meta["num_intents"])
+    scaling = meta["alpha"] / meta["rank"]
+    with torch.no_grad():
+        for key, lora_A in tensors.items():
+            if key.endswith(".lora_A"):
+                layer = model.get_submodule(key[:-len(".lora_A")])
+                layer.weight += tensors[key[:-len("A")] + "B"] @ lora_A * scaling
+    model.load_state_dict({k: v for k, v in tensors.items() if k.startswith(HEAD_PREFIXES)}, strict=False)
+    return model.eval()
+
+
+class AdapterHost:
+    """One base encoder serving the adapters and heads of many jobs, mixed within a batch"""
+
+    def __init__(self, base_model: str):
+        from transformers import AutoModel
+        self.base_model = base_model
+        self.encoder = AutoModel.from_pretrained(base_model).eval()
+        self.routing = Routing()
+        self.layers = {}
+        for name in _targets(self.encoder):
+            layer = MultiLoRALinear(self.encoder.get_submodule(name), self.routing)
+            _replace(self.encoder, name, layer)
+            # Adapter weights are saved with the joint model's "encoder." prefix
+            self.layers[f"encoder.{name}"] = layer
+        # job_id -> (heads, adapter weights per layer); stacking order is the insertion order
+        self.adapters = {}
+
+    def load(self, job_id: str, path: str):
+        meta, tensors = load_adapter(path)
+        if meta["base_model"] != self.base_model:
+            raise ValueError(f"Adapter of job {job_id} needs base model {meta['base_model']}, not {self.base_model}")
+        scaling = meta["alpha"] / meta["rank"]
+        weights = {
+            name: (tensors[f"{name}.lora_A"], tensors[f"{name}.lora_B"] * scaling)
+            for name in self.layers
+        }
+        heads = torch.nn.ModuleDict({
+            "token_head": torch.nn.Linear(self.encoder.config.hidden_size, meta["num_tags"]),
+            "intent_pre": torch.nn.Linear(self.encoder.config.hidden_size, self.encoder.config.hidden_size),
+            "intent_head": torch.nn.Linear(self.encoder.config.hidden_size, meta["num_intents"]),
+        })
+        heads.load_state_dict({k: v for k, v in tensors.items() if k.startswith(HEAD_PREFIXES)})
+        self.adapters[job_id] = (heads.eval(), weights)
+        self._stack()
+
+    def unload(self, job_id: str):
+        if self.adapters.pop(job_id, None) is not None:
+            self._stack()
+
+    def _stack(self):
+        """Rebuild every layer's adapter stack, zero-padding lower ranks to the highest one"""
+        if not self.adapters:
+            for layer in self.layers.values():
+                layer.A = layer.B = None
+            return
+        for name, layer in self.layers.items():
+            pairs = [weights[name] for _, weights in self.adapters.values()]
+            rank = max(A.shape[0] for A, _ in pairs)
+            layer.A = torch.stack([torch.nn.functional.pad(A, (0, 0, 0, rank - A.shape[0])) for A, _ in pairs])
+            layer.B = torch.stack([torch.nn.functional.pad(B, (0, rank - B.shape[1])) for _, B in pairs])
+
+    def logits(self, job_ids: List[str], input_ids, attention_mask):
+        """Token and intent logits per row; row ``i`` goes through the adapter and heads of ``job_ids[i]``"""
+        order = list(self.adapters)
+        self.routing.ids = torch.tensor([order.index(job_id) for job_id in job_ids])
+        hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        token_logits, intent_logits = [], []
+        for i, job_id in enumerate(job_ids):
+            heads, _ = self.adapters[job_id]
+            token_logits.append(heads["token_head"](hidden[i]))
+            pooled = torch.relu(heads["intent_pre"](hidden[i, 0]))
+            intent_logits.append(heads["intent_head"](pooled))
+        return token_logits, intent_logits
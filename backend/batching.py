@@ -0,0 +1,103 @@
+"""Training batches cut down from the encoded dataset.
+
+The encoded dataset stores every example right-padded to
+``max_sequence_length``, while most utterances are far shorter. Batches only
+keep what they need:
+
+- ``length_grouped_order`` orders an epoch so each batch holds examples of similar length
+- ``collate`` trims a batch to its longest example (dynamic padding)
+- ``collate(..., pack=True)`` concatenates several examples into each row, with a
+  block-diagonal attention mask so they cannot attend to one another
+"""
+
+from typing import Dict, List, Tuple
+
+import torch
+
+# Batches sorted together when grouping by length; larger groups pad less but mix examples less
+GROUP_BATCHES = 50
+
+
+def sequence_lengths(data: Dict) -> torch.Tensor:
+    return data["attention_mask"].sum(dim=1)
+
+
+def length_grouped_order(indices: torch.Tensor, lengths: torch.Tensor, batch_size: int,
+                         group_batches: int = GROUP_BATCHES) -> torch.Tensor:
+    """Shuffled ``indices`` arranged so that each consecutive ``batch_size`` slice has similar lengths.
+
+    Examples are sorted by length within random groups of ``group_batches``
+    batches, then the full batches are shuffled so an epoch doesn't run from
+    long to short examples. A final partial batch stays last.
+    """
+    order = indices[torch.randperm(len(indices))]
+    group = batch_size * group_batches
+    order = torch.cat([
+        chunk[torch.argsort(lengths[chunk], descending=True, stable=True)]
+        for chunk in order.split(group)
+    ])
+    full = len(order) // batch_size
+    batches = order[:full * batch_size].view(full, batch_size)[torch.randperm(full)]
+    return torch.cat([batches.reshape(-1), order[full * batch_size:]])
+
+
+def collate(data: Dict, idx: torch.Tensor, pack: bool = False) -> Tuple[Dict, int, int]:
+    """Model inputs for the examples ``idx``, plus their real and their padded token counts"""
+    lengths = sequence_lengths({"attention_mask": data["attention_mask"][idx]})
+    if pack:
+        return _pack(data, idx, lengths)
+    width = int(lengths.max())
+    batch = {k: v[idx][:, :width] if v.dim() == 2 else v[idx] for k, v in data.items()}
+    return batch, int(lengths.sum()), len(idx) * width
+
+
+def _pack_rows(lengths: List[int], row_length: int) -> List[List[int]]:
+    """First-fit decreasing: longest examples first, each into the first row with room for it"""
+    rows, room = [], []
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        for r, free in enumerate(room):
+            if lengths[i] <= free:
+                rows[r].append(i)
+                room[r] -= lengths[i]
+                break
+        else:
+            rows.append([i])
+            room.append(row_length - lengths[i])
+    return rows
+
+
+def _pack(data: Dict, idx: torch.Tensor, lengths: torch.Tensor) -> Tuple[Dict, int, int]:
+    lengths = lengths.tolist()
+    rows = _pack_rows(lengths, data["input_ids"].shape[1])
+    width = max(sum(lengths[i] for i in row) for row in rows)
+    input_ids = torch.zeros(len(rows), width, dtype=torch.long)
+    labels = torch.full((len(rows), width), -100, dtype=torch.long)
+    position_ids = torch.zeros(len(rows), width, dtype=torch.long)
+    # 1-based example number per position, 0 for padding
+    segments = torch.zeros(len(rows), width, dtype=torch.long)
+    # Row and offset of each example's [CLS] token, in ``idx`` order like the intent labels
+    cls_index = torch.zeros(len(idx), 2, dtype=torch.long)
+    for r, row in enumerate(rows):
+        offset = 0
+        for segment, i in enumerate(row, start=1):
+            n = lengths[i]
+            input_ids[r, offset:offset + n] = data["input_ids"][idx[i], :n]
+            labels[r, offset:offset + n] = data["labels"][idx[i], :n]
+            position_ids[r, offset:offset + n] = torch.arange(n)
+            segments[r, offset:offset + n] = segment
+            cls_index[i] = torch.tensor([r, offset])
+            offset += n
+
+    # Additive (batch, 1, query, key) mask: a token only attends to tokens of its own example
+    visible = (segments[:, :, None] == segments[:, None, :]) & (segments[:, None, :] > 0)
+    attention_mask = torch.zeros(visible.shape, dtype=torch.float32)
+    attention_mask.masked_fill_(~visible, torch.finfo(torch.float32).min)
+    batch = {
+        "input_ids": input_ids,
+        "attention_mask": attention_mask[:, None],
+        "position_ids": position_ids,
+        "labels": labels,
+        "intent_labels": data["intent_labels"][idx],
+        "cls_index": cls_index,
+    }
+    return batch, sum(lengths), len(rows) * width
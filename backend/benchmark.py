@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the training, inference, API and LLM layers.
+
+Results are written as JSON together with a description of the machine, and
+can be compared against an earlier run to flag regressions:
+
+    python benchmark.py --output results.json
+    python benchmark.py --only training,predict --baseline results.json
+
+The exit code is 1 when a metric regressed by more than ``--tolerance`` or
+the API process starts slower or bigger than its budget.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import datetime
+import tempfile
+import subprocess
+from typing import Callable, Dict, List
+
+SECTIONS = ("startup", "tokenization", "training", "batching", "predict", "api", "llm")
+
+# Metric name suffixes and whether a larger value is better
+HIGHER_IS_BETTER = ("_per_sec",)
+LOWER_IS_BETTER = ("_ms", "_seconds", "_mb")
+
+# Modules that must stay out of the API process until a prediction or LLM call needs them
+DEFERRED_MODULES = ("torch", "transformers", "onnxruntime", "pyarrow", "openai", "anthropic")
+
+# Run in a fresh interpreter, so nothing imported by the benchmark itself is counted
+STARTUP_SCRIPT = """
+import sys, json, time
+start = time.perf_counter()
+import main
+seconds = time.perf_counter() - start
+from metrics import process_rss_bytes
+print(json.dumps({
+    "import_seconds": seconds,
+    "rss_mb": process_rss_bytes() / 2 ** 20,
+    "loaded": [name for name in %r if name in sys.modules]
+}))
+"""
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_stats(samples_ms: List[float]) -> Dict:
+    return {
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "mean_ms": round(sum(samples_ms) / len(samples_ms), 3)
+    }
+
+
+def timed(fn: Callable, repeats: int, warmup: int = 1) -> List[float]:
+    """Wall time of each call in milliseconds, after ``warmup`` untimed calls"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def machine_info() -> Dict:
+    info = {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+    try:
+        info["memory_mb"] = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        pass
+    for module in ("torch", "transformers", "tokenizers", "fastapi"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    return info
+
+
+def _preset_examples(count: int) -> tuple:
+    """Training examples from the built-in presets, repeated up to ``count``"""
+    from presets import PRESET_DATA
+    from training_worker import build_examples
+    preset = PRESET_DATA[sorted(PRESET_DATA)[0]]
+    examples = build_examples(preset["entities"], preset["intents"])
+    return (examples * (count // len(examples) + 1))[:count], preset
+
+
+def bench_startup(args) -> Dict:
+    """Import time and resident memory of the API process, checked against the startup budget"""
+    env = dict(os.environ, JOB_STORE="memory")
+    samples = []
+    for _ in range(args.repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT % (DEFERRED_MODULES,)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    import_seconds = min(sample["import_seconds"] for sample in samples)
+    rss_mb = max(sample["rss_mb"] for sample in samples)
+    loaded = sorted({name for sample in samples for name in sample["loaded"]})
+
+    violations = []
+    if import_seconds > args.startup_budget_seconds:
+        violations.append(f"import took {import_seconds:.2f}s, budget {args.startup_budget_seconds}s")
+    if rss_mb > args.startup_rss_budget_mb:
+        violations.append(f"RSS is {rss_mb:.0f} MB, budget {args.startup_rss_budget_mb} MB")
+    if loaded:
+        violations.append(f"imported at startup: {', '.join(loaded)}")
+    return {
+        "import_seconds": round(import_seconds, 3),
+        "rss_mb": round(rss_mb, 1),
+        "deferred_modules_loaded": loaded,
+        "budget_violations": violations
+    }
+
+
+def bench_tokenization(args) -> Dict:
+    """Raw tokenizer throughput and the label-aligned encoding used by training"""
+    from dataset_cache import get_tokenizer
+    from training_worker import _encode
+    tokenizer = get_tokenizer(args.model_base)
+    examples, preset = _preset_examples(args.tokenize_examples)
+    tag_names = ["O"] + [f"{p}-{e['name']}" for e in preset["entities"] for p in ("B", "I")]
+    tag2id = {tag: i for i, tag in enumerate(tag_names)}
+    intent2id = {intent["name"]: i for i, intent in enumerate(preset["intents"])}
+    texts = [" ".join(ex["tokens"]) for ex in examples]
+
+    raw = timed(lambda: tokenizer(texts, padding="longest", truncation=True, max_length=128), args.repeats)
+    encode = timed(lambda: _encode(examples, tokenizer, tag2id, intent2id, 128), args.repeats)
+    return {
+        "tokenizer_texts_per_sec": round(len(texts) / (min(raw) / 1000), 1),
+        "encode_examples_per_sec": round(len(examples) / (min(encode) / 1000), 1),
+        "examples": len(examples)
+    }
+
+
+def bench_training(args) -> Dict:
+    """Optimizer steps per second of the joint model training step for each batch size x sequence length"""
+    import torch
+    from joint_model import JointModel
+    torch.manual_seed(0)
+    results = {}
+    for shape in args.shapes.split(","):
+        batch_size, seq_len = (int(v) for v in shape.lower().split("x"))
+        model = JointModel.from_encoder(args.model_base, num_tags=9, num_intents=4)
+        params = list(model.parameters())
+        optimizer = torch.optim.AdamW(params, lr=2e-5)
+        vocab = model.config.vocab_size
+        batch = {
+            "input_ids": torch.randint(0, vocab, (batch_size, seq_len)),
+            "attention_mask": torch.ones(batch_size, seq_len, dtype=torch.long),
+            "labels": torch.randint(0, 9, (batch_size, seq_len)),
+            "intent_labels": torch.randint(0, 4, (batch_size,)),
+        }
+
+        def step():
+            model(**batch).loss.backward()
+            torch.nn.utils.clip_grad_norm_(params, 1.0)
+            optimizer.step()
+            optimizer.zero_grad()
+
+        samples = timed(step, args.train_steps, warmup=2)
+        seconds = sum(samples) / 1000
+        results[f"bs{batch_size}_len{seq_len}"] = {
+            "steps_per_sec": round(len(samples) / seconds, 3),
+            "tokens_per_sec": round(len(samples) * batch_size * seq_len / seconds, 1),
+            "step_p50_ms": round(percentile(samples, 50), 2)
+        }
+    return results
+
+
+def bench_batching(args) -> Dict:
+    """Training throughput on preset examples padded to the max, length-grouped with dynamic padding, and packed"""
+    import torch
+    from dataset_cache import get_tokenizer
+    from joint_model import JointModel
+    from training_worker import _encode
+    from batching import collate, length_grouped_order, sequence_lengths
+    tokenizer = get_tokenizer(args.model_base)
+    examples, preset = _preset_examples(args.tokenize_examples)
+    tag_names = ["O"] + [f"{p}-{e['name']}" for e in preset["entities"] for p in ("B", "I")]
+    tag2id = {tag: i for i, tag in enumerate(tag_names)}
+    intent2id = {intent["name"]: i for i, intent in enumerate(preset["intents"])}
+    data = _encode(examples, tokenizer, tag2id, intent2id, 128)
+    lengths = sequence_lengths(data)
+    batch_size = 16
+    torch.manual_seed(0)
+    model = JointModel.from_encoder(args.model_base, num_tags=len(tag_names), num_intents=len(intent2id))
+    params = list(model.parameters())
+    optimizer = torch.optim.AdamW(params, lr=2e-5)
+    index = torch.arange(len(examples))
+    modes = {
+        "padded": lambda idx: ({k: v[idx] for k, v in data.items()}, int(lengths[idx].sum()), len(idx) * 128),
+        "grouped": lambda idx: collate(data, idx),
+        "packed": lambda idx: collate(data, idx, pack=True),
+    }
+    results = {}
+    for mode, make_batch in modes.items():
+        order = length_grouped_order(index, lengths, batch_size) if mode != "padded" else index[torch.randperm(len(index))]
+        batches = [make_batch(order[i * batch_size:(i + 1) * batch_size]) for i in range(args.train_steps + 2)]
+        counter = iter(batches)
+
+        def step():
+            batch, _, _ = next(counter)
+            model(**batch).loss.backward()
+            torch.nn.utils.clip_grad_norm_(params, 1.0)
+            optimizer.step()
+            optimizer.zero_grad()
+
+        samples = timed(step, args.train_steps, warmup=2)
+        timed_batches = batches[2:]
+        seconds = sum(samples) / 1000
+        real = sum(b[1] for b in timed_batches)
+        results[mode] = {
+            "steps_per_sec": round(len(samples) / seconds, 3),
+            "tokens_per_sec": round(real / seconds, 1),
+            "padding_efficiency": round(real / sum(b[2] for b in timed_batches), 4)
+        }
+    return results
+
+
+def _train_benchmark_model(args, workdir: str) -> str:
+    """Train a one-epoch model on preset data to benchmark prediction against"""
+    from training_worker import train_job
+    _, preset = _preset_examples(1)
+    config = {"epochs": 1, "batch_size": 16, "model_base": args.model_base, "checkpoint_every_steps": 0}
+    result = train_job("benchmark", preset["entities"], preset["intents"], config, workdir)
+    if result.get("status") != "completed":
+        raise RuntimeError(f"Could not train a benchmark model: {result}")
+    return result["model_path"]
+
+
+def bench_predict(args) -> Dict:
+    """Prediction latency percentiles and throughput at several batch sizes"""
+    import torch
+    from inference_service import LoadedModel
+    torch.set_num_threads(int(os.getenv("INFERENCE_THREADS", "4")))
+    with tempfile.TemporaryDirectory() as workdir:
+        model = LoadedModel(args.model_dir or _train_benchmark_model(args, workdir), artifact=args.artifact)
+        examples, _ = _preset_examples(512)
+        texts = [" ".join(ex["tokens"]) for ex in examples]
+        rng = random.Random(0)
+        results = {}
+        for batch_size in (int(v) for v in args.batch_sizes.split(",")):
+            samples = timed(lambda: model.predict_batch(rng.sample(texts, batch_size)), args.predict_repeats, warmup=3)
+            stats = latency_stats(samples)
+            stats["texts_per_sec"] = round(batch_size / (stats["mean_ms"] / 1000), 1)
+            results[f"batch_{batch_size}"] = stats
+    return results
+
+
+def _fake_job(index: int, now: str) -> Dict:
+    status = ("completed", "failed", "stopped", "running")[index % 4]
+    return {
+        "status": status,
+        "progress": 100 if status == "completed" else 40,
+        "epoch": 3,
+        "total_epochs": 3,
+        "loss": 0.1234,
+        "entities": [{"name": f"entity_{i}", "description": "An entity"} for i in range(8)],
+        "intents": [{"name": f"intent_{i}", "description": "An intent"} for i in range(8)],
+        "config": {"epochs": 3, "batch_size": 16, "learning_rate": 2e-5},
+        "metrics": {"val_loss": 0.2, "token_accuracy": 0.95, "intent_accuracy": 0.97},
+        "created_at": now,
+        "stop_requested": False
+    }
+
+
+def bench_api(args) -> Dict:
+    """Latency of the job status endpoints with a large job table"""
+    # Never touch the real job database
+    os.environ["JOB_STORE"] = "memory"
+    from fastapi.testclient import TestClient
+    import main
+
+    store = main.training_service.job_store
+    now = datetime.datetime.now().isoformat()
+    job_ids = []
+    for index in range(args.jobs):
+        job_id = f"bench-{index:07d}"
+        store.create(job_id, _fake_job(index, now))
+        job_ids.append(job_id)
+
+    rng = random.Random(0)
+    results = {"jobs": args.jobs}
+    with TestClient(main.app) as client:
+        endpoints = {
+            "training_status": lambda: client.get(f"/api/training-status/{rng.choice(job_ids)}"),
+            "training_jobs": lambda: client.get("/api/training-jobs"),
+            "training_jobs_running": lambda: client.get("/api/training-jobs", params={"status": "running"}),
+        }
+        for name, call in endpoints.items():
+            response = call()
+            if response.status_code != 200:
+                raise RuntimeError(f"{name} returned HTTP {response.status_code}")
+            results[name] = latency_stats(timed(call, args.api_requests, warmup=10))
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_llm(args) -> Dict:
+    """Time LLMService round trips against a local fake provider with zero simulated latency.
+
+    The same request sent with a bare HTTP client is the reference, so
+    ``overhead_ms`` is what the SDK, retries, semaphore and cache add.
+    """
+    import httpx
+    port = _free_port()
+    env = dict(os.environ, FAKE_LLM_LATENCY_MS="0", FAKE_LLM_ERROR_RATE="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fake_llm_server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{base_url}/stats", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        os.environ.update(OPENAI_BASE_URL=f"{base_url}/v1", OPENAI_API_KEY="fake", LLM_CACHE_SIZE="0")
+        os.environ.pop("LLM_CACHE_DIR", None)
+        from llm_service import LLMService, OPENAI_MODEL
+        return asyncio.run(_bench_llm(args, base_url, LLMService(), OPENAI_MODEL))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+async def _bench_llm(args, base_url: str, llm_service, model: str) -> Dict:
+    import httpx
+    counter = iter(range(10 ** 9))
+
+    def prompt() -> str:
+        # Unique prompts so nothing is served from a cache
+        return f"Benchmark prompt {next(counter)}: return a JSON object with a domain field."
+
+    async def measure(call, repeats: int) -> List[float]:
+        await call()
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            await call()
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": "Bearer fake"}) as client:
+        async def raw_call():
+            payload = {"model": model, "messages": [{"role": "user", "content": prompt()}], "temperature": 0.7}
+            response = await client.post("/v1/chat/completions", json=payload)
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+
+        raw = latency_stats(await measure(raw_call, args.llm_requests))
+        service = latency_stats(await measure(lambda: llm_service._call_llm(prompt(), "openai"), args.llm_requests))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(llm_service._call_llm(prompt(), "openai") for _ in range(args.llm_requests)))
+        concurrent_seconds = time.perf_counter() - start
+    await llm_service.close()
+    return {
+        "raw_http": raw,
+        "llm_service": service,
+        "overhead_ms": round(service["p50_ms"] - raw["p50_ms"], 3),
+        "concurrent_requests_per_sec": round(args.llm_requests / concurrent_seconds, 1)
+    }
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "tokenization": bench_tokenization,
+    "training": bench_training,
+    "batching": bench_batching,
+    "predict": bench_predict,
+    "api": bench_api,
+    "llm": bench_llm,
+}
+
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """Per-metric change against the baseline; ``regressed`` when worse by more than ``tolerance``"""
+    rows = []
+    baseline_flat = flatten(baseline["results"])
+    for name, value in flatten(current["results"]).items():
+        if name not in baseline_flat or not baseline_flat[name]:
+            continue
+        metric = name.rsplit(".", 1)[-1]
+        if metric.endswith(HIGHER_IS_BETTER):
+            worse_by = (baseline_flat[name] - value) / baseline_flat[name]
+        elif metric.endswith(LOWER_IS_BETTER):
+            worse_by = (value - baseline_flat[name]) / baseline_flat[name]
+        else:
+            continue
+        rows.append({
+            "metric": name,
+            "baseline": baseline_flat[name],
+            "current": value,
+            "change_pct": round(-worse_by * 100, 1),
+            "regressed": worse_by > tolerance
+        })
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", default=",".join(SECTIONS), help=f"comma-separated subset of {', '.join(SECTIONS)}")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown before flagging")
+    parser.add_argument("--model-base", default="distilbert-base-uncased")
+    parser.add_argument("--model-dir", help="trained job directory for the predict benchmark (default: train one)")
+    parser.add_argument("--artifact", default="fp32", help="fp32, int8 or onnx weights for the predict benchmark")
+    parser.add_argument("--shapes", default="8x64,16x128,32x128", help="training batch_size x max_sequence_length")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="prediction batch sizes")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--tokenize-examples", type=int, default=5000)
+    parser.add_argument("--train-steps", type=int, default=10)
+    parser.add_argument("--predict-repeats", type=int, default=50)
+    parser.add_argument("--jobs", type=int, default=10000, help="job records present during the API benchmark")
+    parser.add_argument("--api-requests", type=int, default=200)
+    parser.add_argument("--llm-requests", type=int, default=100)
+    parser.add_argument("--startup-budget-seconds", type=float,
+                        default=float(os.getenv("STARTUP_BUDGET_SECONDS", "2")))
+    parser.add_argument("--startup-rss-budget-mb", type=float,
+                        default=float(os.getenv("STARTUP_RSS_BUDGET_MB", "250")))
+    args = parser.parse_args(argv)
+
+    sections = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+
+    report = {
+        "created_at": datetime.datetime.now().isoformat(),
+        "machine": machine_info(),
+        "settings": vars(args),
+        "results": {}
+    }
+    for section in sections:
+        print(f"⏱  {section}...", flush=True)
+        start = time.perf_counter()
+        report["results"][section] = BENCHMARKS[section](args)
+        print(f"   done in {time.perf_counter() - start:.1f}s: {json.dumps(report['results'][section])}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results written to {args.output}")
+
+    violations = report["results"].get("startup", {}).get("budget_violations", [])
+    for violation in violations:
+        print(f"❌ Startup budget: {violation}")
+    if not args.baseline:
+        return 1 if violations else 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine", {}).get("processor") != report["machine"]["processor"] or \
+            baseline.get("machine", {}).get("cpu_count") != report["machine"]["cpu_count"]:
+        print("⚠️  Baseline was recorded on a different machine; differences may not be regressions")
+    rows = compare(report, baseline, args.tolerance)
+    report["comparison"] = {"baseline": args.baseline, "tolerance": args.tolerance, "metrics": rows}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    regressions = [row for row in rows if row["regressed"]]
+    for row in rows:
+        flag = "❌" if row["regressed"] else "  "
+        print(f"{flag} {row['metric']:<55} {row['baseline']:>12} -> {row['current']:>12} ({row['change_pct']:+.1f}%)")
+    print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%} out of {len(rows)} compared metrics")
+    return 1 if regressions or violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
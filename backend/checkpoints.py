@@ -0,0 +1,108 @@
+"""Periodic training checkpoints, written off the training loop.
+
+A checkpoint holds everything needed to continue a job exactly where it left
+off: the joint model (encoder and both heads), the optimizer and LR scheduler,
+the RNG states, the dataset version and the position in the current epoch's
+batch order. The training loop only pays for an in-memory copy of the state;
+serialization and disk I/O happen on a background thread.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+# torch is imported where it is used, so the API process can look up checkpoints without loading it
+
+# Optimizer steps between two checkpoints; 0 disables checkpointing
+CHECKPOINT_EVERY_STEPS = int(os.getenv("CHECKPOINT_EVERY_STEPS", "500"))
+# Checkpoints kept per job, newest first
+CHECKPOINT_KEEP = int(os.getenv("CHECKPOINT_KEEP", "2"))
+
+CHECKPOINT_RE = re.compile(r"^step-(\d+)\.pt$")
+
+
+def checkpoint_dir(model_path: str) -> str:
+    return os.path.join(model_path, "checkpoints")
+
+
+def _checkpoints(directory: str):
+    """(step, path) of every complete checkpoint in ``directory``, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for name in os.listdir(directory):
+        match = CHECKPOINT_RE.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def latest_checkpoint(directory: str) -> Optional[str]:
+    checkpoints = _checkpoints(directory)
+    return checkpoints[-1][1] if checkpoints else None
+
+
+def load_checkpoint(path: str) -> Dict:
+    import torch
+    return torch.load(path, map_location="cpu", weights_only=False)
+
+
+def _cpu_copy(value):
+    """Detached copy of every tensor in a nested state, so training can keep mutating the originals"""
+    import torch
+    if isinstance(value, torch.Tensor):
+        return value.detach().to("cpu", copy=True)
+    if isinstance(value, dict):
+        return {key: _cpu_copy(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_cpu_copy(item) for item in value)
+    return value
+
+
+class CheckpointWriter:
+    """Writes checkpoints on a background thread and keeps the newest ``keep``"""
+
+    def __init__(self, directory: str, keep: int = CHECKPOINT_KEEP):
+        self.directory = directory
+        self.keep = max(1, keep)
+        # Last step handed to save(), and the last step known to be on disk with its snapshot time
+        self.saved_step = None
+        self.latest_step = None
+        self.latest_at = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+
+    def save(self, step: int, state: Dict):
+        """Snapshot ``state`` now and write it in the background"""
+        snapshot = _cpu_copy(state)
+        self.saved_step = step
+        # At most one write in flight: bounds memory to a single extra copy of the state
+        self.wait()
+        self._pending = self._executor.submit(self._write, step, snapshot, time.time())
+
+    def wait(self):
+        """Block until the write in flight is on disk; re-raises its error"""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown()
+
+    def _write(self, step: int, snapshot: Dict, taken_at: float):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"step-{step:08d}.pt")
+        # Atomic rename, so a crash mid-write never leaves a truncated "latest" checkpoint
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        import torch
+        torch.save(snapshot, tmp_path)
+        os.replace(tmp_path, path)
+        for _, old_path in _checkpoints(self.directory)[:-self.keep]:
+            os.remove(old_path)
+        self.latest_step = step
+        self.latest_at = taken_at
@@ -0,0 +1,159 @@
+"""Tokenizer and tokenized-dataset caches shared by training jobs.
+
+Tokenizers are kept per worker process, keyed by ``model_base``. Encoded,
+label-aligned datasets are written once as Arrow IPC files keyed by a
+fingerprint of everything that affects the encoding, and memory-mapped on
+later jobs, so worker processes share the same page cache instead of each
+holding a copy. The cache directory is kept under ``TOKENIZED_CACHE_MAX_MB``
+by deleting the least recently used files after each write.
+"""
+
+import os
+import json
+import time
+import hashlib
+import warnings
+from typing import List, Dict, Tuple
+
+# Optional imports for caching functionality
+try:
+    import torch
+    from transformers import AutoTokenizer
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+
+COLUMNS = ("input_ids", "attention_mask", "labels")
+
+# Size limit of the cache directory; prune_cache deletes the least recently used files beyond it
+CACHE_MAX_BYTES = int(float(os.getenv("TOKENIZED_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+# Temp files this old were left behind by a worker that died mid-write
+STALE_TMP_SECONDS = 3600
+
+# model_base -> (tokenizer, fingerprint)
+_tokenizers = {}
+
+
+def default_cache_dir() -> str:
+    default_dir = os.path.join(os.path.dirname(__file__), "..", "data", "tokenized")
+    return os.getenv("TOKENIZED_CACHE_DIR", default_dir)
+
+
+def get_tokenizer(model_name: str):
+    """Load the tokenizer for ``model_name`` once per process"""
+    if model_name not in _tokenizers:
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if getattr(tokenizer, "is_fast", False):
+            state = tokenizer.backend_tokenizer.to_str()
+        else:
+            state = json.dumps(tokenizer.get_vocab(), sort_keys=True)
+        fingerprint = hashlib.sha256(f"{type(tokenizer).__name__}\n{state}".encode("utf-8")).hexdigest()
+        _tokenizers[model_name] = (tokenizer, fingerprint)
+    return _tokenizers[model_name][0]
+
+
+def dataset_fingerprint(examples: List[Dict], tokenizer, tag_names: List[str], intent_names: List[str], max_length: int) -> str:
+    """Hash of the examples, label sets, tokenizer and max length"""
+    tokenizer_fingerprint = next(
+        (fp for tok, fp in _tokenizers.values() if tok is tokenizer),
+        type(tokenizer).__name__ + getattr(tokenizer, "name_or_path", "")
+    )
+    payload = json.dumps([examples, tag_names, intent_names, tokenizer_fingerprint, max_length], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def prune_cache(cache_dir: str, max_bytes: int = None, keep: str = None):
+    """Delete the least recently used entries until ``cache_dir`` fits in ``max_bytes``; ``keep`` is never deleted.
+
+    Recency is the file's mtime, which cache hits refresh. Workers that still
+    have a deleted file memory-mapped keep reading it.
+    """
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries, total, now = [], 0, time.time()
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Removed by another worker meanwhile
+            continue
+        if name.endswith(".tmp"):
+            if now - stat.st_mtime > STALE_TMP_SECONDS:
+                _remove(path)
+        elif name.endswith(".arrow"):
+            entries.append((stat.st_mtime, path, stat.st_size))
+            total += stat.st_size
+    for _, path, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path != keep:
+            _remove(path)
+            total -= size
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _to_table(data: Dict, max_length: int):
+    arrays = [
+        pa.FixedSizeListArray.from_arrays(pa.array(data[name].reshape(-1).numpy()), max_length)
+        for name in COLUMNS
+    ]
+    arrays.append(pa.array(data["intent_labels"].numpy()))
+    return pa.table(arrays, names=list(COLUMNS) + ["intent_labels"])
+
+
+def _from_table(table, max_length: int) -> Dict:
+    """Zero-copy tensors over the (memory-mapped) Arrow buffers"""
+    data = {}
+    with warnings.catch_warnings():
+        # The mapped buffers are read-only; training only ever indexes into them
+        warnings.simplefilter("ignore", UserWarning)
+        for name in COLUMNS:
+            values = table.column(name).combine_chunks().flatten().to_numpy(zero_copy_only=True)
+            data[name] = torch.from_numpy(values.reshape(-1, max_length))
+        data["intent_labels"] = torch.from_numpy(table.column("intent_labels").combine_chunks().to_numpy(zero_copy_only=True))
+    return data
+
+
+def load_or_encode(encode, examples: List[Dict], tokenizer, tag_names: List[str], intent_names: List[str],
+                   max_length: int, cache_dir: str = None) -> Tuple[Dict, bool]:
+    """Return ``(data, cache_hit)``, where ``data`` is read from the on-disk cache or built with ``encode()``"""
+    cache_dir = cache_dir or default_cache_dir()
+    if not ARROW_AVAILABLE or not cache_dir:
+        return encode(), False
+
+    fingerprint = dataset_fingerprint(examples, tokenizer, tag_names, intent_names, max_length)
+    path = os.path.join(cache_dir, f"{fingerprint}.arrow")
+    if os.path.exists(path):
+        try:
+            table = ipc.open_file(pa.memory_map(path, "r")).read_all()
+            # Mark it recently used for prune_cache
+            os.utime(path)
+            return _from_table(table, max_length), True
+        except (OSError, pa.ArrowInvalid):
+            # Corrupt or truncated entry: rebuild it below
+            pass
+
+    data = encode()
+    os.makedirs(cache_dir, exist_ok=True)
+    table = _to_table(data, max_length)
+    # Unique temp name, then an atomic rename, so concurrent workers never see partial files
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with ipc.new_file(tmp_path, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    prune_cache(cache_dir, keep=path)
+    return data, False
@@ -0,0 +1,113 @@
+"""Knowledge distillation of a trained joint model into smaller students.
+
+A student keeps the teacher's architecture with fewer layers and optionally a
+smaller hidden size. When the hidden size is kept, the student starts from the
+teacher's embeddings, an evenly spaced subset of its layers and its heads
+(layer pruning). It is then trained on the job's data with three losses:
+
+- the hard entity and intent labels
+- the teacher's temperature-softened tag and intent distributions
+- the teacher's hidden states at the layers each student layer stands in for
+"""
+
+import copy
+from typing import Dict, List, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+
+from joint_model import JointModel, JointOutput
+
+# Defaults of the distillation settings in a training config
+DEFAULT_TEMPERATURE = 2.0
+# Share of the hard-label loss; the soft-label loss gets the rest
+DEFAULT_ALPHA = 0.5
+DEFAULT_HIDDEN_WEIGHT = 1.0
+
+
+def student_name(spec: Dict) -> str:
+    name = f"L{spec['layers']}"
+    if spec.get("hidden_size"):
+        name += f"-H{spec['hidden_size']}"
+    return name
+
+
+def layer_map(teacher_layers: int, student_layers: int) -> List[int]:
+    """Teacher layer imitated by each student layer: evenly spaced, always ending with the last one"""
+    if student_layers == 1:
+        return [teacher_layers - 1]
+    return [round(i * (teacher_layers - 1) / (student_layers - 1)) for i in range(student_layers)]
+
+
+def build_student(teacher: JointModel, layers: int, hidden_size: Optional[int] = None) -> Tuple[JointModel, List[int]]:
+    """Student with ``layers`` layers (and ``hidden_size``), plus the teacher layer each one maps to"""
+    teacher_layers = teacher.config.num_hidden_layers
+    if not 1 <= layers <= teacher_layers:
+        raise ValueError(f"Students need 1 to {teacher_layers} layers, got {layers}")
+    config = copy.deepcopy(teacher.config)
+    config.num_hidden_layers = layers
+    pruned = not hidden_size or hidden_size == teacher.config.hidden_size
+    if not pruned:
+        if hidden_size % config.num_attention_heads:
+            raise ValueError(f"hidden_size {hidden_size} must be a multiple of {config.num_attention_heads} attention heads")
+        config.hidden_size = hidden_size
+        # Feed-forward width: "hidden_dim" in DistilBERT, "intermediate_size" elsewhere
+        for attribute in ("hidden_dim", "intermediate_size"):
+            if hasattr(config, attribute):
+                setattr(config, attribute, 4 * hidden_size)
+
+    from transformers import AutoModel
+    student = JointModel(
+        AutoModel.from_config(config), teacher.num_tags, teacher.num_intents,
+        token_loss_weight=teacher.token_loss_weight, intent_loss_weight=teacher.intent_loss_weight
+    )
+    mapping = layer_map(teacher_layers, layers)
+    if pruned:
+        # Everything outside the layer stack has the same shapes; copy it, then the chosen layers
+        student_layers, teacher_stack = student.encoder_layers(), teacher.encoder_layers()
+        student_keys = student.state_dict().keys()
+        state = {key: value for key, value in teacher.state_dict().items() if key in student_keys}
+        student.load_state_dict(state, strict=False)
+        for student_layer, teacher_index in zip(student_layers, mapping):
+            student_layer.load_state_dict(teacher_stack[teacher_index].state_dict())
+    return student, mapping
+
+
+def distillation_loss(
+    student_out: JointOutput,
+    teacher_out: JointOutput,
+    attention_mask: torch.Tensor,
+    mapping: List[int],
+    projection: Optional[torch.nn.Module],
+    temperature: float = DEFAULT_TEMPERATURE,
+    alpha: float = DEFAULT_ALPHA,
+    hidden_weight: float = DEFAULT_HIDDEN_WEIGHT
+) -> torch.Tensor:
+    """Hard-label loss blended with soft-label and hidden-state losses against the teacher"""
+    mask = attention_mask.bool()
+
+    def soft(student_logits, teacher_logits):
+        # KL divergence of the softened distributions, scaled by T^2 to keep gradients comparable
+        return F.kl_div(
+            F.log_softmax(student_logits / temperature, -1),
+            F.softmax(teacher_logits / temperature, -1),
+            reduction="batchmean"
+        ) * temperature ** 2
+
+    soft_loss = (
+        soft(student_out.token_logits[mask], teacher_out.token_logits[mask])
+        + soft(student_out.intent_logits, teacher_out.intent_logits)
+    )
+    loss = alpha * student_out.loss + (1 - alpha) * soft_loss
+
+    if hidden_weight:
+        # hidden_states[0] is the embedding output; layer i's output is hidden_states[i + 1]
+        pairs = [(0, 0)] + [(i + 1, t + 1) for i, t in enumerate(mapping)]
+        hidden_loss = 0.0
+        for student_index, teacher_index in pairs:
+            student_hidden = student_out.hidden_states[student_index][mask]
+            if projection is not None:
+                student_hidden = projection(student_hidden)
+            hidden_loss = hidden_loss + F.mse_loss(student_hidden, teacher_out.hidden_states[teacher_index][mask])
+        loss = loss + hidden_weight * hidden_loss / len(pairs)
+    return loss
@@ -0,0 +1,178 @@
+"""Local stand-in for the OpenAI and Anthropic APIs, used to benchmark LLMService offline.
+
+Run it with ``uvicorn fake_llm_server:app --port 9000`` and point the backend at it:
+
+    OPENAI_BASE_URL=http://localhost:9000/v1 OPENAI_API_KEY=fake
+    ANTHROPIC_BASE_URL=http://localhost:9000 ANTHROPIC_API_KEY=fake
+
+FAKE_LLM_LATENCY_MS sets the simulated generation time and FAKE_LLM_ERROR_RATE
+the fraction of requests answered with a 429, to exercise the retry path.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "500"))
+ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+
+app = FastAPI(title="Fake LLM provider")
+
+stats = {"requests": 0, "rate_limited": 0}
+
+
+def _utterances(prompt: str) -> list:
+    """Annotated utterances built from the intent and entities named in the prompt"""
+    intent = re.search(r"^Intent: (\w+)", prompt, re.M).group(1).replace("_", " ")
+    entities = re.findall(r"^- ([A-Z0-9_]+):", prompt, re.M) or ["ITEM"]
+    count = int(re.search(r"Write (\d+)", prompt).group(1))
+    # Same prompt, same answer; different batches get different utterances
+    rng = random.Random(prompt)
+    openers = ["please", "can you", "i need to", "we want to", "help me", "could someone", "quick request:"]
+    closers = ["", "today", "asap", "before friday", "thanks", "if possible", "for the audit"]
+    utterances = []
+    for _ in range(count):
+        entity = rng.choice(entities)
+        value = f"{rng.choice(['Acme', 'Globex', 'Initech', 'Hooli'])} {rng.randint(100, 99999)}"
+        utterances.append(f"{rng.choice(openers)} {intent} for [{value}]({entity}) {rng.choice(closers)}".strip())
+    return utterances
+
+
+def _completion_text(prompt: str) -> str:
+    """Answer with the JSON shape the calling prompt asks for"""
+    if '"utterances"' in prompt:
+        body = {"utterances": _utterances(prompt)}
+    elif "clarifying questions" in prompt:
+        body = {
+            "domain": "Customer Service & Support",
+            "questions": [
+                "What types of entities are most critical?",
+                "What are the typical user actions you need to capture?",
+                "Are there any domain-specific terms or jargon?"
+            ]
+        }
+    else:
+        body = {
+            "entities": [
+                {"name": "ORDER_ID", "description": "Order reference numbers"},
+                {"name": "PRODUCT", "description": "Product names"},
+                {"name": "DATE", "description": "Dates and times"}
+            ],
+            "intents": [
+                {"name": "track_order", "description": "User wants to track an order"},
+                {"name": "request_refund", "description": "User wants a refund"}
+            ]
+        }
+    return "```json\n" + json.dumps(body, indent=2) + "\n```"
+
+
+async def _simulate(request: Request):
+    """Apply random rate limiting; returns an error response or the request payload"""
+    stats["requests"] += 1
+    payload = await request.json()
+    if random.random() < ERROR_RATE:
+        stats["rate_limited"] += 1
+        error = {"error": {"type": "rate_limit_error", "message": "Rate limited by fake provider"}}
+        return JSONResponse(error, status_code=429, headers={"retry-after": "0.1"}), payload
+    return None, payload
+
+
+def _prompt(payload: dict) -> str:
+    return "\n".join(str(m.get("content", "")) for m in payload.get("messages", []))
+
+
+async def _token_deltas(text: str):
+    """Spread the configured latency over ~8-character deltas"""
+    pieces = [text[i:i + 8] for i in range(0, len(text), 8)]
+    for piece in pieces:
+        await asyncio.sleep(LATENCY_MS / 1000 / len(pieces))
+        yield piece
+
+
+def _sse(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    error, payload = await _simulate(request)
+    if error is not None:
+        return error
+    prompt = _prompt(payload)
+    text = _completion_text(prompt)
+    if payload.get("stream"):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        async def chunks():
+            async for piece in _token_deltas(text):
+                yield _sse({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": "fake-gpt",
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                })
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    await asyncio.sleep(LATENCY_MS / 1000)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "fake-gpt",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(text.split()), "total_tokens": 0}
+    }
+
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    error, payload = await _simulate(request)
+    if error is not None:
+        return error
+    prompt = _prompt(payload)
+    text = _completion_text(prompt)
+    if payload.get("stream"):
+        message = {
+            "id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant", "model": "fake-claude",
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": len(prompt.split()), "output_tokens": 0}
+        }
+
+        async def events():
+            yield _sse({"type": "message_start", "message": message}, "message_start")
+            yield _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+                       "content_block_start")
+            async for piece in _token_deltas(text):
+                yield _sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}},
+                           "content_block_delta")
+            yield _sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+            yield _sse({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                        "usage": {"output_tokens": len(text.split())}}, "message_delta")
+            yield _sse({"type": "message_stop"}, "message_stop")
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await asyncio.sleep(LATENCY_MS / 1000)
+    return {
+        "id": f"msg_{uuid.uuid4().hex}",
+        "type": "message",
+        "role": "assistant",
+        "model": "fake-claude",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": len(prompt.split()), "output_tokens": len(text.split())}
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
@@ -0,0 +1,437 @@
+"""Prediction with trained models: lazy model registry and dynamic micro-batching"""
+
+import os
+import json
+import time
+import asyncio
+import importlib.util
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Dict, Optional, Tuple
+from metrics import PREDICT_BATCH_SECONDS, PREDICT_BATCH_SIZE
+
+# Optional inference dependencies; torch and transformers are only imported when the first model loads
+TRANSFORMERS_AVAILABLE = all(importlib.util.find_spec(name) for name in ("transformers", "torch"))
+
+# Distilled students of a job are complete model directories under <model_path>/students/<name>
+STUDENTS_DIR = "students"
+# Adapter jobs save only their adapter and heads here; the encoder is their base model's
+ADAPTER_DIR = "adapter"
+
+
+def model_dir(models_dir: str, job_id: str, student: Optional[str] = None) -> str:
+    """Directory of the model trained by ``job_id``, or of one of its distilled students"""
+    path = os.path.join(models_dir, os.path.basename(job_id))
+    if student:
+        path = os.path.join(path, STUDENTS_DIR, os.path.basename(student))
+    return path
+
+
+def decode_entities(text: str, offsets: List, word_ids: List, tag_ids: List, tag_names: List[str]) -> List[Dict]:
+    """Merge BIO tags predicted on the first sub-token of each word into character spans"""
+    spans = []
+    current = None
+    previous_word = None
+    for (start, end), word_id, tag_id in zip(offsets, word_ids, tag_ids):
+        if word_id is None:
+            continue
+        if word_id == previous_word:
+            # Continuation sub-token: extend the open span
+            if current is not None:
+                current["end"] = end
+            continue
+        previous_word = word_id
+        tag = tag_names[tag_id]
+        if tag == "O":
+            current = None
+            continue
+        prefix, label = tag.split("-", 1)
+        if prefix == "I" and current is not None and current["entity"] == label:
+            current["end"] = end
+        else:
+            current = {"entity": label, "start": start, "end": end}
+            spans.append(current)
+    for span in spans:
+        span["text"] = text[span["start"]:span["end"]]
+    return spans
+
+
+class LoadedModel:
+    """Tokenizer plus the joint entity/intent model of one trained job, ready for inference.
+
+    ``artifact`` selects the fp32, ``int8`` or ``onnx`` weights; an exported
+    artifact is only used if it passed its parity check, otherwise fp32 is.
+    Models trained before the joint model load as separate token and intent models.
+    """
+
+    def __init__(self, model_path: str, artifact: str = "fp32"):
+        from transformers import AutoTokenizer
+        from joint_model import JOINT_DIR
+
+        with open(os.path.join(model_path, "labels.json")) as f:
+            labels = json.load(f)
+        self.tag_names = labels["tags"]
+        self.intent_names = labels["intents"]
+        self.max_length = labels.get("max_sequence_length", 128)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+
+        self.artifact = artifact if self._parity_passed(model_path, artifact) else "fp32"
+        self.joint = os.path.isdir(os.path.join(model_path, JOINT_DIR))
+        if self.joint:
+            self.logits = self._load_joint(model_path, self.artifact)
+        elif os.path.isdir(os.path.join(model_path, ADAPTER_DIR)):
+            # On its own, an adapter job is merged into a private copy of its base encoder
+            from adapters import load_merged
+            from model_export import joint_logits
+            self.joint = True
+            self.logits = joint_logits(load_merged(os.path.join(model_path, ADAPTER_DIR)))
+        else:
+            self.logits = self._load_separate(model_path, self.artifact)
+
+    @staticmethod
+    def _load_joint(model_path: str, artifact: str):
+        """``(input_ids, attention_mask) -> (token_logits, intent_logits)`` from one encoder pass"""
+        from joint_model import JointModel, JOINT_DIR
+        from model_export import OnnxLogits, joint_logits, load_quantized
+        joint_dir = os.path.join(model_path, JOINT_DIR)
+        if artifact == "int8":
+            return joint_logits(load_quantized(
+                JointModel.from_config_dir(joint_dir), os.path.join(model_path, "int8", "joint.safetensors")))
+        if artifact == "onnx":
+            return OnnxLogits(os.path.join(model_path, "onnx", "joint.onnx"))
+        return joint_logits(JointModel.from_pretrained(joint_dir).eval())
+
+    @staticmethod
+    def _load_separate(model_path: str, artifact: str):
+        """The same call over the token and intent models of older jobs: two encoder passes"""
+        from transformers import AutoConfig, AutoModelForTokenClassification, AutoModelForSequenceClassification
+        from model_export import OnnxLogits, hf_logits, load_quantized
+        token_dir = os.path.join(model_path, "token")
+        intent_dir = os.path.join(model_path, "intent")
+        if artifact == "int8":
+            token_fn = hf_logits(load_quantized(
+                AutoModelForTokenClassification.from_config(AutoConfig.from_pretrained(token_dir)),
+                os.path.join(model_path, "int8", "token.safetensors")))
+            intent_fn = hf_logits(load_quantized(
+                AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(intent_dir)),
+                os.path.join(model_path, "int8", "intent.safetensors")))
+        elif artifact == "onnx":
+            token_session = OnnxLogits(os.path.join(model_path, "onnx", "token.onnx"))
+            intent_session = OnnxLogits(os.path.join(model_path, "onnx", "intent.onnx"))
+            token_fn = lambda input_ids, attention_mask: token_session(input_ids, attention_mask)[0]
+            intent_fn = lambda input_ids, attention_mask: intent_session(input_ids, attention_mask)[0]
+        else:
+            token_fn = hf_logits(AutoModelForTokenClassification.from_pretrained(token_dir).eval())
+            intent_fn = hf_logits(AutoModelForSequenceClassification.from_pretrained(intent_dir).eval())
+        return lambda input_ids, attention_mask: (token_fn(input_ids, attention_mask), intent_fn(input_ids, attention_mask))
+
+    @staticmethod
+    def _parity_passed(model_path: str, artifact: str) -> bool:
+        if artifact == "fp32":
+            return False
+        from model_export import ARTIFACTS_FILE
+        try:
+            with open(os.path.join(model_path, ARTIFACTS_FILE)) as f:
+                return bool(json.load(f).get(artifact, {}).get("parity_passed"))
+        except (OSError, ValueError):
+            return False
+
+    def forward(self, input_ids, attention_mask):
+        """Return per-token tag ids and intent probabilities for a padded batch"""
+        import torch
+        with torch.inference_mode():
+            token_logits, intent_logits = self.logits(input_ids, attention_mask)
+            tag_ids = token_logits.argmax(-1).tolist()
+            intent_probs = intent_logits.softmax(-1)
+        return tag_ids, intent_probs
+
+    def predict_batch(self, texts: List[str]) -> List[Dict]:
+        # Pad to the longest text in this batch, not to max_sequence_length
+        encoded = _tokenize(self.tokenizer, texts, self.max_length)
+        tag_ids, intent_probs = self.forward(encoded["input_ids"], encoded["attention_mask"])
+        return [
+            _prediction(text, encoded, i, tag_ids[i], intent_probs[i], self.tag_names, self.intent_names)
+            for i, text in enumerate(texts)
+        ]
+
+
+def _tokenize(tokenizer, texts: List[str], max_length: int):
+    return tokenizer(
+        texts,
+        padding="longest",
+        truncation=True,
+        max_length=max_length,
+        return_offsets_mapping=True,
+        return_tensors="pt"
+    )
+
+
+def _prediction(text: str, encoded, i: int, tag_ids: List[int], intent_probs, tag_names: List[str],
+                intent_names: List[str]) -> Dict:
+    confidence, intent_id = intent_probs.max(-1)
+    return {
+        "text": text,
+        "intent": {
+            "name": intent_names[intent_id.item()],
+            "confidence": round(confidence.item(), 4)
+        },
+        "entities": decode_entities(
+            text,
+            encoded["offset_mapping"][i].tolist(),
+            encoded.word_ids(batch_index=i),
+            tag_ids,
+            tag_names
+        )
+    }
+
+
+class SharedBaseModel:
+    """Adapter jobs on one base encoder, served together so their requests can share a batch.
+
+    At most ``max_adapters`` adapters stay loaded; the least recently used one
+    not needed by the current batch is unloaded when another is needed.
+    """
+
+    def __init__(self, base_model: str, max_adapters: int):
+        from transformers import AutoTokenizer
+        from adapters import AdapterHost
+        self.host = AdapterHost(base_model)
+        self.tokenizer = AutoTokenizer.from_pretrained(base_model)
+        self.max_adapters = max_adapters
+        # job_id -> model path of every adapter job routed here, and labels of the loaded ones
+        self.paths = {}
+        self.labels = OrderedDict()
+
+    def register(self, job_id: str, model_path: str):
+        self.paths[job_id] = model_path
+
+    def _ensure_loaded(self, job_ids: List[str]):
+        for job_id in dict.fromkeys(job_ids):
+            if job_id in self.labels:
+                self.labels.move_to_end(job_id)
+                continue
+            with open(os.path.join(self.paths[job_id], "labels.json")) as f:
+                labels = json.load(f)
+            self.host.load(job_id, os.path.join(self.paths[job_id], ADAPTER_DIR))
+            self.labels[job_id] = labels
+        for job_id in list(self.labels):
+            if len(self.labels) <= self.max_adapters:
+                break
+            if job_id not in job_ids:
+                del self.labels[job_id]
+                self.host.unload(job_id)
+
+    def predict_batch(self, requests: List[Tuple[str, str]]) -> List[Dict]:
+        """Predict ``(job_id, text)`` requests; rows of different jobs share one encoder pass"""
+        import torch
+        job_ids = [job_id for job_id, _ in requests]
+        texts = [text for _, text in requests]
+        self._ensure_loaded(job_ids)
+        max_length = max(self.labels[job_id].get("max_sequence_length", 128) for job_id in set(job_ids))
+        encoded = _tokenize(self.tokenizer, texts, max_length)
+        with torch.inference_mode():
+            token_logits, intent_logits = self.host.logits(job_ids, encoded["input_ids"], encoded["attention_mask"])
+        return [
+            _prediction(text, encoded, i, token_logits[i].argmax(-1).tolist(), intent_logits[i].softmax(-1),
+                        self.labels[job_id]["tags"], self.labels[job_id]["intents"])
+            for i, (job_id, text) in enumerate(requests)
+        ]
+
+
+class MicroBatcher:
+    """Groups concurrent predict calls for one model into batches.
+
+    A batch is dispatched when it reaches ``max_batch_size`` or when its oldest
+    request has waited ``max_wait_ms``. Requests are whatever the model's
+    ``predict_batch`` takes a list of: texts, or ``(job_id, text)`` for a ``SharedBaseModel``.
+    """
+
+    def __init__(self, model, executor, max_batch_size: int, max_wait_ms: float):
+        self.model = model
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = asyncio.Queue()
+        self._task = None
+        self._closed = False
+
+    async def predict(self, request) -> Dict:
+        if self._closed:
+            raise RuntimeError("Model was unloaded")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            item = await self._queue.get()
+            if item is None:
+                # close() was called while idle
+                return
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    # Closed while collecting: this batch still runs, then the loop ends
+                    closing = True
+                    break
+                batch.append(item)
+
+            batch = [(request, future) for request, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.model.predict_batch, [request for request, _ in batch]
+                )
+                PREDICT_BATCH_SECONDS.observe(time.perf_counter() - start)
+                PREDICT_BATCH_SIZE.observe(len(batch))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def close(self):
+        """Stop taking requests: queued ones fail, and a batch already taken off the queue still completes"""
+        self._closed = True
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None and not item[1].done():
+                item[1].set_exception(RuntimeError("Model was unloaded"))
+        if self._task is not None and not self._task.done():
+            # Not cancel(): that would orphan the futures of the batch in flight
+            self._queue.put_nowait(None)
+
+
+class InferenceService:
+    """Serves predictions from models saved under ``models_dir/<job_id>``.
+
+    At most ``max_models`` models stay resident; the least recently used one is
+    unloaded when another is needed.
+    """
+
+    def __init__(self, models_dir: str):
+        self.models_dir = models_dir
+        self.max_models = int(os.getenv("INFERENCE_MAX_MODELS", "4"))
+        self.max_batch_size = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "32"))
+        self.max_wait_ms = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+        # Preferred weights: fp32, int8 or onnx (falls back to fp32 when a model lacks a passing export)
+        self.artifact = os.getenv("INFERENCE_ARTIFACT", "fp32")
+        # One inference thread; torch parallelizes each batch across INFERENCE_THREADS cores
+        self.num_threads = int(os.getenv("INFERENCE_THREADS", str(os.cpu_count() or 1)))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        # Cold loads take seconds; they run here so they never hold up batches of loaded models
+        self._load_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-load")
+        # Adapters kept loaded on each shared base model
+        self.max_adapters = int(os.getenv("INFERENCE_MAX_ADAPTERS", "32"))
+        self._batchers = OrderedDict()
+        self._loading = {}
+        # job_id -> (base model, model path) for adapter jobs, None for jobs with their own encoder
+        self._adapter_jobs = {}
+
+    def _model_path(self, job_id: str, student: Optional[str] = None) -> str:
+        model_path = model_dir(self.models_dir, job_id, student)
+        if not os.path.exists(os.path.join(model_path, "labels.json")):
+            if student:
+                raise ValueError(f"No distilled student {student} found for job {job_id}")
+            raise ValueError(f"No trained model found for job {job_id}")
+        return model_path
+
+    def _adapter_job(self, job_id: str) -> Optional[Tuple[str, str]]:
+        """Base model and model path of an adapter job; None for a job with its own encoder"""
+        if job_id not in self._adapter_jobs:
+            model_path = self._model_path(job_id)
+            adapter_file = os.path.join(model_path, ADAPTER_DIR, "adapter.json")
+            if os.path.exists(adapter_file):
+                with open(adapter_file) as f:
+                    self._adapter_jobs[job_id] = (json.load(f)["base_model"], model_path)
+            else:
+                self._adapter_jobs[job_id] = None
+        return self._adapter_jobs[job_id]
+
+    def _load(self, model_path: str) -> LoadedModel:
+        import torch
+        torch.set_num_threads(self.num_threads)
+        return LoadedModel(model_path, self.artifact)
+
+    def _load_base(self, base_model: str) -> SharedBaseModel:
+        import torch
+        torch.set_num_threads(self.num_threads)
+        return SharedBaseModel(base_model, self.max_adapters)
+
+    async def _get_batcher(self, key: str, resolve: Callable[[], Callable]) -> MicroBatcher:
+        """Batcher of model ``key``; when it isn't loaded, ``resolve()`` returns the loader to run"""
+        batcher = self._batchers.get(key)
+        if batcher is not None:
+            self._batchers.move_to_end(key)
+            return batcher
+
+        # Concurrent first requests for the same model share a single load
+        loading = self._loading.get(key)
+        if loading is None:
+            load = resolve()
+            loop = asyncio.get_running_loop()
+            loading = asyncio.ensure_future(loop.run_in_executor(self._load_executor, load))
+            self._loading[key] = loading
+        try:
+            model = await asyncio.shield(loading)
+        finally:
+            self._loading.pop(key, None)
+
+        if key not in self._batchers:
+            self._batchers[key] = MicroBatcher(model, self._executor, self.max_batch_size, self.max_wait_ms)
+            while len(self._batchers) > self.max_models:
+                _, evicted = self._batchers.popitem(last=False)
+                evicted.close()
+        return self._batchers[key]
+
+    async def predict(self, job_id: str, texts: List[str], student: Optional[str] = None) -> List[Dict]:
+        """Predict entities and intent for each text with the model trained by ``job_id`` (or its ``student``)"""
+        if not TRANSFORMERS_AVAILABLE:
+            raise RuntimeError("Transformers is not installed; prediction is unavailable")
+        adapter_job = None if student else self._adapter_job(job_id)
+        if adapter_job is None:
+            # A job's students are separate models, each with its own batcher
+            key = f"{job_id}/{student}" if student else job_id
+            batcher = await self._get_batcher(key, lambda: partial(self._load, self._model_path(job_id, student)))
+            requests = texts
+        else:
+            # Adapter jobs on the same base share one encoder and one batcher
+            base_model, model_path = adapter_job
+            batcher = await self._get_batcher(f"base:{base_model}", lambda: partial(self._load_base, base_model))
+            batcher.model.register(job_id, model_path)
+            requests = [(job_id, text) for text in texts]
+        return list(await asyncio.gather(*(batcher.predict(request) for request in requests)))
+
+    def loaded_models(self) -> List[str]:
+        models = []
+        for key, batcher in self._batchers.items():
+            if isinstance(batcher.model, SharedBaseModel):
+                models.extend(batcher.model.labels)
+            else:
+                models.append(key)
+        return models
+
+    def shutdown(self):
+        for batcher in self._batchers.values():
+            batcher.close()
+        self._batchers.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._load_executor.shutdown(wait=False, cancel_futures=True)
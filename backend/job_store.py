@@ -0,0 +1,307 @@
+"""Storage backends for training job records"""
+
+import os
+import json
+import time
+import sqlite3
+import importlib
+import threading
+from typing import Iterable, List, Dict, Optional, Set, Tuple
+
+
+TERMINAL_STATUSES = ("completed", "failed", "stopped")
+
+# Fields returned by list() - everything else (entities, intents, config...) is only
+# returned by get()
+SUMMARY_FIELDS = ("status", "progress", "epoch", "total_epochs", "loss", "created_at")
+
+
+def _summary(job: Dict) -> Dict:
+    return {
+        "status": job["status"],
+        "progress": job.get("progress", 0),
+        "epoch": job.get("epoch", 0),
+        "total_epochs": job.get("total_epochs", 0),
+        "loss": job.get("loss"),
+        "created_at": job.get("created_at", "unknown")
+    }
+
+
+def _next_version(job: Dict) -> int:
+    return job.get("version", 0) + 1
+
+
+class JobStore:
+    """Interface shared by all job stores.
+
+    Implementations keep a per-status counter that is adjusted on every status
+    transition, so counting jobs never requires a scan. Every record carries a
+    ``version`` that is bumped on each write, for conditional GETs.
+
+    Stores shared between processes (SQLite, or a Redis-like backend loaded with
+    ``JOB_STORE=module:Class``) also track the heartbeat of every process that
+    owns jobs, so a surviving process can fail the jobs of one that died.
+    """
+
+    def create(self, job_id: str, job: Dict):
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def update(self, job_id: str, fields: Dict) -> Dict:
+        """Merge ``fields`` into the job, bump its version and return the updated record"""
+        raise NotImplementedError
+
+    def list(
+        self,
+        statuses: Optional[List[str]] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Tuple[str, Dict]]:
+        """Return ``(job_id, summary)`` pairs, newest first"""
+        raise NotImplementedError
+
+    def count_by_status(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def heartbeat(self, owner_id: str):
+        """Record that the process ``owner_id`` is alive"""
+        raise NotImplementedError
+
+    def live_owners(self, max_age: float) -> Set[str]:
+        """Owners whose last heartbeat is at most ``max_age`` seconds old"""
+        raise NotImplementedError
+
+    def remove_owner(self, owner_id: str):
+        raise NotImplementedError
+
+    def recover_interrupted(self, live_owners: Iterable[str] = ()) -> List[str]:
+        """Mark unfinished jobs as failed unless their owner is one of ``live_owners``"""
+        live_owners = set(live_owners)
+        interrupted = []
+        for status, count in self.count_by_status().items():
+            if status in TERMINAL_STATUSES or count == 0:
+                continue
+            for job_id, _ in self.list(statuses=[status], limit=count):
+                job = self.get(job_id)
+                if job is not None and job.get("owner") not in live_owners:
+                    interrupted.append(job_id)
+        for job_id in interrupted:
+            self.update(job_id, {"status": "failed", "error": "Interrupted: the server process running it stopped"})
+        return interrupted
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def close(self):
+        pass
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local store, used by tests and when persistence is disabled"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._counts = {}
+        self._owners = {}
+
+    def create(self, job_id: str, job: Dict):
+        self._jobs[job_id] = dict(job, version=1)
+        self._counts[job["status"]] = self._counts.get(job["status"], 0) + 1
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def update(self, job_id: str, fields: Dict) -> Dict:
+        job = self._jobs[job_id]
+        old_status = job["status"]
+        job.update(fields, version=_next_version(job))
+        if job["status"] != old_status:
+            self._counts[old_status] -= 1
+            self._counts[job["status"]] = self._counts.get(job["status"], 0) + 1
+        return dict(job)
+
+    def list(
+        self,
+        statuses: Optional[List[str]] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Tuple[str, Dict]]:
+        # Insertion order is creation order
+        jobs = reversed(list(self._jobs.items()))
+        if statuses:
+            jobs = ((job_id, job) for job_id, job in jobs if job["status"] in statuses)
+        page = list(jobs)[offset:offset + limit]
+        return [(job_id, _summary(job)) for job_id, job in page]
+
+    def count_by_status(self) -> Dict[str, int]:
+        return dict(self._counts)
+
+    def heartbeat(self, owner_id: str):
+        self._owners[owner_id] = time.time()
+
+    def live_owners(self, max_age: float) -> Set[str]:
+        cutoff = time.time() - max_age
+        return {owner_id for owner_id, at in self._owners.items() if at >= cutoff}
+
+    def remove_owner(self, owner_id: str):
+        self._owners.pop(owner_id, None)
+
+
+class SQLiteJobStore(JobStore):
+    """Job store persisted in a SQLite database (WAL mode)"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                epoch INTEGER NOT NULL DEFAULT 0,
+                total_epochs INTEGER NOT NULL DEFAULT 0,
+                loss REAL,
+                created_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at);
+            CREATE TABLE IF NOT EXISTS job_counts (
+                status TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS owners (
+                owner_id TEXT PRIMARY KEY,
+                heartbeat_at REAL NOT NULL
+            );
+        """)
+
+    def _adjust_count(self, status: str, delta: int):
+        self._conn.execute(
+            "INSERT INTO job_counts (status, count) VALUES (?, ?) "
+            "ON CONFLICT(status) DO UPDATE SET count = count + excluded.count",
+            (status, delta)
+        )
+
+    def _write(self, job_id: str, job: Dict, insert: bool):
+        summary = _summary(job)
+        values = (
+            summary["status"], summary["progress"] or 0, summary["epoch"] or 0,
+            summary["total_epochs"] or 0, summary["loss"], summary["created_at"],
+            json.dumps(job), job_id
+        )
+        if insert:
+            self._conn.execute(
+                "INSERT INTO jobs (status, progress, epoch, total_epochs, loss, created_at, data, job_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                values
+            )
+        else:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, epoch = ?, total_epochs = ?, loss = ?, "
+                "created_at = ?, data = ? WHERE job_id = ?",
+                values
+            )
+
+    def create(self, job_id: str, job: Dict):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write(job_id, dict(job, version=1), insert=True)
+                self._adjust_count(job["status"], 1)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id: str, fields: Dict) -> Dict:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    raise KeyError(job_id)
+                job = json.loads(row[0])
+                old_status = job["status"]
+                job.update(fields, version=_next_version(job))
+                self._write(job_id, job, insert=False)
+                if job["status"] != old_status:
+                    self._adjust_count(old_status, -1)
+                    self._adjust_count(job["status"], 1)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job
+
+    def list(
+        self,
+        statuses: Optional[List[str]] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Tuple[str, Dict]]:
+        query = "SELECT job_id, " + ", ".join(SUMMARY_FIELDS) + " FROM jobs"
+        params = []
+        if statuses:
+            query += " WHERE status IN (" + ", ".join("?" for _ in statuses) + ")"
+            params.extend(statuses)
+        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [(row[0], dict(zip(SUMMARY_FIELDS, row[1:]))) for row in rows]
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, count FROM job_counts").fetchall()
+        return {status: count for status, count in rows}
+
+    def heartbeat(self, owner_id: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO owners (owner_id, heartbeat_at) VALUES (?, ?) "
+                "ON CONFLICT(owner_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (owner_id, time.time())
+            )
+
+    def live_owners(self, max_age: float) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT owner_id FROM owners WHERE heartbeat_at >= ?", (time.time() - max_age,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def remove_owner(self, owner_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM owners WHERE owner_id = ?", (owner_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_job_store() -> JobStore:
+    """Build the job store selected by the JOB_STORE environment variable"""
+    backend = os.getenv("JOB_STORE", "sqlite")
+    if backend == "memory":
+        return InMemoryJobStore()
+    if backend == "sqlite":
+        default_path = os.path.join(os.path.dirname(__file__), "..", "data", "jobs.db")
+        return SQLiteJobStore(os.getenv("JOB_DB_PATH", default_path))
+    if ":" in backend:
+        # Another JobStore implementation, e.g. "redis_store:RedisJobStore", built without arguments
+        module_name, class_name = backend.split(":", 1)
+        return getattr(importlib.import_module(module_name), class_name)()
+    raise ValueError(f"Unknown job store: {backend}")
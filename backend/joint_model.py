@@ -0,0 +1,135 @@
+"""One shared encoder with a token-tagging head and a pooled intent head.
+
+Entities and intent come out of a single encoder pass. Training minimizes a
+weighted sum of the two cross-entropy losses, and the model is saved as one
+artifact directory: the encoder's ``config.json``, the head sizes in
+``joint.json`` and every weight in ``model.safetensors``.
+"""
+
+import os
+import json
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import torch
+from transformers import AutoConfig, AutoModel
+
+# Directory of the joint model inside a trained job's model path
+JOINT_DIR = "joint"
+HEADS_FILE = "joint.json"
+WEIGHTS_FILE = "model.safetensors"
+
+
+@dataclass
+class JointOutput:
+    loss: Optional[torch.Tensor]
+    token_logits: torch.Tensor
+    intent_logits: torch.Tensor
+    # Embedding output followed by every layer's output, when requested (for distillation)
+    hidden_states: Optional[Tuple[torch.Tensor, ...]] = None
+
+
+class JointModel(torch.nn.Module):
+    """Encoder -> per-token tag logits, and [CLS] -> intent logits"""
+
+    def __init__(self, encoder, num_tags: int, num_intents: int,
+                 token_loss_weight: float = 1.0, intent_loss_weight: float = 1.0):
+        super().__init__()
+        self.encoder = encoder
+        self.config = encoder.config
+        self.num_tags = num_tags
+        self.num_intents = num_intents
+        self.token_loss_weight = token_loss_weight
+        self.intent_loss_weight = intent_loss_weight
+        hidden = self.config.hidden_size
+        # Same head shapes and dropout as the transformers DistilBERT classification models
+        self.dropout = torch.nn.Dropout(getattr(self.config, "dropout", 0.1))
+        self.intent_dropout = torch.nn.Dropout(getattr(self.config, "seq_classif_dropout", 0.2))
+        self.token_head = torch.nn.Linear(hidden, num_tags)
+        self.intent_pre = torch.nn.Linear(hidden, hidden)
+        self.intent_head = torch.nn.Linear(hidden, num_intents)
+
+    @classmethod
+    def from_encoder(cls, model_name: str, num_tags: int, num_intents: int, **loss_weights) -> "JointModel":
+        """New heads on top of a pretrained encoder"""
+        return cls(AutoModel.from_pretrained(model_name), num_tags, num_intents, **loss_weights)
+
+    @classmethod
+    def from_config_dir(cls, path: str) -> "JointModel":
+        """Randomly initialized model with the architecture saved in ``path``"""
+        with open(os.path.join(path, HEADS_FILE)) as f:
+            heads = json.load(f)
+        return cls(AutoModel.from_config(AutoConfig.from_pretrained(path)), **heads)
+
+    @classmethod
+    def from_pretrained(cls, path: str) -> "JointModel":
+        from safetensors.torch import load_model
+        model = cls.from_config_dir(path)
+        load_model(model, os.path.join(path, WEIGHTS_FILE))
+        return model
+
+    def save_pretrained(self, path: str):
+        from safetensors.torch import save_model
+        os.makedirs(path, exist_ok=True)
+        self.config.save_pretrained(path)
+        with open(os.path.join(path, HEADS_FILE), "w") as f:
+            json.dump({
+                "num_tags": self.num_tags,
+                "num_intents": self.num_intents,
+                "token_loss_weight": self.token_loss_weight,
+                "intent_loss_weight": self.intent_loss_weight
+            }, f, indent=2)
+        save_model(self, os.path.join(path, WEIGHTS_FILE))
+
+    def encoder_layers(self) -> torch.nn.ModuleList:
+        """The encoder's stack of transformer blocks (``transformer.layer`` in DistilBERT, ``encoder.layer`` in BERT)"""
+        for module in self.encoder.modules():
+            if isinstance(module, torch.nn.ModuleList) and len(module) == self.config.num_hidden_layers:
+                return module
+        raise ValueError(f"Cannot find the layer stack of {type(self.encoder).__name__}")
+
+    def extend_labels(self, num_tags: int, num_intents: int):
+        """Grow the heads to ``num_tags`` and ``num_intents`` outputs; existing labels keep their rows"""
+        def grown(head: torch.nn.Linear, size: int) -> torch.nn.Linear:
+            if size == head.out_features:
+                return head
+            if size < head.out_features:
+                raise ValueError(f"Heads can only grow: {head.out_features} labels to {size}")
+            new = torch.nn.Linear(head.in_features, size)
+            with torch.no_grad():
+                new.weight[:head.out_features] = head.weight
+                new.bias[:head.out_features] = head.bias
+            return new
+
+        self.token_head = grown(self.token_head, num_tags)
+        self.intent_head = grown(self.intent_head, num_intents)
+        self.num_tags, self.num_intents = num_tags, num_intents
+
+    def freeze_lower_layers(self, count: int):
+        """Stop training the embeddings and the lowest ``count`` encoder layers"""
+        layers = self.encoder_layers()
+        if not 0 <= count <= len(layers):
+            raise ValueError(f"freeze_layers must be between 0 and {len(layers)}, got {count}")
+        frozen = [self.encoder.embeddings] + list(layers[:count]) if count else []
+        for module in frozen:
+            for param in module.parameters():
+                param.requires_grad = False
+
+    def forward(self, input_ids, attention_mask, labels=None, intent_labels=None, output_hidden_states=False,
+                position_ids=None, cls_index=None) -> JointOutput:
+        """``position_ids`` and ``cls_index`` (row and offset of each example's [CLS]) describe packed rows"""
+        encoded = self.encoder(input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                               output_hidden_states=output_hidden_states)
+        hidden = encoded.last_hidden_state
+        token_logits = self.token_head(self.dropout(hidden))
+        cls = hidden[:, 0] if cls_index is None else hidden[cls_index[:, 0], cls_index[:, 1]]
+        pooled = torch.relu(self.intent_pre(cls))
+        intent_logits = self.intent_head(self.intent_dropout(pooled))
+        loss = None
+        if labels is not None and intent_labels is not None:
+            token_loss = torch.nn.functional.cross_entropy(
+                token_logits.reshape(-1, self.num_tags), labels.reshape(-1), ignore_index=-100
+            )
+            intent_loss = torch.nn.functional.cross_entropy(intent_logits, intent_labels)
+            loss = self.token_loss_weight * token_loss + self.intent_loss_weight * intent_loss
+        return JointOutput(loss, token_logits, intent_logits, encoded.hidden_states if output_hidden_states else None)
@@ -0,0 +1,144 @@
+"""Incremental parser for JSON objects arriving as a token stream"""
+
+import json
+from typing import Any, List, Tuple
+
+
+class IncrementalJSONParser:
+    """Emits pieces of a top-level JSON object as soon as they are complete.
+
+    Text before the opening brace (e.g. a markdown fence) is ignored. ``feed``
+    returns ``(path, value)`` pairs for:
+
+    - top-level scalar fields, with ``path == (key,)``
+    - items of top-level array fields, with ``path == (key, index)``
+
+    Items that turn out to be malformed are skipped and counted in ``errors``.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self.errors = 0
+        self._pos = 0
+        self._started = False
+        # One frame per open container: type, current key, current index and what comes next
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._value_start = None
+        self._primitive_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple, Any]]:
+        if self.done:
+            return []
+        if not self._started:
+            brace = chunk.find("{")
+            if brace == -1:
+                return []
+            chunk = chunk[brace:]
+            self._started = True
+        self.text += chunk
+        return self._scan()
+
+    def result(self) -> Any:
+        """Parse the complete object; raises ValueError if it never closed or is invalid"""
+        if not self.done:
+            raise ValueError("JSON object is incomplete")
+        return json.loads(self.text[:self._pos])
+
+    def _scan(self) -> List[Tuple[Tuple, Any]]:
+        events = []
+        text = self.text
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    frame = self._stack[-1]
+                    if frame["type"] == "{" and frame["expect"] == "key":
+                        frame["key"] = self._load(self._value_start, i + 1)
+                        frame["expect"] = "colon"
+                    else:
+                        self._complete(self._value_start, i + 1, events)
+                i += 1
+                continue
+
+            if self._primitive_start is not None:
+                if ch not in ",}] \t\r\n":
+                    i += 1
+                    continue
+                self._complete(self._primitive_start, i, events)
+                self._primitive_start = None
+
+            if ch in " \t\r\n":
+                pass
+            elif ch == '"':
+                frame = self._stack[-1]
+                if not (frame["type"] == "{" and frame["expect"] == "key"):
+                    self._begin_value()
+                self._in_string = True
+                self._value_start = i
+            elif ch in "{[":
+                if self._stack:
+                    self._begin_value()
+                self._stack.append({
+                    "type": ch,
+                    "key": None,
+                    "index": -1,
+                    "expect": "key" if ch == "{" else "value",
+                    "start": i
+                })
+            elif ch in "}]":
+                closed = self._stack.pop()
+                if not self._stack:
+                    self.done = True
+                    self._pos = i + 1
+                    return events
+                self._complete(closed["start"], i + 1, events)
+            elif ch == ":":
+                self._stack[-1]["expect"] = "value"
+            elif ch == ",":
+                frame = self._stack[-1]
+                frame["expect"] = "key" if frame["type"] == "{" else "value"
+            else:
+                self._begin_value()
+                self._primitive_start = i
+            i += 1
+        self._pos = i
+        return events
+
+    def _begin_value(self):
+        frame = self._stack[-1]
+        if frame["type"] == "[":
+            frame["index"] += 1
+        frame["expect"] = "comma"
+
+    def _complete(self, start: int, end: int, events: List):
+        """Record a finished value if it sits at a reported position"""
+        depth = len(self._stack)
+        root = self._stack[0]
+        if root["type"] != "{":
+            return
+        if depth == 1 and self.text[start] not in "{[":
+            path = (root["key"],)
+        elif depth == 2 and self._stack[1]["type"] == "[":
+            path = (root["key"], self._stack[1]["index"])
+        else:
+            return
+        try:
+            events.append((path, json.loads(self.text[start:end])))
+        except ValueError:
+            self.errors += 1
+
+    def _load(self, start: int, end: int) -> Any:
+        try:
+            return json.loads(self.text[start:end])
+        except ValueError:
+            self.errors += 1
+            return None
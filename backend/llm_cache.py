@@ -0,0 +1,177 @@
+"""Content-addressed cache for LLM responses"""
+
+import os
+import json
+import time
+import hashlib
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+def make_cache_key(provider: str, model: str, prompt: str) -> str:
+    """Hash of (provider, model, prompt) with whitespace normalized away"""
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(json.dumps([provider, model, normalized]).encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """Size-bounded directory of cached responses, evicting least recently used first"""
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+        # key -> file size, ordered from least to most recently used
+        self._index = OrderedDict()
+        self.total_bytes = 0
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self.total_bytes += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        if key not in self._index:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._remove(key)
+            return None
+        if time.time() - entry["created_at"] > self.ttl_seconds:
+            self._remove(key)
+            return None
+        self._index.move_to_end(key)
+        os.utime(self._path(key))
+        return entry["value"]
+
+    def set(self, key: str, value: str):
+        data = json.dumps({"created_at": time.time(), "value": value})
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        self.total_bytes += len(data) - self._index.pop(key, 0)
+        self._index[key] = len(data)
+        while self.total_bytes > self.max_bytes and len(self._index) > 1:
+            self._remove(next(iter(self._index)))
+
+    def _remove(self, key: str):
+        self.total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class ResponseCache:
+    """In-process LRU tier in front of an optional on-disk tier.
+
+    Concurrent requests for the same key share one in-flight call.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 24 * 3600,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 100 * 1024 * 1024
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self.disk = DiskCache(disk_dir, disk_max_bytes, ttl_seconds) if disk_dir else None
+        self._inflight = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            created_at, value = entry
+            if time.time() - created_at <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._memory[key]
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self._set_memory(key, value)
+                return value
+        return None
+
+    def set(self, key: str, value: str):
+        self._set_memory(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def _set_memory(self, key: str, value: str):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (time.time(), value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get_or_call(self, key: str, call) -> str:
+        """Return the cached value for ``key`` or compute it once with ``call()``"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, call))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A cancelled caller must not cancel the call other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, call) -> str:
+        value = await call()
+        self.set(key, value)
+        return value
+
+    def stats(self) -> Dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses + self.coalesced
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "disk_bytes": self.disk.total_bytes if self.disk is not None else 0,
+            "inflight": len(self._inflight)
+        }
+
+
+def create_response_cache() -> ResponseCache:
+    """Build the response cache from LLM_CACHE_* environment variables"""
+    return ResponseCache(
+        max_entries=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600))),
+        disk_dir=os.getenv("LLM_CACHE_DIR") or None,
+        disk_max_bytes=int(float(os.getenv("LLM_CACHE_DISK_MAX_MB", "100")) * 1024 * 1024)
+    )
@@ -1,34 +1,178 @@
 import os
+import sys
+import copy
 import json
+import time
+import random
+import asyncio
 from typing import List, Dict, Optional
-from openai import OpenAI
-import anthropic
+from llm_cache import create_response_cache, make_cache_key
+from json_stream import IncrementalJSONParser
+from metrics import LLM_REQUEST_SECONDS, LLM_ERRORS, LLM_TOKENS
 # from dashscope import Generation  # Uncomment if using Qwen API
 
 
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
+ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-sonnet-20240229")
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # per provider
+LLM_BACKOFF_BASE_SECONDS = 0.5
+LLM_BACKOFF_MAX_SECONDS = 20.0
+
+RETRYABLE_STATUS_CODES = (408, 409, 429)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limits, overload/server errors and network failures are worth retrying"""
+    for sdk_name in ("openai", "anthropic"):
+        # The SDKs are imported on first use; one that was never loaded can't have raised
+        sdk = sys.modules.get(sdk_name)
+        if sdk is None:
+            continue
+        if isinstance(error, sdk.APIConnectionError):
+            return True
+        if isinstance(error, sdk.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Honor Retry-After when the provider sends it, otherwise full-jitter exponential backoff"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get("retry-after")), LLM_BACKOFF_MAX_SECONDS)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+DEFAULT_ANALYSIS = {
+    "domain": "General NLP",
+    "questions": [
+        "What types of entities are most critical? (e.g., dates, locations, names)",
+        "What are the typical user actions you need to capture?",
+        "Are there any domain-specific terms or jargon?"
+    ]
+}
+
+DEFAULT_ENTITIES_INTENTS = {
+    "entities": [
+        {"name": "PERSON", "description": "Person names"},
+        {"name": "LOCATION", "description": "Geographic locations"},
+        {"name": "DATE", "description": "Dates and times"}
+    ],
+    "intents": [
+        {"name": "query_information", "description": "User wants to query information"},
+        {"name": "request_action", "description": "User wants to request an action"}
+    ]
+}
+
+
+def _parse_json_response(response_text: str, default: Dict) -> Dict:
+    """Parse the JSON object in an LLM response, falling back to ``default``"""
+    try:
+        # Extract JSON from markdown code blocks if present
+        if "```json" in response_text:
+            json_start = response_text.find("```json") + 7
+            json_end = response_text.find("```", json_start)
+            response_text = response_text[json_start:json_end].strip()
+        elif "```" in response_text:
+            json_start = response_text.find("```") + 3
+            json_end = response_text.find("```", json_start)
+            response_text = response_text[json_start:json_end].strip()
+        
+        return json.loads(response_text)
+    except Exception:
+        # Fallback if JSON parsing fails
+        return copy.deepcopy(default)
+
+
 class LLMService:
     def __init__(self):
-        try:
-            openai_key = os.getenv("OPENAI_API_KEY")
-            self.openai_client = OpenAI(api_key=openai_key) if openai_key else None
-        except Exception as e:
-            print(f"Warning: Failed to initialize OpenAI client: {e}")
-            self.openai_client = None
+        # provider -> client, created on first use so the SDKs are only imported when a provider is called
+        self._clients = {}
         
+        # self.qwen_client = Generation() if os.getenv("QWEN_API_KEY") else None  # Uncomment if using Qwen API
+        self.qwen_client = None
+
+        # Bound in-flight requests per provider so a burst of users can't trip rate limits
+        self._semaphores = {
+            "openai": asyncio.Semaphore(LLM_MAX_CONCURRENCY),
+            "claude": asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        }
+
+        # Identical prompts are answered from cache instead of re-sent to the provider
+        self.response_cache = create_response_cache()
+
+    @property
+    def openai_client(self):
+        if "openai" not in self._clients:
+            self._clients["openai"] = self._create_client("openai")
+        return self._clients["openai"]
+
+    @property
+    def anthropic_client(self):
+        if "claude" not in self._clients:
+            self._clients["claude"] = self._create_client("claude")
+        return self._clients["claude"]
+
+    @staticmethod
+    def _create_client(provider: str):
+        """Build a provider's async client, or None when its API key isn't configured.
+
+        Each async client owns one keep-alive connection pool reused by every request.
+        Retries are handled by _request_with_retries, so the SDKs' own retries are disabled
+        """
         try:
+            if provider == "openai":
+                openai_key = os.getenv("OPENAI_API_KEY")
+                if not openai_key:
+                    return None
+                from openai import AsyncOpenAI
+                return AsyncOpenAI(
+                    api_key=openai_key,
+                    base_url=os.getenv("OPENAI_BASE_URL"),
+                    timeout=LLM_TIMEOUT_SECONDS,
+                    max_retries=0
+                )
             anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-            self.anthropic_client = anthropic.Anthropic(api_key=anthropic_key) if anthropic_key else None
+            if not anthropic_key:
+                return None
+            import anthropic
+            return anthropic.AsyncAnthropic(
+                api_key=anthropic_key,
+                base_url=os.getenv("ANTHROPIC_BASE_URL"),
+                timeout=LLM_TIMEOUT_SECONDS,
+                max_retries=0
+            )
         except Exception as e:
-            print(f"Warning: Failed to initialize Anthropic client: {e}")
-            self.anthropic_client = None
-        
-        # self.qwen_client = Generation() if os.getenv("QWEN_API_KEY") else None  # Uncomment if using Qwen API
-        self.qwen_client = None
+            print(f"Warning: Failed to initialize {provider} client: {e}")
+            return None
+
+    def loaded_clients(self) -> List[str]:
+        return [provider for provider, client in self._clients.items() if client is not None]
+
+    async def close(self):
+        """Close the provider connection pools"""
+        for client in self._clients.values():
+            if client is not None:
+                await client.close()
 
     async def analyze_problem(self, problem: str, provider: str = "claude") -> Dict:
         """Analyze problem statement and return domain + clarification questions"""
-        
-        prompt = f"""You are an AI assistant helping to build a DistilBERT model for entity and intent recognition.
+        response_text = await self._call_llm(self._analysis_prompt(problem), provider)
+        return _parse_json_response(response_text, DEFAULT_ANALYSIS)
+
+    async def stream_analyze_problem(self, problem: str, provider: str = "claude"):
+        """Streaming variant of analyze_problem, see _stream_json"""
+        async for event in self._stream_json(self._analysis_prompt(problem), provider, DEFAULT_ANALYSIS):
+            yield event
+
+    def _analysis_prompt(self, problem: str) -> str:
+        return f"""You are an AI assistant helping to build a DistilBERT model for entity and intent recognition.
 
 Problem Statement: {problem}
 
@@ -43,34 +187,6 @@ Return your response as JSON with this structure:
 }}
 """
 
-        response_text = await self._call_llm(prompt, provider)
-        
-        # Try to parse JSON from response
-        try:
-            # Extract JSON from markdown code blocks if present
-            if "```json" in response_text:
-                json_start = response_text.find("```json") + 7
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-            elif "```" in response_text:
-                json_start = response_text.find("```") + 3
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-            
-            result = json.loads(response_text)
-        except:
-            # Fallback if JSON parsing fails
-            result = {
-                "domain": "General NLP",
-                "questions": [
-                    "What types of entities are most critical? (e.g., dates, locations, names)",
-                    "What are the typical user actions you need to capture?",
-                    "Are there any domain-specific terms or jargon?"
-                ]
-            }
-        
-        return result
-
     async def generate_entities_intents(
         self, 
         problem: str, 
@@ -79,7 +195,23 @@ Return your response as JSON with this structure:
         provider: str = "claude"
     ) -> Dict:
         """Generate entities and intents based on problem analysis and answers"""
-        
+        prompt = self._entities_intents_prompt(problem, domain, questions)
+        response_text = await self._call_llm(prompt, provider)
+        return _parse_json_response(response_text, DEFAULT_ENTITIES_INTENTS)
+
+    async def stream_entities_intents(
+        self,
+        problem: str,
+        domain: Optional[str],
+        questions: List[Dict],
+        provider: str = "claude"
+    ):
+        """Streaming variant of generate_entities_intents, see _stream_json"""
+        prompt = self._entities_intents_prompt(problem, domain, questions)
+        async for event in self._stream_json(prompt, provider, DEFAULT_ENTITIES_INTENTS):
+            yield event
+
+    def _entities_intents_prompt(self, problem: str, domain: Optional[str], questions: List[Dict]) -> str:
         # Handle both Pydantic objects and dictionaries
         def get_question_text(q):
             # Check if it's a Pydantic model (has dict() method) or regular dict
@@ -99,7 +231,7 @@ Return your response as JSON with this structure:
         
         questions_text = "\n".join([get_question_text(q) for q in questions])
         
-        prompt = f"""You are an AI assistant helping to build a DistilBERT model for entity and intent recognition.
+        return f"""You are an AI assistant helping to build a DistilBERT model for entity and intent recognition.
 
 Problem Statement: {problem}
 Domain/Segment: {domain or "General NLP"}
@@ -126,55 +258,177 @@ Return your response as JSON with this structure:
 Generate 5-10 entities and 4-8 intents based on the problem domain.
 """
 
+    async def generate_utterances(
+        self,
+        intent: Dict,
+        entities: List[Dict],
+        count: int,
+        variation: str = "0",
+        provider: str = "claude"
+    ) -> List[str]:
+        """Generate annotated example utterances for one intent (``[value](ENTITY)`` markup)"""
+        entity_lines = "\n".join(f"- {e['name']}: {e.get('description', '')}" for e in entities)
+        prompt = f"""You are generating training data for a DistilBERT entity and intent recognition model.
+
+Intent: {intent['name']} - {intent.get('description', '')}
+
+Entities:
+{entity_lines}
+
+Write {count} distinct, realistic user utterances expressing this intent. Vary wording, length and
+formality. Mention entities where natural and mark every mention inline as [value](ENTITY_NAME)
+using only the entity names listed above, e.g. "create an order for [Acme Corp](SUPPLIER_NAME)".
+
+Return your response as JSON with this structure:
+{{
+    "utterances": ["utterance 1", "utterance 2", ...]
+}}
+
+Batch: {variation}
+"""
         response_text = await self._call_llm(prompt, provider)
-        
-        # Try to parse JSON from response
+        utterances = _parse_json_response(response_text, {"utterances": []}).get("utterances", [])
+        return [u for u in utterances if isinstance(u, str)] if isinstance(utterances, list) else []
+
+    async def _stream_json(self, prompt: str, provider: str, default: Dict):
+        """Yield ``(field, value)`` as soon as each top-level field or list item is complete.
+
+        List fields yield one event per item. The last event is always
+        ``("done", {"result": ..., "fallback": ...})`` with the whole response, or
+        ``default`` if the output was malformed.
+        """
+        parser = IncrementalJSONParser()
+        async for text in self._stream_llm(prompt, provider):
+            for path, value in parser.feed(text):
+                yield path[0], value
         try:
-            # Extract JSON from markdown code blocks if present
-            if "```json" in response_text:
-                json_start = response_text.find("```json") + 7
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-            elif "```" in response_text:
-                json_start = response_text.find("```") + 3
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-            
-            result = json.loads(response_text)
-        except Exception as e:
-            # Fallback if JSON parsing fails
-            result = {
-                "entities": [
-                    {"name": "PERSON", "description": "Person names"},
-                    {"name": "LOCATION", "description": "Geographic locations"},
-                    {"name": "DATE", "description": "Dates and times"}
-                ],
-                "intents": [
-                    {"name": "query_information", "description": "User wants to query information"},
-                    {"name": "request_action", "description": "User wants to request an action"}
-                ]
-            }
-        
-        return result
+            result = parser.result()
+            fallback = not isinstance(result, dict) or not all(key in result for key in default)
+        except ValueError:
+            fallback = True
+        if fallback:
+            result = copy.deepcopy(default)
+        yield "done", {"result": result, "fallback": fallback}
+
+    async def _stream_llm(self, prompt: str, provider: str):
+        """Yield the response text as the provider generates it"""
+        if provider == "openai" and self.openai_client:
+            model = OPENAI_MODEL
+        elif provider == "claude" and self.anthropic_client:
+            model = ANTHROPIC_MODEL
+        else:
+            # Mock and Qwen responses arrive in one piece
+            yield await self._call_llm(prompt, provider)
+            return
+
+        key = make_cache_key(provider, model, prompt)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        start = time.perf_counter()
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            error = None
+            async with self._semaphores[provider]:
+                try:
+                    stream = await self._open_stream(provider, prompt)
+                except Exception as e:
+                    LLM_ERRORS.inc(provider=provider, error=type(e).__name__)
+                    error = e
+                else:
+                    # Once text has been forwarded the request can't be retried transparently
+                    async for text in stream:
+                        chunks.append(text)
+                        yield text
+            if error is None:
+                break
+            if attempt == LLM_MAX_RETRIES or not _is_retryable(error):
+                raise error
+            await asyncio.sleep(_retry_delay(error, attempt))
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, provider=provider)
+        self.response_cache.set(key, "".join(chunks))
+
+    async def _open_stream(self, provider: str, prompt: str):
+        """Start a streaming completion and return an async iterator over its text deltas"""
+        if provider == "openai":
+            stream = await self.openai_client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                stream=True
+            )
+
+            async def texts():
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            return texts()
+
+        stream = await self.anthropic_client.messages.create(
+            model=ANTHROPIC_MODEL,
+            max_tokens=4000,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+
+        async def texts():
+            async for event in stream:
+                if event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                    yield event.delta.text
+        return texts()
+
+    async def _request_with_retries(self, provider: str, request):
+        """Run a provider request under its concurrency limit, retrying transient failures"""
+        start = time.perf_counter()
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                async with self._semaphores[provider]:
+                    response = await request()
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, provider=provider)
+                return response
+            except Exception as e:
+                LLM_ERRORS.inc(provider=provider, error=type(e).__name__)
+                if attempt == LLM_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                # Back off outside the semaphore so waiting doesn't hold a slot
+                await asyncio.sleep(_retry_delay(e, attempt))
 
     async def _call_llm(self, prompt: str, provider: str) -> str:
         """Call the specified LLM provider"""
         
         if provider == "openai" and self.openai_client:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7
+            async def request():
+                response = await self.openai_client.chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.7
+                )
+                if response.usage is not None:
+                    LLM_TOKENS.inc(response.usage.prompt_tokens, provider=provider, direction="input")
+                    LLM_TOKENS.inc(response.usage.completion_tokens, provider=provider, direction="output")
+                return response.choices[0].message.content
+            return await self.response_cache.get_or_call(
+                make_cache_key(provider, OPENAI_MODEL, prompt),
+                lambda: self._request_with_retries(provider, request)
             )
-            return response.choices[0].message.content
         
         elif provider == "claude" and self.anthropic_client:
-            message = self.anthropic_client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=4000,
-                messages=[{"role": "user", "content": prompt}]
+            async def request():
+                message = await self.anthropic_client.messages.create(
+                    model=ANTHROPIC_MODEL,
+                    max_tokens=4000,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+                if message.usage is not None:
+                    LLM_TOKENS.inc(message.usage.input_tokens, provider=provider, direction="input")
+                    LLM_TOKENS.inc(message.usage.output_tokens, provider=provider, direction="output")
+                return message.content[0].text
+            return await self.response_cache.get_or_call(
+                make_cache_key(provider, ANTHROPIC_MODEL, prompt),
+                lambda: self._request_with_retries(provider, request)
             )
-            return message.content[0].text
         
         elif provider == "qwen":
             # Qwen API integration example (requires dashscope package)
@@ -1,11 +1,23 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 import os
+import sys
+import json
+import time
+import hashlib
 from dotenv import load_dotenv
 from llm_service import LLMService
-from training_service import TrainingService
+from training_service import TrainingService, STREAM_FIELDS
+from scheduler import QueueFullError
+from inference_service import InferenceService
+from synthetic_data import DatasetGenerator, list_datasets
+from job_store import TERMINAL_STATUSES
+from progress_hub import JOBS_CHANNEL
+from metrics import REGISTRY, HTTP_REQUEST_SECONDS
+from profiler import profile_path
 
 load_dotenv()
 
@@ -41,6 +53,18 @@ except Exception as e:
     print(f"Warning: Failed to initialize TrainingService: {e}")
     training_service = None
 
+try:
+    dataset_generator = DatasetGenerator(llm_service)
+except Exception as e:
+    print(f"Warning: Failed to initialize DatasetGenerator: {e}")
+    dataset_generator = None
+
+try:
+    inference_service = InferenceService(training_service.models_dir) if training_service else None
+except Exception as e:
+    print(f"Warning: Failed to initialize InferenceService: {e}")
+    inference_service = None
+
 
 class ProblemStatement(BaseModel):
     problem: str
@@ -81,12 +105,106 @@ class TrainingConfig(BaseModel):
     learning_rate: float = 2e-5
     train_test_split: float = 0.8
     max_sequence_length: int = 128
+    export_quantized: bool = False
+    export_onnx: bool = False
+    parity_threshold: float = 0.98
+    # Weights of the entity tagging and intent losses of the joint model
+    token_loss_weight: float = 1.0
+    intent_loss_weight: float = 1.0
+    # Warm-start from this job's model: train on new or changed examples plus replay_ratio old ones per new one
+    parent_job_id: Optional[str] = None
+    replay_ratio: float = 1.0
+    # Keep the embeddings and this many lower encoder layers fixed
+    freeze_layers: int = 0
+    # Train low-rank adapters and heads on a frozen, shared model_base instead of the whole model
+    use_adapter: bool = False
+    adapter_rank: int = 8
+    adapter_alpha: float = 16.0
+    # Batch examples of similar length together, and pack several short examples into each row
+    group_by_length: bool = True
+    pack_sequences: bool = False
+    # Students distilled from the trained model, e.g. [{"layers": 2}, {"layers": 4, "hidden_size": 384}]
+    distill_students: Optional[List[Dict[str, int]]] = None
+    # None uses epochs / learning_rate
+    distill_epochs: Optional[int] = None
+    distill_learning_rate: Optional[float] = None
+    distill_temperature: float = 2.0
+    # Share of the hard-label loss; the teacher's soft labels get the rest
+    distill_alpha: float = 0.5
+    distill_hidden_weight: float = 1.0
+    dataset: Optional[str] = None
+    dataset_version: Optional[int] = None
+    # None uses CHECKPOINT_EVERY_STEPS / CHECKPOINT_KEEP; 0 steps disables checkpointing
+    checkpoint_every_steps: Optional[int] = None
+    keep_checkpoints: Optional[int] = None
+    # Write a flame-graph profile of the run (GET /api/jobs/{job_id}/profile)
+    profile: bool = False
 
 
 class TrainingRequest(BaseModel):
     entities: List[Entity]
     intents: List[Intent]
     config: TrainingConfig
+    # Higher runs first when the worker pool is busy
+    priority: int = 0
+    user_id: Optional[str] = None
+
+
+class ScoringRequest(BaseModel):
+    model_job_id: str
+    input_path: str
+    output_path: str
+    text_field: str = "text"
+    id_field: Optional[str] = None
+    chunk_size: int = 1000
+    batch_size: int = 32
+    artifact: str = "fp32"
+    # Score with a distilled student of the model (e.g. "L2") instead of the model itself
+    student: Optional[str] = None
+    profile: bool = False
+    priority: int = 0
+    user_id: Optional[str] = None
+
+
+class SweepRequest(BaseModel):
+    entities: List[Entity]
+    intents: List[Intent]
+    config: TrainingConfig
+    # Per field: a list of choices or {"min": ..., "max": ..., "log": bool}
+    search_space: Dict[str, Any]
+    num_trials: int = 8
+    strategy: str = "asha"
+    reduction_factor: int = 3
+    min_epochs: int = 1
+    seed: int = 42
+    priority: int = 0
+    user_id: Optional[str] = None
+
+
+class DatasetConfig(BaseModel):
+    name: Optional[str] = None
+    examples_per_intent: int = 100
+    llm_provider: str = "claude"
+    llm_batch_size: int = 20
+    llm_ratio: float = 0.25
+    seed: int = 42
+
+
+class DatasetRequest(BaseModel):
+    entities: List[Entity]
+    intents: List[Intent]
+    config: DatasetConfig = DatasetConfig()
+
+
+class PredictRequest(BaseModel):
+    job_id: str
+    texts: List[str]
+    # Name of a distilled student of the job's model (e.g. "L2"); None uses the model itself
+    student: Optional[str] = None
+
+
+SSE_HEARTBEAT_SECONDS = 15
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 
 @app.get("/")
@@ -126,6 +244,51 @@ async def generate_entities_intents(request: AnalysisRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _llm_event_response(events) -> StreamingResponse:
+    """Forward ``(event, data)`` pairs from an LLMService stream as Server-Sent Events"""
+    async def body():
+        try:
+            async for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/api/analyze-problem/stream")
+async def stream_analyze_problem(request: ProblemStatement):
+    """Stream the domain and each clarification question as soon as it is generated"""
+    if llm_service is None:
+        raise HTTPException(status_code=503, detail="LLM service not available")
+    return _llm_event_response(
+        llm_service.stream_analyze_problem(request.problem, request.llm_provider)
+    )
+
+
+@app.post("/api/generate-entities-intents/stream")
+async def stream_entities_intents(request: AnalysisRequest):
+    """Stream each entity and intent as soon as it is generated"""
+    if llm_service is None:
+        raise HTTPException(status_code=503, detail="LLM service not available")
+    return _llm_event_response(
+        llm_service.stream_entities_intents(
+            request.problem,
+            request.domain,
+            request.questions,
+            request.llm_provider
+        )
+    )
+
+
+@app.get("/api/llm-cache/stats")
+async def get_llm_cache_stats():
+    """Get LLM response cache hit/miss counters"""
+    if llm_service is None:
+        raise HTTPException(status_code=503, detail="LLM service not available")
+    return llm_service.response_cache.stats()
+
+
 @app.post("/api/start-training")
 async def start_training(request: TrainingRequest):
     """Start DistilBERT model training"""
@@ -133,25 +296,160 @@ async def start_training(request: TrainingRequest):
         raise HTTPException(status_code=503, detail="Training service not available")
     try:
         job_id = await training_service.start_training(
+            entities=request.entities,
+            intents=request.intents,
+            config=request.config,
+            priority=request.priority,
+            user_id=request.user_id
+        )
+        return {"job_id": job_id, "status": "started", **(training_service.scheduler.queue_info(job_id) or {})}
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/start-sweep")
+async def start_sweep(request: SweepRequest):
+    """Start a hyperparameter sweep; trials that fall behind are stopped early"""
+    if training_service is None:
+        raise HTTPException(status_code=503, detail="Training service not available")
+    try:
+        sweep_id = await training_service.start_sweep(
+            entities=request.entities,
+            intents=request.intents,
+            config=request.config,
+            search_space=request.search_space,
+            num_trials=request.num_trials,
+            strategy=request.strategy,
+            reduction_factor=request.reduction_factor,
+            min_epochs=request.min_epochs,
+            seed=request.seed,
+            priority=request.priority,
+            user_id=request.user_id
+        )
+        return {"job_id": sweep_id, "status": "started"}
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/generate-dataset")
+async def generate_dataset(request: DatasetRequest):
+    """Start generating a versioned synthetic training dataset; track it like a training job"""
+    if training_service is None or dataset_generator is None:
+        raise HTTPException(status_code=503, detail="Training service not available")
+    try:
+        job_id = await training_service.start_dataset_generation(
+            dataset_generator,
             entities=request.entities,
             intents=request.intents,
             config=request.config
         )
         return {"job_id": job_id, "status": "started"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/datasets")
+async def get_datasets():
+    """List generated datasets, one manifest per version"""
+    try:
+        return {"datasets": list_datasets()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/start-scoring")
+async def start_scoring(request: ScoringRequest):
+    """Start a bulk scoring job; paths are relative to the scoring data directory. One pool worker scores the whole file"""
+    if training_service is None:
+        raise HTTPException(status_code=503, detail="Training service not available")
+    try:
+        job_id = await training_service.start_scoring(request)
+        return {"job_id": job_id, "status": "started"}
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/training-resume/{job_id}")
+async def resume_training(job_id: str):
+    """Resume a stopped or failed training job from its latest checkpoint"""
+    if training_service is None:
+        raise HTTPException(status_code=503, detail="Training service not available")
+    try:
+        return await training_service.resume_training(job_id)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/scoring-resume/{job_id}")
+async def resume_scoring(job_id: str):
+    """Resume a stopped or failed scoring job from its last checkpoint"""
+    if training_service is None:
+        raise HTTPException(status_code=503, detail="Training service not available")
+    try:
+        return await training_service.resume_scoring(job_id)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header names ``etag``"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    # If-None-Match uses weak comparison
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def _cached_json(request: Request, body: bytes, etag: str) -> Response:
+    """``body`` with its ETag, or an empty 304 when the client already has this version"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
 @app.get("/api/training-status/{job_id}")
-async def get_training_status(job_id: str):
-    """Get training job status"""
+async def get_training_status(
+    job_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="comma-separated fields to return, static ones included")
+):
+    """Get training job status without its static fields (entities, intents, config), or only ``fields``"""
     if training_service is None:
         raise HTTPException(status_code=503, detail="Training service not available")
+    selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
     try:
-        status = await training_service.get_training_status(job_id)
-        return status
+        status = await training_service.get_training_status(job_id, selected)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    # Queue position and ETA are computed on read, so they are part of the validator
+    etag = f'"{status.get("version", 0)}-{status.get("queue_position", "")}-{status.get("eta_seconds", "")}"'
+    return _cached_json(request, json.dumps(status).encode(), etag)
 
 
 @app.post("/api/training-stop/{job_id}")
@@ -169,22 +467,132 @@ async def stop_training(job_id: str):
 
 
 @app.get("/api/training-jobs")
-async def get_all_training_jobs():
-    """Get all training jobs and their status"""
+async def get_all_training_jobs(
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=0, le=500),
+    offset: int = Query(0, ge=0)
+):
+    """Get training job counters and a page of jobs, optionally filtered by status"""
     if training_service is None:
         raise HTTPException(status_code=503, detail="Training service not available")
     try:
-        jobs_info = training_service.get_all_jobs()
+        jobs_info = training_service.get_all_jobs(status=status, limit=limit, offset=offset)
         return jobs_info
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse_response(request: Request, subscription, snapshot: Dict, close_on_terminal: bool) -> StreamingResponse:
+    """Stream a snapshot followed by the deltas published on a subscription"""
+    async def events():
+        try:
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            if close_on_terminal and snapshot.get("status") in TERMINAL_STATUSES:
+                return
+            while True:
+                delta = await subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if await request.is_disconnected():
+                    return
+                if delta is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(delta)}\n\n"
+                if close_on_terminal and delta.get("status") in TERMINAL_STATUSES:
+                    return
+        finally:
+            training_service.progress_hub.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.get("/api/training-events/{job_id}")
+async def stream_training_status(job_id: str, request: Request):
+    """Server-Sent Events stream of a job's status: a snapshot, then only changed fields"""
+    if training_service is None:
+        raise HTTPException(status_code=503, detail="Training service not available")
+    # Subscribe before reading the snapshot so no update falls in between
+    subscription = training_service.progress_hub.subscribe(job_id)
+    try:
+        job = await training_service.get_training_status(job_id)
+    except ValueError as e:
+        training_service.progress_hub.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail=str(e))
+    training_service.relay_from(job_id, job)
+    snapshot = {field: job.get(field) for field in STREAM_FIELDS}
+    return _sse_response(request, subscription, snapshot, close_on_terminal=True)
+
+
+@app.get("/api/training-jobs/events")
+async def stream_training_jobs(request: Request):
+    """Server-Sent Events stream of the job counters, pushed on every status change"""
+    if training_service is None:
+        raise HTTPException(status_code=503, detail="Training service not available")
+    subscription = training_service.progress_hub.subscribe(JOBS_CHANNEL)
+    snapshot = training_service.get_job_counters()
+    return _sse_response(request, subscription, snapshot, close_on_terminal=False)
+
+
+@app.post("/api/predict")
+async def predict(request: PredictRequest):
+    """Predict entities and intent for each text with a trained model"""
+    if inference_service is None:
+        raise HTTPException(status_code=503, detail="Inference service not available")
+    try:
+        predictions = await inference_service.predict(request.job_id, request.texts, request.student)
+        response = {"job_id": request.job_id, "predictions": predictions}
+        if request.student:
+            response["student"] = request.student
+        return response
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+_presets_body = None
+
+
 @app.get("/api/presets")
-async def get_presets():
+async def get_presets(request: Request):
     """Get available preset templates"""
-    from presets import PRESET_DATA
-    return PRESET_DATA
+    global _presets_body
+    if _presets_body is None:
+        # The presets never change at runtime: serialize and hash them once
+        from presets import PRESET_DATA
+        body = json.dumps(PRESET_DATA).encode()
+        _presets_body = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+    body, etag = _presets_body
+    return _cached_json(request, body, etag)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not raw path, so job ids don't explode the label set
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=str(response.status_code)
+    )
+    return response
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/jobs/{job_id}/profile")
+async def get_job_profile(job_id: str):
+    """Folded-stack profile of a job started with ``profile: true``, for flamegraph.pl or speedscope"""
+    path = profile_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"No profile recorded for job {job_id}")
+    return FileResponse(path, media_type="text/plain", filename=f"{job_id}.folded")
 
 
 @app.get("/api/health")
@@ -192,14 +600,49 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Which subsystems are initialized and which heavy dependencies are loaded; 503 until all are ready"""
+    subsystems = {
+        "llm": {
+            "ready": llm_service is not None,
+            "clients_loaded": llm_service.loaded_clients() if llm_service else []
+        },
+        "training": training_service.readiness() if training_service else {"ready": False},
+        "datasets": {"ready": dataset_generator is not None},
+        "inference": {
+            "ready": inference_service is not None,
+            "models_loaded": inference_service.loaded_models() if inference_service else []
+        },
+        # Deferred until the first prediction; training imports it only in worker processes
+        "ml_stack": {"ready": True, "loaded": "torch" in sys.modules}
+    }
+    ready = all(subsystem["ready"] for subsystem in subsystems.values())
+    body = {"status": "ready" if ready else "not_ready", "subsystems": subsystems}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Log startup information"""
-    import sys
     print(f"Python version: {sys.version}")
     print(f"Server starting on port: {os.getenv('PORT', '8000')}")
     print(f"LLM Service initialized: {llm_service is not None}")
     print(f"Training Service initialized: {training_service is not None}")
+    if training_service is not None:
+        # Heartbeat and sync stop signals with the other API workers sharing the job store
+        training_service.start_coordination()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop worker processes and threads and close LLM connections"""
+    if training_service is not None:
+        training_service.shutdown()
+    if inference_service is not None:
+        inference_service.shutdown()
+    if llm_service is not None:
+        await llm_service.close()
 
 
 if __name__ == "__main__":
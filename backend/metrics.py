@@ -0,0 +1,205 @@
+"""In-process metrics exposed in the Prometheus text format at ``/metrics``.
+
+A deliberately small registry: counters, gauges (optionally computed at
+scrape time) and cumulative histograms, each with an optional fixed set of
+label names. Metrics from training workers are reported to the API process
+through the job event queue and recorded here.
+"""
+
+import os
+import bisect
+import threading
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Seconds; spans fast API handlers up to multi-minute training phases
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        # Computed at scrape time; returns a number, or {label values tuple: number} for labelled gauges
+        self.function = function
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def collect(self):
+        if self.function is not None:
+            try:
+                values = self.function()
+            except Exception:
+                # A broken source must not take the whole scrape down
+                return []
+            items = sorted(values.items()) if isinstance(values, dict) else [((), values)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum]
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def collect(self):
+        lines = []
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Re-registering returns the existing metric, so modules can be imported more than once
+            return self._metrics.setdefault(metric.name, metric)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            samples = metric.collect()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (), function: Optional[Callable] = None) -> Gauge:
+    metric = REGISTRY.register(Gauge(name, documentation, labelnames, function))
+    if function is not None:
+        # The newest source wins, e.g. a service that was created again
+        metric.function = function
+    return metric
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def process_rss_bytes() -> int:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Peak rather than current RSS where /proc is unavailable (kilobytes on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# Metrics shared by several modules
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response starts", ("method", "route", "status")
+)
+LLM_REQUEST_SECONDS = histogram("llm_request_duration_seconds", "LLM provider call latency, retries included", ("provider",))
+LLM_ERRORS = counter("llm_request_errors_total", "Failed LLM provider attempts", ("provider", "error"))
+LLM_TOKENS = counter("llm_tokens_total", "Tokens reported by LLM providers", ("provider", "direction"))
+JOB_PHASE_SECONDS = histogram("job_phase_duration_seconds", "Time jobs spend in each status", ("job_type", "phase"))
+TRAINING_EPOCH_SECONDS = histogram("training_epoch_duration_seconds", "Wall time of one training epoch")
+TRAINING_SAMPLES_PER_SECOND = histogram(
+    "training_samples_per_second", "Training throughput per epoch",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+TRAINING_TOKENS_PER_SECOND = histogram(
+    "training_tokens_per_second", "Non-padding training tokens per second per epoch",
+    buckets=(100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+)
+PREDICT_BATCH_SECONDS = histogram("predict_batch_duration_seconds", "Model time of one prediction micro-batch")
+PREDICT_BATCH_SIZE = histogram(
+    "predict_batch_size", "Requests per prediction micro-batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+PROCESS_RSS = gauge("process_resident_memory_bytes", "Resident memory of the API process", function=process_rss_bytes)
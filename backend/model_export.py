@@ -0,0 +1,246 @@
+"""Optimized inference artifacts written next to a trained model.
+
+Besides the fp32 ``joint`` model a job can export:
+
+- ``int8/``: dynamic int8 quantized weights of the joint model
+- ``onnx/``: an ONNX graph of the joint model, runnable with onnxruntime on CPU
+
+Each artifact is checked against the fp32 model on the validation split and
+its size and latency are recorded in ``artifacts.json``. Models trained
+before the joint model have separate ``token``/``intent`` files instead.
+"""
+
+import os
+import json
+import time
+import inspect
+from typing import Dict
+
+# Optional imports for export functionality
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+try:
+    import onnxruntime as ort
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+
+ARTIFACTS_FILE = "artifacts.json"
+
+# Minimum token and intent agreement with fp32 for an artifact to be served
+DEFAULT_PARITY_THRESHOLD = 0.98
+
+# Passes over the validation split when timing a variant
+LATENCY_REPEATS = 3
+
+
+def quantize(model):
+    """Dynamic int8 quantization of every Linear layer (returns a copy)"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _quantized_linears(model) -> Dict:
+    return {
+        name: module for name, module in model.named_modules()
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear)
+    }
+
+
+def save_quantized(model, path: str):
+    """Write a quantized model as plain tensors in safetensors format.
+
+    The regular state dict holds packed params and ``torch.qint8`` dtype values,
+    which don't round-trip through safetensors; each quantized Linear is stored
+    as its int8 weights, scale, zero point and bias instead.
+    """
+    from safetensors.torch import save_file
+    linears = _quantized_linears(model)
+    tensors = {}
+    for name, module in linears.items():
+        weight, bias = module.weight(), module.bias()
+        tensors[f"{name}.weight_int8"] = weight.int_repr().contiguous()
+        tensors[f"{name}.weight_scale"] = torch.tensor(weight.q_scale())
+        tensors[f"{name}.weight_zero_point"] = torch.tensor(weight.q_zero_point())
+        if bias is not None:
+            tensors[f"{name}.bias"] = bias.contiguous()
+    for key, value in model.state_dict().items():
+        if key.rsplit(".", 1)[0] not in linears and "_packed_params" not in key:
+            tensors[key] = value.contiguous()
+    save_file(tensors, path)
+
+
+def load_quantized(skeleton, weights_path: str):
+    """Quantize the fp32 ``skeleton`` (architecture only) and load weights saved by ``save_quantized``"""
+    from safetensors.torch import load_file
+    model = quantize(skeleton.eval())
+    tensors = load_file(weights_path)
+    with torch.no_grad():
+        for name, module in _quantized_linears(model).items():
+            weight = torch._make_per_tensor_quantized_tensor(
+                tensors.pop(f"{name}.weight_int8"),
+                tensors.pop(f"{name}.weight_scale").item(),
+                tensors.pop(f"{name}.weight_zero_point").item()
+            )
+            module.set_weight_bias(weight, tensors.pop(f"{name}.bias", None))
+        for key, value in tensors.items():
+            module_name, attr = key.rsplit(".", 1)
+            getattr(model.get_submodule(module_name), attr).copy_(value)
+    return model
+
+
+class _LogitsOnly(torch.nn.Module if TORCH_AVAILABLE else object):
+    """Positional (input_ids, attention_mask) -> (token_logits, intent_logits) wrapper for tracing"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        output = self.model(input_ids=input_ids, attention_mask=attention_mask)
+        return output.token_logits, output.intent_logits
+
+
+def export_onnx(model, path: str, example: Dict):
+    """Export a joint model to ONNX with dynamic batch and sequence dimensions"""
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # The TorchScript exporter handles dynamic_axes without extra dependencies
+        kwargs["dynamo"] = False
+    axes = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        _LogitsOnly(model).eval(),
+        (example["input_ids"], example["attention_mask"]),
+        path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["token_logits", "intent_logits"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_logits": axes, "intent_logits": {0: "batch"}},
+        opset_version=17,
+        **kwargs
+    )
+    # Export restores the wrapper's training flag onto the wrapped model
+    model.eval()
+
+
+class OnnxLogits:
+    """Callable running an exported graph with onnxruntime, returning its outputs as torch tensors"""
+
+    def __init__(self, path: str, num_threads: int = None):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, input_ids, attention_mask):
+        outputs = self.session.run(None, {
+            "input_ids": input_ids.numpy(),
+            "attention_mask": attention_mask.numpy()
+        })
+        return tuple(torch.from_numpy(output) for output in outputs)
+
+
+def joint_logits(model):
+    """Adapt a JointModel to the ``(input_ids, attention_mask) -> (token_logits, intent_logits)`` call of OnnxLogits"""
+    def logits(input_ids, attention_mask):
+        output = model(input_ids=input_ids, attention_mask=attention_mask)
+        return output.token_logits, output.intent_logits
+    return logits
+
+
+def hf_logits(model):
+    """Adapt a transformers model to an ``(input_ids, attention_mask) -> logits`` call"""
+    return lambda input_ids, attention_mask: model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def timed_predictions(logits_fn, data: Dict, batch_size: int):
+    """Tag and intent predictions of one variant over ``data``, plus its mean latency per batch in ms"""
+    size = data["input_ids"].shape[0]
+    timings = []
+    with torch.inference_mode():
+        for repeat in range(LATENCY_REPEATS + 1):
+            tags, intents = [], []
+            started = time.perf_counter()
+            for start in range(0, size, batch_size):
+                ids = data["input_ids"][start:start + batch_size]
+                mask = data["attention_mask"][start:start + batch_size]
+                token_logits, intent_logits = logits_fn(ids, mask)
+                tags.append(token_logits.argmax(-1))
+                intents.append(intent_logits.argmax(-1))
+            # The first pass only warms up kernels and allocators
+            if repeat > 0:
+                timings.append(time.perf_counter() - started)
+    batches = -(-size // batch_size)
+    latency_ms = sum(timings) / len(timings) / batches * 1000
+    return torch.cat(tags), torch.cat(intents), latency_ms
+
+
+def _size_mb(*paths: str) -> float:
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            total += sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return round(total / (1024 * 1024), 2)
+
+
+def export_artifacts(model, val_data: Dict, model_path: str, config: Dict) -> Dict:
+    """Write the artifacts of a joint ``model`` requested by ``config`` and compare them with fp32.
+
+    Must run after the fp32 model is saved under ``model_path``. Returns the
+    summary that is also written to ``artifacts.json``.
+    """
+    from joint_model import JOINT_DIR
+    batch_size = config.get("batch_size", 16)
+    threshold = config.get("parity_threshold", DEFAULT_PARITY_THRESHOLD)
+    model.eval()
+
+    ref_tags, ref_intents, fp32_latency = timed_predictions(joint_logits(model), val_data, batch_size)
+    label_mask = val_data["labels"] != -100
+    artifacts = {
+        "fp32": {
+            "size_mb": _size_mb(os.path.join(model_path, JOINT_DIR)),
+            "latency_ms": round(fp32_latency, 3),
+            "batch_size": batch_size
+        }
+    }
+
+    def compare(name: str, logits_fn, files):
+        tags, intents, latency = timed_predictions(logits_fn, val_data, batch_size)
+        token_agreement = (tags[label_mask] == ref_tags[label_mask]).float().mean().item()
+        intent_agreement = (intents == ref_intents).float().mean().item()
+        artifacts[name] = {
+            "size_mb": _size_mb(*files),
+            "latency_ms": round(latency, 3),
+            "speedup": round(fp32_latency / max(latency, 1e-9), 2),
+            "token_agreement": round(token_agreement, 4),
+            "intent_agreement": round(intent_agreement, 4),
+            "parity_passed": token_agreement >= threshold and intent_agreement >= threshold
+        }
+
+    if config.get("export_quantized"):
+        int8_dir = os.path.join(model_path, "int8")
+        os.makedirs(int8_dir, exist_ok=True)
+        quantized = quantize(model)
+        files = [os.path.join(int8_dir, "joint.safetensors")]
+        save_quantized(quantized, files[0])
+        compare("int8", joint_logits(quantized), files)
+
+    if config.get("export_onnx"):
+        if not ONNX_AVAILABLE:
+            artifacts["onnx"] = {"error": "onnxruntime is not installed"}
+        else:
+            onnx_dir = os.path.join(model_path, "onnx")
+            os.makedirs(onnx_dir, exist_ok=True)
+            example = {k: val_data[k][:2] for k in ("input_ids", "attention_mask")}
+            files = [os.path.join(onnx_dir, "joint.onnx")]
+            export_onnx(model, files[0], example)
+            compare("onnx", OnnxLogits(files[0]), files)
+
+    with open(os.path.join(model_path, ARTIFACTS_FILE), "w") as f:
+        json.dump(artifacts, f, indent=2)
+    return artifacts
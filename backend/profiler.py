@@ -0,0 +1,93 @@
+"""Opt-in sampling profiler for individual training and scoring jobs.
+
+A background thread samples the profiled thread's Python stack at a fixed
+interval and counts identical stacks. The result is written in the folded
+format (``frame;frame;frame count`` per line) that flamegraph.pl, speedscope
+and inferno render as a flame graph.
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Optional
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+
+
+def default_profiles_dir() -> str:
+    default_dir = os.path.join(os.path.dirname(__file__), "..", "data", "profiles")
+    return os.getenv("PROFILES_DIR", default_dir)
+
+
+def profile_path(job_id: str, profiles_dir: Optional[str] = None) -> str:
+    return os.path.join(profiles_dir or default_profiles_dir(), f"{os.path.basename(job_id)}.folded")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """Context manager that profiles the thread it is entered on"""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_folded(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp_path, path)
+
+
+def profiled(job_id: str, enabled: bool, fn, *args, **kwargs):
+    """Call ``fn``, writing a folded-stack profile of the call for ``job_id`` when ``enabled``"""
+    if not enabled:
+        return fn(*args, **kwargs)
+    profiler = SamplingProfiler()
+    start = time.time()
+    try:
+        with profiler:
+            result = fn(*args, **kwargs)
+    finally:
+        profiler.write_folded(profile_path(job_id))
+    if isinstance(result, dict):
+        result = dict(result, profile={
+            "path": profile_path(job_id),
+            "samples": profiler.samples,
+            "seconds": round(time.time() - start, 2)
+        })
+    return result
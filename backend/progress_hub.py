@@ -0,0 +1,72 @@
+"""In-process fan-out of training job updates to streaming clients"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+
+# Channel carrying the job counters shown in the job list
+JOBS_CHANNEL = "*"
+
+
+class Subscription:
+    """Updates waiting to be delivered to one client.
+
+    Deltas are merged rather than queued, so a slow client only ever holds the
+    latest value of each field and memory per client stays bounded.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def push(self, delta: Dict):
+        self._pending.update(delta)
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Wait for the next batch of changes; returns None on timeout"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        pending, self._pending = self._pending, {}
+        self._ready.clear()
+        return pending
+
+
+class ProgressHub:
+    """Routes each published update to every subscriber of its channel.
+
+    Producers publish once per change regardless of how many browser tabs are
+    watching; must be used from the event loop thread. Only this process's
+    subscribers are reached: updates of jobs owned by another API worker are
+    relayed from the job store by TrainingService.
+    """
+
+    def __init__(self):
+        self._subscriptions = {}
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(channel)
+        self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.channel)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.channel]
+
+    def publish(self, channel: str, delta: Dict):
+        for subscription in self._subscriptions.get(channel, ()):
+            subscription.push(delta)
+
+    def subscriber_count(self, channel: str) -> int:
+        return len(self._subscriptions.get(channel, ()))
+
+    def channels(self) -> List[str]:
+        """Channels with at least one subscriber"""
+        return list(self._subscriptions)
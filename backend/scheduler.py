@@ -0,0 +1,233 @@
+"""Admission control for jobs that run in the training worker pool.
+
+Every pool job is submitted here first and waits until a worker slot is free
+and its estimated memory fits in the budget. Worker slots are also the CPU
+limit: each worker process runs with ``TRAINING_THREADS_PER_WORKER`` threads,
+so a slot is a fixed CPU share. Waiting jobs are ordered by
+priority, then by how many jobs their user already has running (fair share),
+then by arrival.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from typing import Callable, Dict, Optional
+
+# Approximate parameter counts for common bases; unknown models fall back to DistilBERT
+MODEL_PARAMS = {
+    "distilbert-base-uncased": 66_000_000,
+    "distilbert-base-cased": 65_000_000,
+    "distilbert-base-multilingual-cased": 134_000_000,
+    "bert-base-uncased": 110_000_000,
+    "bert-base-cased": 108_000_000,
+    "roberta-base": 125_000_000,
+    "bert-large-uncased": 335_000_000,
+}
+DEFAULT_MODEL_PARAMS = 66_000_000
+
+# Default seconds per unit of work (epoch for training, whole job otherwise) until jobs have been timed
+DEFAULT_SECONDS_PER_UNIT = {"training": 30.0, "scoring": 120.0}
+
+# A job waiting longer than this stops smaller jobs from overtaking it
+STARVATION_SECONDS = 300
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler queue has no room for another job"""
+
+
+def _model_params(model_base: str) -> int:
+    if model_base in MODEL_PARAMS:
+        return MODEL_PARAMS[model_base]
+    config_path = os.path.join(model_base, "config.json")
+    if os.path.exists(config_path):
+        import json
+        with open(config_path) as f:
+            config = json.load(f)
+        hidden = config.get("dim") or config.get("hidden_size") or 768
+        layers = config.get("n_layers") or config.get("num_hidden_layers") or 6
+        vocab = config.get("vocab_size", 30522)
+        return 12 * layers * hidden * hidden + vocab * hidden
+    return DEFAULT_MODEL_PARAMS
+
+
+def estimate_memory_mb(config: Dict, job_type: str = "training") -> int:
+    """Rough peak resident memory of one job, from its model size, batch size and sequence length"""
+    params = _model_params(config.get("model_base") or config.get("model_job_id") or "")
+    batch_size = config.get("batch_size", 16)
+    seq_len = config.get("max_sequence_length", 128)
+    # DistilBERT-shaped activations: ~6 layers x 768 hidden, plus 12 attention maps per layer
+    activations = batch_size * seq_len * (6 * 768 * 34 + 6 * 12 * seq_len * 5)
+    if job_type == "training":
+        # One joint model: fp32 weights, gradients and two AdamW moments
+        weights = params * 4 * 4
+        if config.get("use_adapter"):
+            # Frozen weights have no gradients or optimizer moments; the adapters are negligible
+            weights = params * 4
+        if config.get("distill_students"):
+            # The frozen teacher's weights stay resident while each (no larger) student trains
+            weights += params * 4
+    else:
+        weights = params * 4
+        activations /= 8
+    # Interpreter, torch and tokenizer baseline per worker process
+    return int((weights + activations) / (1024 * 1024)) + 400
+
+
+def default_memory_budget_mb() -> int:
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        return int(total * 0.75 / (1024 * 1024))
+    except (ValueError, OSError, AttributeError):
+        return 8192
+
+
+class JobScheduler:
+    def __init__(self, max_running: int, memory_budget_mb: int, max_queue: int, on_change: Optional[Callable] = None):
+        self.max_running = max_running
+        self.memory_budget_mb = memory_budget_mb
+        self.max_queue = max_queue
+        # Called after every admission or cancellation so queue positions can be republished
+        self.on_change = on_change
+        self._order = itertools.count()
+        # job_id -> pending entry, in arrival order
+        self._pending = {}
+        # job_id -> running entry
+        self._running = {}
+        self._seconds_per_unit = dict(DEFAULT_SECONDS_PER_UNIT)
+
+    def has_room(self, count: int = 1) -> bool:
+        return len(self._pending) + count <= self.max_queue
+
+    def submit(
+        self,
+        job_id: str,
+        memory_mb: int,
+        priority: int = 0,
+        user_id: Optional[str] = None,
+        job_type: str = "training",
+        units: float = 1
+    ):
+        """Queue a job; raises QueueFullError when the queue is at capacity"""
+        if len(self._pending) >= self.max_queue:
+            raise QueueFullError(f"Job queue is full ({self.max_queue} waiting jobs)")
+        self._pending[job_id] = {
+            "memory_mb": memory_mb,
+            "priority": priority,
+            "user_id": user_id or "anonymous",
+            "job_type": job_type,
+            "units": units,
+            "seq": next(self._order),
+            "enqueued_at": time.time(),
+            "future": asyncio.get_running_loop().create_future()
+        }
+        self._dispatch()
+
+    async def wait(self, job_id: str) -> bool:
+        """Wait for admission; False means the job was cancelled while queued"""
+        entry = self._pending.get(job_id) or self._running.get(job_id)
+        if entry is None:
+            return False
+        try:
+            return await entry["future"]
+        except asyncio.CancelledError:
+            self.cancel(job_id)
+            raise
+
+    def release(self, job_id: str):
+        """Free the resources of a finished job and admit the next ones"""
+        entry = self._running.pop(job_id, None)
+        if entry is not None:
+            elapsed = time.time() - entry["started_at"]
+            per_unit = elapsed / max(entry["units"], 1e-9)
+            previous = self._seconds_per_unit.get(entry["job_type"], per_unit)
+            # Exponential moving average of observed throughput feeds the ETAs
+            self._seconds_per_unit[entry["job_type"]] = 0.7 * previous + 0.3 * per_unit
+        self._dispatch()
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a queued job so it never starts; returns False if it wasn't queued"""
+        entry = self._pending.pop(job_id, None)
+        if entry is None:
+            return False
+        if not entry["future"].done():
+            entry["future"].set_result(False)
+        self._dispatch()
+        return True
+
+    def pending_ids(self):
+        return list(self._pending)
+
+    def shutdown(self):
+        for job_id in list(self._pending):
+            self.cancel(job_id)
+
+    def _memory_used(self) -> int:
+        return sum(entry["memory_mb"] for entry in self._running.values())
+
+    def _ordered(self):
+        """Pending jobs in dispatch order: priority, then fair share across users, then arrival"""
+        running_per_user = {}
+        for entry in self._running.values():
+            running_per_user[entry["user_id"]] = running_per_user.get(entry["user_id"], 0) + 1
+        return sorted(
+            self._pending.items(),
+            key=lambda item: (-item[1]["priority"], running_per_user.get(item[1]["user_id"], 0), item[1]["seq"])
+        )
+
+    def _dispatch(self):
+        self._admit()
+        if self.on_change is not None:
+            self.on_change()
+
+    def _admit(self):
+        now = time.time()
+        while len(self._running) < self.max_running and self._pending:
+            started = None
+            for job_id, entry in self._ordered():
+                fits = self._memory_used() + entry["memory_mb"] <= self.memory_budget_mb
+                # A job bigger than the whole budget may run alone rather than never
+                if fits or not self._running:
+                    started = job_id
+                    break
+                if now - entry["enqueued_at"] > STARVATION_SECONDS:
+                    # Let it drain the pool instead of being overtaken forever
+                    return
+            if started is None:
+                return
+            entry = self._pending.pop(started)
+            entry["started_at"] = now
+            self._running[started] = entry
+            if not entry["future"].done():
+                entry["future"].set_result(True)
+
+    def expected_seconds(self, entry: Dict) -> float:
+        return self._seconds_per_unit.get(entry["job_type"], 60.0) * entry["units"]
+
+    def queue_info(self, job_id: str) -> Optional[Dict]:
+        """Queue position (1-based) and estimated seconds until a queued job starts"""
+        if job_id not in self._pending:
+            return None
+        now = time.time()
+        # List-scheduling simulation: every worker frees up when its current job's expected time runs out
+        free_at = [max(0.0, self.expected_seconds(e) - (now - e["started_at"])) for e in self._running.values()]
+        free_at += [0.0] * (self.max_running - len(free_at))
+        heapq.heapify(free_at)
+        for position, (pending_id, entry) in enumerate(self._ordered(), start=1):
+            start = heapq.heappop(free_at)
+            if pending_id == job_id:
+                return {"queue_position": position, "eta_seconds": round(start, 1)}
+            heapq.heappush(free_at, start + self.expected_seconds(entry))
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "running": len(self._running),
+            "queued": len(self._pending),
+            "max_running": self.max_running,
+            "max_queue": self.max_queue,
+            "memory_used_mb": self._memory_used(),
+            "memory_budget_mb": self.memory_budget_mb
+        }
@@ -0,0 +1,253 @@
+"""Bulk scoring of JSONL/CSV corpora, executed inside the training worker processes.
+
+Each job reads its file sequentially in a single worker; inputs are not split
+across processes.
+
+Input is read in chunks starting from the offset recorded in the job's
+checkpoint, and results are appended to the output after every chunk, so an
+interrupted job can resume without rescoring or duplicating rows.
+"""
+
+import os
+import csv
+import json
+import time
+from itertools import islice
+from typing import List, Dict
+
+from inference_service import LoadedModel, decode_entities, model_dir
+from profiler import profiled
+
+# Optional imports for Parquet output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+# Tokens shared by consecutive windows of a document longer than max_sequence_length
+WINDOW_STRIDE = 32
+
+
+def _emit(events, job_id: str, **update):
+    if events is not None:
+        events.put((job_id, update))
+
+
+def checkpoint_path(output_path: str) -> str:
+    return output_path.rstrip("/") + ".checkpoint.json"
+
+
+def _read_checkpoint(output_path: str) -> Dict:
+    try:
+        with open(checkpoint_path(output_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"input_offset": None, "rows_done": 0, "output_bytes": 0}
+
+
+def _write_checkpoint(output_path: str, checkpoint: Dict):
+    tmp_path = checkpoint_path(output_path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path(output_path))
+
+
+def _read_rows(path: str, offset):
+    """Yield ``(row, offset_after_row)`` from a JSONL or CSV file, starting at ``offset``"""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            header = next(csv.reader([f.readline()]))
+            if offset is not None:
+                f.seek(offset)
+            # readline (not iteration) keeps f.tell() usable between rows
+            for values in csv.reader(iter(f.readline, "")):
+                yield dict(zip(header, values)), f.tell()
+    else:
+        with open(path, encoding="utf-8") as f:
+            if offset is not None:
+                f.seek(offset)
+            for line in iter(f.readline, ""):
+                if line.strip():
+                    yield json.loads(line), f.tell()
+
+
+def score_texts(model: LoadedModel, texts: List[str], batch_size: int) -> List[Dict]:
+    """Score texts of any length with length-bucketed batches.
+
+    Documents longer than the model's max length are split into overlapping
+    windows; entities are merged across windows and intent probabilities are
+    averaged weighted by window length.
+    """
+    encoded = model.tokenizer(
+        texts,
+        truncation=True,
+        max_length=model.max_length,
+        stride=WINDOW_STRIDE,
+        return_overflowing_tokens=True,
+        return_offsets_mapping=True
+    )
+    window_count = len(encoded["input_ids"])
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+    # Sorting windows by length keeps the padding inside each batch minimal
+    order = sorted(range(window_count), key=lambda w: lengths[w])
+    window_tags = [None] * window_count
+    window_probs = [None] * window_count
+    for start in range(0, window_count, batch_size):
+        idx = order[start:start + batch_size]
+        batch = model.tokenizer.pad(
+            {
+                "input_ids": [encoded["input_ids"][w] for w in idx],
+                "attention_mask": [encoded["attention_mask"][w] for w in idx]
+            },
+            return_tensors="pt"
+        )
+        tag_ids, intent_probs = model.forward(batch["input_ids"], batch["attention_mask"])
+        for j, w in enumerate(idx):
+            window_tags[w] = tag_ids[j][:lengths[w]]
+            window_probs[w] = intent_probs[j]
+
+    windows_by_text = [[] for _ in texts]
+    for w, text_index in enumerate(encoded["overflow_to_sample_mapping"]):
+        windows_by_text[text_index].append(w)
+
+    results = []
+    for text_index, text in enumerate(texts):
+        spans = []
+        probs, total_tokens = None, 0
+        for w in windows_by_text[text_index]:
+            spans.extend(decode_entities(
+                text, encoded["offset_mapping"][w], encoded.word_ids(w), window_tags[w], model.tag_names
+            ))
+            weighted = window_probs[w] * lengths[w]
+            probs = weighted if probs is None else probs + weighted
+            total_tokens += lengths[w]
+        # Overlapping windows report the same entity twice; keep the first of overlapping spans
+        entities, last_end = [], -1
+        for span in sorted(spans, key=lambda s: (s["start"], -s["end"])):
+            if span["start"] >= last_end:
+                entities.append(span)
+                last_end = span["end"]
+        probs = probs / total_tokens
+        confidence, intent_id = probs.max(-1)
+        results.append({
+            "intent": {"name": model.intent_names[intent_id.item()], "confidence": round(confidence.item(), 4)},
+            "entities": entities,
+            "windows": len(windows_by_text[text_index])
+        })
+    return results
+
+
+class _JsonlWriter:
+    def __init__(self, path: str, output_bytes: int, resume: bool):
+        if resume and os.path.exists(path):
+            # Drop anything written after the last checkpoint
+            os.truncate(path, output_bytes)
+            self._file = open(path, "a", encoding="utf-8")
+        else:
+            self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, records: List[Dict], first_row: int):
+        for record in records:
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    """Writes one part file per chunk into a directory, named by its first row"""
+
+    def __init__(self, path: str):
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError("pyarrow is required for Parquet output")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, records: List[Dict], first_row: int):
+        columns = {
+            "id": [str(r["id"]) for r in records],
+            "intent": [r["intent"]["name"] for r in records],
+            "intent_confidence": [r["intent"]["confidence"] for r in records],
+            "entities": [json.dumps(r["entities"]) for r in records]
+        }
+        part_path = os.path.join(self.path, f"part-{first_row:012d}.parquet")
+        pq.write_table(pa.table(columns), part_path + ".tmp")
+        os.replace(part_path + ".tmp", part_path)
+
+    def tell(self) -> int:
+        return 0
+
+    def close(self):
+        pass
+
+
+def score_job(job_id: str, config: Dict, models_dir: str, events=None, stop_event=None) -> Dict:
+    """Score ``config["input_path"]`` with a trained model, resuming from its checkpoint"""
+    return profiled(job_id, config.get("profile", False), _score, job_id, config, models_dir, events, stop_event)
+
+
+def _score(job_id: str, config: Dict, models_dir: str, events, stop_event) -> Dict:
+    _emit(events, job_id, status="initializing", progress=0)
+    model = LoadedModel(
+        model_dir(models_dir, config["model_job_id"], config.get("student")),
+        config.get("artifact", "fp32")
+    )
+
+    input_path = config["input_path"]
+    output_path = config["output_path"]
+    text_field = config.get("text_field", "text")
+    id_field = config.get("id_field")
+    chunk_size = config.get("chunk_size", 1000)
+    batch_size = config.get("batch_size", 32)
+    input_size = max(os.path.getsize(input_path), 1)
+
+    resume = config.get("resume", False)
+    checkpoint = _read_checkpoint(output_path) if resume else {"input_offset": None, "rows_done": 0, "output_bytes": 0}
+    if output_path.endswith(".parquet"):
+        writer = _ParquetWriter(output_path)
+    else:
+        writer = _JsonlWriter(output_path, checkpoint["output_bytes"], resume)
+
+    rows_done = checkpoint["rows_done"]
+    rows_this_run = 0
+    started = time.time()
+    rows = _read_rows(input_path, checkpoint["input_offset"])
+    _emit(events, job_id, status="running", rows_done=rows_done)
+    try:
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return {"status": "stopped", "rows_done": rows_done}
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            texts = [str(row.get(text_field) or "") for row, _ in chunk]
+            records = []
+            for i, ((row, _), result) in enumerate(zip(chunk, score_texts(model, texts, batch_size))):
+                records.append({"id": row.get(id_field) if id_field else rows_done + i, **result})
+            writer.write(records, rows_done)
+
+            rows_done += len(chunk)
+            rows_this_run += len(chunk)
+            checkpoint = {"input_offset": chunk[-1][1], "rows_done": rows_done, "output_bytes": writer.tell()}
+            _write_checkpoint(output_path, checkpoint)
+            _emit(events, job_id, status="running", rows_done=rows_done,
+                  rows_per_sec=round(rows_this_run / (time.time() - started), 1),
+                  progress=min(99, int(checkpoint["input_offset"] / input_size * 100)))
+    finally:
+        writer.close()
+
+    return {
+        "status": "completed",
+        "progress": 100,
+        "rows_done": rows_done,
+        "rows_per_sec": round(rows_this_run / max(time.time() - started, 1e-9), 1),
+        "output_path": output_path
+    }
@@ -0,0 +1,112 @@
+"""Hyperparameter sweeps: trial sampling, early stopping and the leaderboard"""
+
+import math
+import random
+import statistics
+from collections import defaultdict
+from typing import List, Dict, Any
+
+SWEEP_FIELDS = ("learning_rate", "batch_size", "epochs", "max_sequence_length")
+STRATEGIES = ("asha", "median")
+
+
+def _sample(spec: Any, rng: random.Random, field: str):
+    """Draw one value from a list of choices or a ``{"min", "max", "log"}`` range"""
+    if isinstance(spec, list):
+        if not spec:
+            raise ValueError(f"Search space for {field} is empty")
+        return rng.choice(spec)
+    if isinstance(spec, dict) and "min" in spec and "max" in spec:
+        low, high = spec["min"], spec["max"]
+        if low > high:
+            raise ValueError(f"Search space for {field} has min > max")
+        if field == "learning_rate" or spec.get("log"):
+            value = math.exp(rng.uniform(math.log(low), math.log(high)))
+        else:
+            value = rng.uniform(low, high)
+        return value if field == "learning_rate" else int(round(value))
+    return spec
+
+
+def sample_trials(search_space: Dict, num_trials: int, seed: int = 42) -> List[Dict]:
+    """Random search over ``search_space``; duplicate configurations are drawn again"""
+    unknown = set(search_space) - set(SWEEP_FIELDS)
+    if unknown:
+        raise ValueError(f"Unsupported sweep fields: {', '.join(sorted(unknown))}")
+    rng = random.Random(seed)
+    trials, seen = [], set()
+    for _ in range(num_trials * 20):
+        trial = {field: _sample(spec, rng, field) for field, spec in search_space.items()}
+        key = tuple(sorted(trial.items()))
+        if key not in seen:
+            seen.add(key)
+            trials.append(trial)
+        if len(trials) == num_trials:
+            break
+    return trials
+
+
+class TrialScheduler:
+    """Decides after every epoch whether a trial keeps training.
+
+    ``asha``: asynchronous successive halving. Rungs sit at
+    ``min_epochs * reduction_factor ** k`` epochs; a trial reaching a rung
+    continues only if its validation loss is in the best ``1 / reduction_factor``
+    of the trials that have reached that rung so far.
+
+    ``median``: a trial stops once its validation loss is worse than the median
+    of the other trials at the same epoch.
+    """
+
+    def __init__(self, strategy: str = "asha", reduction_factor: int = 3, min_epochs: int = 1, max_epochs: int = 10):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown sweep strategy {strategy}")
+        if reduction_factor < 2:
+            raise ValueError("reduction_factor must be at least 2")
+        self.strategy = strategy
+        self.reduction_factor = reduction_factor
+        self.min_epochs = max(1, min_epochs)
+        self.rungs = []
+        epoch = self.min_epochs
+        while epoch < max_epochs:
+            self.rungs.append(epoch)
+            epoch *= reduction_factor
+        # epoch -> {trial_id: val_loss}
+        self._losses = defaultdict(dict)
+
+    def report(self, trial_id: str, epoch: int, val_loss: float) -> bool:
+        """Record a validation loss; returns False if the trial should be pruned"""
+        self._losses[epoch][trial_id] = val_loss
+        if self.strategy == "asha":
+            if epoch not in self.rungs:
+                return True
+            losses = sorted(self._losses[epoch].values())
+            if len(losses) < self.reduction_factor:
+                # Too few trials at this rung to judge; promote optimistically
+                return True
+            keep = max(1, len(losses) // self.reduction_factor)
+            return val_loss <= losses[keep - 1]
+        if epoch < self.min_epochs:
+            return True
+        others = [loss for trial, loss in self._losses[epoch].items() if trial != trial_id]
+        if len(others) < 2:
+            return True
+        return val_loss <= statistics.median(others)
+
+
+def leaderboard(trials: List[Dict]) -> List[Dict]:
+    """Rank trials by their best validation loss; unfinished ones sort last"""
+    rows = []
+    for trial in trials:
+        history = trial.get("val_history") or {}
+        best = min(history.values()) if history else None
+        rows.append({
+            "job_id": trial["job_id"],
+            "params": trial["params"],
+            "status": trial["status"],
+            "pruned": trial.get("pruned", False),
+            "epochs_run": max((int(e) for e in history), default=0),
+            "best_val_loss": best,
+            "metrics": trial.get("metrics")
+        })
+    return sorted(rows, key=lambda r: (r["best_val_loss"] is None, r["best_val_loss"] or 0.0))
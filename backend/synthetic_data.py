@@ -0,0 +1,381 @@
+"""Synthetic training data generated from entity and intent definitions.
+
+Utterances come from two sources:
+
+- the LLM, asked in concurrent batches for annotated utterances per intent,
+  e.g. ``create a PO for [Acme Corp](SUPPLIER_NAME)``
+- template slot filling: every LLM utterance becomes a template whose slots
+  are refilled with entity values seen in other utterances (or built-in
+  fallback values when no provider is configured)
+
+Near-duplicates are dropped and the result is written as a new version of a
+dataset under ``DATASETS_DIR/<name>/v<version>/``, which ``train_job`` reads
+when the training config names a dataset.
+"""
+
+import os
+import re
+import json
+import math
+import random
+import asyncio
+import hashlib
+import datetime
+from collections import Counter, defaultdict
+from typing import List, Dict, Optional, Tuple
+
+MAX_EXAMPLES_PER_INTENT = 5000
+DEFAULT_CONCURRENCY = int(os.getenv("DATAGEN_CONCURRENCY", "8"))
+
+# Jaccard similarity of word trigrams above which two utterances count as duplicates
+DUPLICATE_THRESHOLD = 0.8
+
+ANNOTATION = re.compile(r"\[([^\[\]]+)\]\(([A-Za-z0-9_]+)\)")
+TOKEN = re.compile(r"\w+(?:[-'.,/:]\w+)*|[^\w\s]")
+
+BUILTIN_TEMPLATES = [
+    "{intent} for {0}",
+    "can you {intent} for {0} by {1}",
+    "please {intent} with {0}",
+    "i want to {intent} regarding {0} and {1}",
+    "{intent} {0}",
+    "need to {intent} - {0}",
+    "could you help me {intent}? it is about {0}",
+    "{intent} please",
+]
+
+COMPANY_NAMES = ["Acme Corp", "Globex", "Initech", "Umbrella Industries", "Stark Manufacturing", "Wayne Enterprises",
+                 "Hooli", "Vandelay Imports", "Soylent Foods", "Tyrell Systems"]
+PERSON_NAMES = ["Maria Garcia", "John Smith", "Wei Chen", "Aisha Khan", "Lars Nilsson", "Priya Patel", "Tom Becker"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+          "November", "December"]
+
+
+def default_datasets_dir() -> str:
+    return os.getenv("DATASETS_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "datasets"))
+
+
+def entity_lookup(entity_names) -> Dict[str, str]:
+    """Map of upper-cased entity names to the names as defined, for matching markup case-insensitively"""
+    return {name.upper(): name for name in entity_names}
+
+
+def parse_annotated(text: str, entities: Dict[str, str], strict: bool = False) -> Optional[Dict]:
+    """Turn ``[value](ENTITY)`` markup into an example with word tokens and BIO tags.
+
+    ``entities`` comes from ``entity_lookup``; tags and slots use the defined
+    entity names. Markup naming an unknown entity is kept as plain text, or
+    raises ValueError when ``strict``.
+    """
+    tokens, tags, slots = [], [], []
+    position = 0
+    for match in ANNOTATION.finditer(text):
+        literal = TOKEN.findall(text[position:match.start()])
+        tokens += literal
+        tags += ["O"] * len(literal)
+        slots.append(("text", text[position:match.start()]))
+        value, entity = match.group(1).strip(), entities.get(match.group(2).upper())
+        if entity is None and strict:
+            raise ValueError(f"Unknown entity {match.group(2)} in {text!r}")
+        words = TOKEN.findall(value)
+        if entity is not None and words:
+            tokens += words
+            tags += [f"B-{entity}"] + [f"I-{entity}"] * (len(words) - 1)
+            slots.append(("slot", entity, value))
+        else:
+            tokens += words
+            tags += ["O"] * len(words)
+            slots.append(("text", value))
+        position = match.end()
+    literal = TOKEN.findall(text[position:])
+    tokens += literal
+    tags += ["O"] * len(literal)
+    slots.append(("text", text[position:]))
+    if not tokens:
+        return None
+    return {"tokens": tokens, "tags": tags, "template": slots}
+
+
+def render(template: List[Tuple], values: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """Fill a parsed template, replacing every slot with ``values[entity]``"""
+    tokens, tags = [], []
+    for part in template:
+        if part[0] == "text":
+            words = TOKEN.findall(part[1])
+            tokens += words
+            tags += ["O"] * len(words)
+        else:
+            words = TOKEN.findall(values[part[1]])
+            tokens += words
+            tags += [f"B-{part[1]}"] + [f"I-{part[1]}"] * (len(words) - 1)
+    return tokens, tags
+
+
+def fallback_values(entity: Dict, rng: random.Random, count: int = 50) -> List[str]:
+    """Plausible surface forms for an entity, guessed from its name and description"""
+    name = entity["name"].upper()
+    values = []
+    for _ in range(count):
+        if "DATE" in name or "TIME" in name:
+            day, month, year = rng.randint(1, 28), rng.choice(MONTHS), rng.randint(2022, 2026)
+            values.append(rng.choice([f"{month} {day}, {year}", f"{year}-{MONTHS.index(month) + 1:02d}-{day:02d}",
+                                      f"{day} {month}"]))
+        elif any(key in name for key in ("AMOUNT", "PRICE", "COST", "VALUE", "FEE")):
+            amount = rng.randint(100, 250000)
+            values.append(rng.choice([f"${amount:,}.00", f"{amount:,} USD", f"${amount}"]))
+        elif any(key in name for key in ("QUANTITY", "COUNT", "VOLUME")):
+            values.append(rng.choice([f"{rng.randint(1, 5000):,} units", str(rng.randint(1, 900)),
+                                      f"{rng.randint(2, 80)} pallets"]))
+        elif any(key in name for key in ("_ID", "NUMBER", "CODE", "ORDER", "_NO")):
+            prefix = "".join(part[0] for part in name.split("_") if part)
+            digits = str(rng.randint(10 ** 3, 10 ** 7))
+            values.append(rng.choice([f"{prefix}-{digits}", f"{prefix}{digits}", f"#{digits}"]))
+        elif any(key in name for key in ("PERSON", "EMPLOYEE", "CONTACT")):
+            values.append(rng.choice(PERSON_NAMES))
+        elif any(key in name for key in ("NAME", "PARTY", "SUPPLIER", "VENDOR", "COMPANY", "ORGANIZATION", "CUSTOMER")):
+            values.append(rng.choice(COMPANY_NAMES))
+        else:
+            phrases = [p.strip() for p in re.split(r"[,;/]| or ", entity.get("description", "")) if p.strip()]
+            values.append(rng.choice(phrases or [name.replace("_", " ").lower()]))
+    return sorted(set(values))
+
+
+def _bind_builtin(template: str, phrase: str, entity_list: List[str], entities: Dict[str, str],
+                  rng: random.Random) -> List[Tuple]:
+    """Parse a built-in template with its slots bound to randomly chosen entities"""
+    picked = rng.sample(entity_list, min(2, len(entity_list)))
+    text = template.replace("{intent}", phrase)
+    for slot in (0, 1):
+        if picked:
+            text = text.replace("{%d}" % slot, f"[x]({picked[min(slot, len(picked) - 1)]})")
+    return parse_annotated(text, entities, strict=True)["template"]
+
+
+def _normalize(tokens: List[str]) -> List[str]:
+    return [t.lower() for t in tokens if re.match(r"\w", t)]
+
+
+class NearDuplicateIndex:
+    """Rejects utterances whose word-trigram Jaccard similarity to a kept one is too high"""
+
+    def __init__(self, threshold: float = DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._keys = set()
+        self._postings = defaultdict(list)
+        self._sizes = []
+
+    @staticmethod
+    def _shingles(words: List[str]) -> set:
+        if len(words) < 3:
+            return {tuple(words)}
+        return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+    def add(self, tokens: List[str]) -> bool:
+        """Index ``tokens`` and return True, or return False if it duplicates an indexed utterance"""
+        words = _normalize(tokens)
+        key = " ".join(words)
+        if key in self._keys:
+            return False
+        shingles = self._shingles(words)
+        overlap = Counter()
+        for shingle in shingles:
+            overlap.update(self._postings.get(shingle, ()))
+        for doc, shared in overlap.items():
+            if shared / (len(shingles) + self._sizes[doc] - shared) >= self.threshold:
+                return False
+        doc = len(self._sizes)
+        self._sizes.append(len(shingles))
+        for shingle in shingles:
+            self._postings[shingle].append(doc)
+        self._keys.add(key)
+        return True
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9_-]+", "-", name.lower()).strip("-") or "dataset"
+
+
+def _versions(dataset_dir: str) -> List[int]:
+    if not os.path.isdir(dataset_dir):
+        return []
+    return sorted(int(d[1:]) for d in os.listdir(dataset_dir) if re.fullmatch(r"v\d+", d))
+
+
+def dataset_versions(name: str, datasets_dir: Optional[str] = None) -> List[int]:
+    return _versions(os.path.join(datasets_dir or default_datasets_dir(), _slug(name)))
+
+
+def load_examples(name: str, version: Optional[int] = None, datasets_dir: Optional[str] = None) -> Tuple[List[Dict], int]:
+    """Read a generated dataset (latest version by default); returns ``(examples, version)``"""
+    dataset_dir = os.path.join(datasets_dir or default_datasets_dir(), _slug(name))
+    versions = _versions(dataset_dir)
+    if version is None:
+        if not versions:
+            raise ValueError(f"Dataset {name} not found")
+        version = versions[-1]
+    elif version not in versions:
+        raise ValueError(f"Dataset {name} has no version {version}")
+    examples = []
+    with open(os.path.join(dataset_dir, f"v{version}", "examples.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            examples.append(json.loads(line))
+    return examples, version
+
+
+def list_datasets(datasets_dir: Optional[str] = None) -> List[Dict]:
+    """Manifests of every dataset version, newest first"""
+    root = datasets_dir or default_datasets_dir()
+    manifests = []
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            for version in _versions(os.path.join(root, name)):
+                try:
+                    with open(os.path.join(root, name, f"v{version}", "manifest.json")) as f:
+                        manifests.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+    return sorted(manifests, key=lambda m: m.get("created_at", ""), reverse=True)
+
+
+class DatasetGenerator:
+    """Builds versioned synthetic datasets with the LLM providers of ``LLMService``"""
+
+    def __init__(self, llm_service, datasets_dir: Optional[str] = None, concurrency: int = DEFAULT_CONCURRENCY):
+        self.llm_service = llm_service
+        self.datasets_dir = datasets_dir or default_datasets_dir()
+        self.concurrency = concurrency
+
+    def check_config(self, intents: List[Dict], config: Dict):
+        """Raise ValueError for a request that can't produce a dataset"""
+        if not intents:
+            raise ValueError("At least one intent is required")
+        if not 1 <= config.get("examples_per_intent", 100) <= MAX_EXAMPLES_PER_INTENT:
+            raise ValueError(f"examples_per_intent must be between 1 and {MAX_EXAMPLES_PER_INTENT}")
+        if config.get("llm_batch_size", 20) < 1 or not 0 <= config.get("llm_ratio", 0.25) <= 1:
+            raise ValueError("llm_batch_size must be positive and llm_ratio between 0 and 1")
+
+    async def generate(self, entities: List[Dict], intents: List[Dict], config: Dict,
+                       on_progress=None, stop_event=None) -> Dict:
+        """Generate, deduplicate and save a dataset; returns its manifest"""
+        self.check_config(intents, config)
+        per_intent = config.get("examples_per_intent", 100)
+        batch_size = config.get("llm_batch_size", 20)
+        llm_ratio = config.get("llm_ratio", 0.25)
+        provider = config.get("llm_provider", "claude")
+        seed = config.get("seed", 42)
+        rng = random.Random(seed)
+        entity_names = {e["name"] for e in entities}
+        lookup = entity_lookup(entity_names)
+        progress = on_progress or (lambda **update: None)
+
+        # 1. LLM batches, bounded by a semaphore on top of the provider limits in LLMService
+        batches = [
+            (intent, index)
+            for intent in intents
+            for index in range(math.ceil(per_intent * llm_ratio / batch_size) if self.llm_service else 0)
+        ]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_batch(intent: Dict, index: int) -> Tuple[Dict, List[str]]:
+            async with semaphore:
+                if stop_event is not None and stop_event.is_set():
+                    return intent, []
+                # The variation number keeps batches distinct yet cacheable across reruns
+                utterances = await self.llm_service.generate_utterances(
+                    intent, entities, batch_size, variation=f"{seed}-{index}", provider=provider
+                )
+                return intent, utterances
+
+        annotated = defaultdict(list)
+        done = 0
+        for future in asyncio.as_completed([run_batch(intent, index) for intent, index in batches]):
+            intent, utterances = await future
+            annotated[intent["name"]].extend(utterances)
+            done += 1
+            progress(progress=int(done / len(batches) * 80), batches_done=done, batches_total=len(batches))
+        if stop_event is not None and stop_event.is_set():
+            return {"status": "stopped"}
+
+        # 2. Parse and deduplicate LLM utterances, collecting entity values and templates
+        index = NearDuplicateIndex(config.get("duplicate_threshold", DUPLICATE_THRESHOLD))
+        examples_by_intent = defaultdict(list)
+        templates = defaultdict(list)
+        values = defaultdict(set)
+        duplicates = 0
+        for intent in intents:
+            for text in annotated[intent["name"]]:
+                example = parse_annotated(text, lookup)
+                if example is None:
+                    continue
+                for part in example["template"]:
+                    if part[0] == "slot":
+                        values[part[1]].add(part[2])
+                if not index.add(example["tokens"]):
+                    duplicates += 1
+                    continue
+                templates[intent["name"]].append(example["template"])
+                if len(examples_by_intent[intent["name"]]) < per_intent:
+                    examples_by_intent[intent["name"]].append(
+                        {"tokens": example["tokens"], "tags": example["tags"], "intent": intent["name"], "source": "llm"}
+                    )
+        for entity in entities:
+            # Few (or no, without a provider) values seen: widen the pool with guessed ones
+            if len(values[entity["name"]]) < 20:
+                values[entity["name"]].update(fallback_values(entity, rng))
+        values = {name: sorted(v) for name, v in values.items()}
+
+        # 3. Template slot filling up to the requested size
+        entity_list = sorted(entity_names)
+        for position, intent in enumerate(intents):
+            name = intent["name"]
+            pool = list(templates[name])
+            if len(pool) < len(BUILTIN_TEMPLATES):
+                # Too few LLM templates (or no provider): mix in the generic ones
+                pool += [b for b in BUILTIN_TEMPLATES if entity_list or "{0}" not in b]
+            attempts = 0
+            while len(examples_by_intent[name]) < per_intent and attempts < per_intent * 10:
+                attempts += 1
+                template = rng.choice(pool)
+                if isinstance(template, str):
+                    template = _bind_builtin(template, name.replace("_", " "), entity_list, lookup, rng)
+                tokens, tags = render(template, {e: rng.choice(values[e]) for e in entity_list})
+                if not tokens:
+                    continue
+                if not index.add(tokens):
+                    duplicates += 1
+                    continue
+                examples_by_intent[name].append({"tokens": tokens, "tags": tags, "intent": name, "source": "template"})
+            progress(progress=80 + int((position + 1) / len(intents) * 15))
+
+        examples = [ex for intent in intents for ex in examples_by_intent[intent["name"]]]
+        rng.shuffle(examples)
+        return self._save(entities, intents, config, examples, duplicates)
+
+    def _save(self, entities: List[Dict], intents: List[Dict], config: Dict, examples: List[Dict], duplicates: int) -> Dict:
+        definitions = json.dumps([entities, intents], sort_keys=True)
+        name = _slug(config.get("name") or "dataset-" + hashlib.sha256(definitions.encode("utf-8")).hexdigest()[:10])
+        dataset_dir = os.path.join(self.datasets_dir, name)
+        os.makedirs(dataset_dir, exist_ok=True)
+        version = (_versions(dataset_dir) or [0])[-1] + 1
+        manifest = {
+            "name": name,
+            "version": version,
+            "created_at": datetime.datetime.now().isoformat(),
+            "entities": entities,
+            "intents": intents,
+            "config": config,
+            "total_examples": len(examples),
+            "examples_per_intent": dict(Counter(ex["intent"] for ex in examples)),
+            "sources": dict(Counter(ex["source"] for ex in examples)),
+            "duplicates_removed": duplicates
+        }
+        # Write into a temporary directory and rename, so readers never see a partial version
+        tmp_dir = os.path.join(dataset_dir, f".v{version}.{os.getpid()}.tmp")
+        os.makedirs(tmp_dir)
+        with open(os.path.join(tmp_dir, "examples.jsonl"), "w", encoding="utf-8") as f:
+            for example in examples:
+                f.write(json.dumps(example) + "\n")
+        with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(tmp_dir, os.path.join(dataset_dir, f"v{version}"))
+        return manifest
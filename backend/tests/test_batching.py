@@ -0,0 +1,116 @@
+import pytest
+import torch
+
+pytest.importorskip("transformers")
+from transformers import DistilBertConfig, DistilBertModel
+
+from batching import collate, length_grouped_order, sequence_lengths
+from joint_model import JointModel
+
+MAX_LEN = 16
+LENGTHS = [5, 9, 3, 12, 7, 4, 16, 2]
+NUM_TAGS, NUM_INTENTS = 5, 3
+
+
+def _data(lengths=LENGTHS, seed=0):
+    """Encoded dataset padded to ``MAX_LEN``, with [CLS]/[SEP] labels ignored like the real encoding"""
+    generator = torch.Generator().manual_seed(seed)
+    n = len(lengths)
+    input_ids = torch.zeros(n, MAX_LEN, dtype=torch.long)
+    attention_mask = torch.zeros(n, MAX_LEN, dtype=torch.long)
+    labels = torch.full((n, MAX_LEN), -100, dtype=torch.long)
+    for i, length in enumerate(lengths):
+        input_ids[i, :length] = torch.randint(5, 100, (length,), generator=generator)
+        input_ids[i, 0], input_ids[i, length - 1] = 1, 2
+        attention_mask[i, :length] = 1
+        labels[i, 1:length - 1] = torch.randint(0, NUM_TAGS, (length - 2,), generator=generator)
+    intent_labels = torch.randint(0, NUM_INTENTS, (n,), generator=generator)
+    return {"input_ids": input_ids, "attention_mask": attention_mask, "labels": labels, "intent_labels": intent_labels}
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    config = DistilBertConfig(vocab_size=100, dim=32, hidden_dim=64, n_layers=2, n_heads=2,
+                              max_position_embeddings=MAX_LEN)
+    return JointModel(DistilBertModel(config), NUM_TAGS, NUM_INTENTS).eval()
+
+
+def test_dynamic_padding_trims_to_the_longest_example():
+    data = _data()
+    idx = torch.tensor([0, 2, 5])
+    batch, real, padded = collate(data, idx)
+    assert batch["input_ids"].shape == (3, 5)
+    assert (real, padded) == (12, 15)
+    assert torch.equal(batch["intent_labels"], data["intent_labels"][idx])
+
+
+def test_packed_rows_hold_every_example_once():
+    data = _data()
+    idx = torch.arange(len(LENGTHS))
+    batch, real, padded = collate(data, idx, pack=True)
+    assert real == sum(LENGTHS)
+    assert batch["input_ids"].shape[1] <= MAX_LEN
+    assert padded == batch["input_ids"].numel() < len(LENGTHS) * MAX_LEN
+    for i, (row, offset) in enumerate(batch["cls_index"].tolist()):
+        n = LENGTHS[i]
+        assert torch.equal(batch["input_ids"][row, offset:offset + n], data["input_ids"][i, :n])
+        assert torch.equal(batch["position_ids"][row, offset:offset + n], torch.arange(n))
+
+
+def test_packed_examples_never_attend_across_boundaries():
+    data = _data()
+    batch, _, _ = collate(data, torch.arange(len(LENGTHS)), pack=True)
+    visible = batch["attention_mask"][:, 0] == 0
+    segment = torch.zeros(batch["input_ids"].shape, dtype=torch.long)
+    for i, (row, offset) in enumerate(batch["cls_index"].tolist()):
+        segment[row, offset:offset + LENGTHS[i]] = i + 1
+    same_example = (segment[:, :, None] == segment[:, None, :]) & (segment[:, None, :] > 0)
+    assert torch.equal(visible, same_example)
+
+
+def test_packed_example_outputs_ignore_their_row_neighbours(model):
+    data = _data()
+    idx = torch.arange(len(LENGTHS))
+    batch, _, _ = collate(data, idx, pack=True)
+    # Change every other example; the outputs of the first one must not move
+    changed = _data(seed=1)
+    changed["input_ids"][0] = data["input_ids"][0]
+    other, _, _ = collate(changed, idx, pack=True)
+    assert torch.equal(other["cls_index"], batch["cls_index"])
+    row, offset = batch["cls_index"][0].tolist()
+    with torch.no_grad():
+        out = model(**batch)
+        out_other = model(**other)
+    span = slice(offset, offset + LENGTHS[0])
+    torch.testing.assert_close(out.token_logits[row, span], out_other.token_logits[row, span])
+    torch.testing.assert_close(out.intent_logits[0], out_other.intent_logits[0])
+
+
+def test_packed_and_padded_batches_give_the_same_loss_and_logits(model):
+    data = _data()
+    idx = torch.tensor([3, 0, 6, 2, 5, 1, 7, 4])
+    padded, _, _ = collate(data, idx)
+    packed, _, _ = collate(data, idx, pack=True)
+    with torch.no_grad():
+        out_padded = model(**padded)
+        out_packed = model(**packed)
+
+    torch.testing.assert_close(out_packed.loss, out_padded.loss)
+    torch.testing.assert_close(out_packed.intent_logits, out_padded.intent_logits)
+    for j, i in enumerate(idx.tolist()):
+        row, offset = packed["cls_index"][j].tolist()
+        torch.testing.assert_close(out_packed.token_logits[row, offset:offset + LENGTHS[i]],
+                                   out_padded.token_logits[j, :LENGTHS[i]])
+
+
+def test_length_grouped_order_is_a_permutation_of_similar_length_batches():
+    torch.manual_seed(0)
+    lengths = torch.randint(2, 100, (1000,))
+    indices = torch.arange(1000)
+    order = length_grouped_order(indices, lengths, batch_size=10, group_batches=100)
+    assert sorted(order.tolist()) == indices.tolist()
+    grouped = sum(int(lengths[batch].max()) for batch in order.split(10))
+    shuffled = sum(int(lengths[batch].max()) for batch in indices[torch.randperm(1000)].split(10))
+    assert grouped < shuffled
+    assert torch.equal(sequence_lengths(_data()), torch.tensor(LENGTHS))
@@ -0,0 +1,33 @@
+import os
+import time
+
+import dataset_cache
+from dataset_cache import prune_cache
+
+
+def _entry(directory, name, size, age):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    at = time.time() - age
+    os.utime(path, (at, at))
+    return path
+
+
+def test_prune_deletes_least_recently_used_entries_beyond_the_budget(tmp_path):
+    oldest = _entry(tmp_path, "a.arrow", 400, age=300)
+    older = _entry(tmp_path, "b.arrow", 400, age=200)
+    recent = _entry(tmp_path, "c.arrow", 400, age=100)
+    newest = _entry(tmp_path, "d.arrow", 400, age=0)
+
+    prune_cache(str(tmp_path), max_bytes=1000)
+    assert [p.exists() for p in (oldest, older, recent, newest)] == [False, False, True, True]
+
+
+def test_prune_keeps_the_entry_just_written_and_fresh_temp_files(tmp_path):
+    big = _entry(tmp_path, "big.arrow", 5000, age=0)
+    fresh_tmp = _entry(tmp_path, "c.arrow.12.tmp", 100, age=10)
+    stale_tmp = _entry(tmp_path, "d.arrow.13.tmp", 100, age=dataset_cache.STALE_TMP_SECONDS + 10)
+
+    prune_cache(str(tmp_path), max_bytes=1000, keep=str(big))
+    assert big.exists() and fresh_tmp.exists()
+    assert not stale_tmp.exists()
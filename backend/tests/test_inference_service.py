@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from inference_service import InferenceService, MicroBatcher
+
+
+class BlockingModel:
+    """Stand-in model whose batches wait for ``release`` once ``started`` is set"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def predict_batch(self, texts):
+        self.started.set()
+        self.release.wait(5)
+        return [{"model": self.name, "text": text} for text in texts]
+
+
+def _service(tmp_path, models):
+    service = InferenceService(str(tmp_path))
+    service.max_models = 1
+    service._adapter_job = lambda job_id: None
+    service._model_path = lambda job_id, student=None: job_id
+    service._load = lambda model_path: models[model_path]() if callable(models[model_path]) else models[model_path]
+    return service
+
+
+def test_eviction_mid_batch_completes_in_flight_request(tmp_path, monkeypatch):
+    monkeypatch.setattr("inference_service.TRANSFORMERS_AVAILABLE", True)
+    models = {"a": BlockingModel("a"), "b": BlockingModel("b")}
+    models["b"].release.set()
+    service = _service(tmp_path, models)
+    # Two inference threads, so model B can answer while a batch of model A is running
+    service._executor = ThreadPoolExecutor(max_workers=2)
+
+    async def scenario():
+        in_flight = asyncio.create_task(service.predict("a", ["hello"]))
+        await asyncio.get_running_loop().run_in_executor(None, models["a"].started.wait, 5)
+        # Loading B evicts A while A's batch is still in the executor
+        assert (await service.predict("b", ["other"]))[0]["model"] == "b"
+        assert service.loaded_models() == ["b"]
+        models["a"].release.set()
+        return await asyncio.wait_for(in_flight, 5)
+
+    try:
+        assert asyncio.run(scenario()) == [{"model": "a", "text": "hello"}]
+    finally:
+        service.shutdown()
+
+
+def test_cold_load_does_not_block_loaded_models(tmp_path, monkeypatch):
+    monkeypatch.setattr("inference_service.TRANSFORMERS_AVAILABLE", True)
+    b_loading, b_release = threading.Event(), threading.Event()
+    models = {"a": BlockingModel("a"), "b": BlockingModel("b")}
+    models["a"].release.set()
+    models["b"].release.set()
+
+    def load_b():
+        b_loading.set()
+        b_release.wait(5)
+        return models["b"]
+
+    service = _service(tmp_path, {"a": models["a"], "b": load_b})
+    service.max_models = 2
+
+    async def scenario():
+        await service.predict("a", ["warm"])
+        loading = asyncio.create_task(service.predict("b", ["cold"]))
+        await asyncio.get_running_loop().run_in_executor(None, b_loading.wait, 5)
+        # B is still loading; A keeps answering
+        assert (await asyncio.wait_for(service.predict("a", ["hello"]), 2))[0]["model"] == "a"
+        b_release.set()
+        return await asyncio.wait_for(loading, 5)
+
+    try:
+        assert asyncio.run(scenario()) == [{"model": "b", "text": "cold"}]
+    finally:
+        b_release.set()
+        service.shutdown()
+
+
+def test_close_fails_queued_requests_and_rejects_new_ones():
+    model = BlockingModel("a")
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def scenario():
+        batcher = MicroBatcher(model, executor, max_batch_size=1, max_wait_ms=0)
+        first = asyncio.create_task(batcher.predict("one"))
+        await asyncio.get_running_loop().run_in_executor(None, model.started.wait, 5)
+        queued = asyncio.create_task(batcher.predict("two"))
+        await asyncio.sleep(0)
+        batcher.close()
+        model.release.set()
+        assert (await asyncio.wait_for(first, 5))["text"] == "one"
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(queued, 5)
+        with pytest.raises(RuntimeError):
+            await batcher.predict("three")
+        await asyncio.wait_for(batcher._task, 5)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
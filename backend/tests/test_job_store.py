@@ -0,0 +1,136 @@
+import pytest
+
+import job_store
+from job_store import InMemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def open_store(request, tmp_path):
+    """Opens a handle on one shared store; each SQLite handle stands in for another process"""
+    handles = []
+    memory = InMemoryJobStore()
+
+    def open_handle():
+        handle = memory if request.param == "memory" else SQLiteJobStore(str(tmp_path / "jobs.db"))
+        handles.append(handle)
+        return handle
+
+    yield open_handle
+    for handle in handles:
+        handle.close()
+
+
+def _job(status="queued", created_at="2026-01-01T00:00:00", **fields):
+    return dict(status=status, created_at=created_at, entities=[{"name": "ORDER_ID"}], **fields)
+
+
+def _assert_counts_match(store):
+    counts = {status: n for status, n in store.count_by_status().items() if n}
+    listed = {}
+    for _, summary in store.list(limit=1000):
+        listed[summary["status"]] = listed.get(summary["status"], 0) + 1
+    assert counts == listed
+
+
+def test_create_get_and_update_bump_version(open_store):
+    store = open_store()
+    store.create("a", _job(total_epochs=3))
+    job = store.get("a")
+    assert job["version"] == 1
+    assert job["entities"] == [{"name": "ORDER_ID"}]
+    assert "a" in store and "missing" not in store
+    assert store.get("missing") is None
+
+    updated = store.update("a", {"status": "running", "progress": 40, "epoch": 2, "loss": 0.5})
+    assert updated["progress"] == 40
+    assert updated["version"] == 2
+    assert updated["entities"] == [{"name": "ORDER_ID"}]
+    assert store.get("a") == updated
+
+
+def test_list_is_newest_first_with_status_filter_and_paging(open_store):
+    store = open_store()
+    for i, status in enumerate(["queued", "running", "completed", "running"]):
+        store.create(f"job{i}", _job(status, created_at=f"2026-01-0{i + 1}T00:00:00", progress=i * 10))
+
+    assert [job_id for job_id, _ in store.list()] == ["job3", "job2", "job1", "job0"]
+    assert [job_id for job_id, _ in store.list(statuses=["running"])] == ["job3", "job1"]
+    assert [job_id for job_id, _ in store.list(limit=2, offset=1)] == ["job2", "job1"]
+    _, summary = store.list(statuses=["completed"])[0]
+    assert summary == {"status": "completed", "progress": 20, "epoch": 0, "total_epochs": 0, "loss": None,
+                       "created_at": "2026-01-03T00:00:00"}
+
+
+def test_counters_follow_every_status_transition(open_store):
+    store = open_store()
+    transitions = {
+        "stopped": ["running", "stopping", "stopping", "stopped"],
+        "completed": ["initializing", "running", "evaluating", "saving", "completed"],
+        "failed": ["running", "failed"],
+        "queued": [],
+    }
+    for job_id in transitions:
+        store.create(job_id, _job())
+    _assert_counts_match(store)
+    assert store.count_by_status()["queued"] == 4
+
+    for step in range(max(len(path) for path in transitions.values())):
+        for job_id, path in transitions.items():
+            if step < len(path):
+                store.update(job_id, {"status": path[step], "progress": step})
+        _assert_counts_match(store)
+
+    counts = store.count_by_status()
+    assert {s: counts.get(s, 0) for s in ("queued", "running", "stopping", "stopped", "completed", "failed")} == {
+        "queued": 1, "running": 0, "stopping": 0, "stopped": 1, "completed": 1, "failed": 1
+    }
+    # Another handle on the same store sees the same counters
+    assert open_store().count_by_status() == counts
+
+
+def test_restart_fails_unfinished_jobs(open_store):
+    store = open_store()
+    store.create("running", _job("running"))
+    store.create("stopping", _job("stopping"))
+    store.create("done", _job("completed"))
+
+    # A new handle stands in for the restarted server
+    restarted = open_store()
+    assert sorted(restarted.recover_interrupted()) == ["running", "stopping"]
+    assert restarted.get("running")["status"] == "failed"
+    assert "Interrupted" in restarted.get("stopping")["error"]
+    assert restarted.get("done")["status"] == "completed"
+    _assert_counts_match(restarted)
+    assert restarted.count_by_status()["failed"] == 2
+
+
+def test_interrupted_jobs_are_failed_once_their_owner_stops_heartbeating(open_store, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(job_store.time, "time", lambda: clock[0])
+    first, second = open_store(), open_store()
+
+    first.heartbeat("worker-1")
+    first.create("mine", _job("running", owner="worker-1"))
+    first.create("stopping", _job("stopping", owner="worker-1"))
+    first.create("done", _job("completed", owner="worker-1"))
+    second.heartbeat("worker-2")
+
+    # worker-1 is alive: nothing to take over
+    clock[0] += 10
+    second.heartbeat("worker-2")
+    assert second.live_owners(30) == {"worker-1", "worker-2"}
+    assert second.recover_interrupted(second.live_owners(30)) == []
+
+    # worker-1 stops heartbeating; worker-2 fails its unfinished jobs
+    clock[0] += 25
+    second.heartbeat("worker-2")
+    assert second.live_owners(30) == {"worker-2"}
+    assert sorted(second.recover_interrupted(second.live_owners(30))) == ["mine", "stopping"]
+    assert first.get("mine")["status"] == "failed"
+    assert "Interrupted" in first.get("stopping")["error"]
+    assert first.get("done")["status"] == "completed"
+    _assert_counts_match(first)
+    assert first.count_by_status()["failed"] == 2
+
+    second.remove_owner("worker-2")
+    assert first.live_owners(30) == set()
@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+import scheduler
+from scheduler import JobScheduler, QueueFullError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler.time, "time", lambda: now[0])
+    return now
+
+
+def _admitted(sched, *job_ids):
+    return [job_id for job_id in job_ids if job_id in sched._running]
+
+
+def test_priority_then_arrival(clock):
+    async def run():
+        sched = JobScheduler(max_running=1, memory_budget_mb=10_000, max_queue=10)
+        sched.submit("blocker", 100)
+        sched.submit("low", 100, priority=0)
+        sched.submit("high", 100, priority=5)
+        sched.submit("mid", 100, priority=1)
+        sched.submit("mid-later", 100, priority=1)
+        started = []
+        for _ in range(4):
+            sched.release(next(iter(sched._running)))
+            started += list(sched._running)
+        return started
+
+    assert asyncio.run(run()) == ["high", "mid", "mid-later", "low"]
+
+
+def test_fair_share_within_a_priority(clock):
+    async def run():
+        sched = JobScheduler(max_running=2, memory_budget_mb=10_000, max_queue=10)
+        sched.submit("alice-1", 100, user_id="alice")
+        sched.submit("dave-1", 100, user_id="dave")
+        sched.submit("alice-2", 100, user_id="alice")
+        sched.submit("bob-1", 100, user_id="bob")
+        # alice still holds a slot, so bob's later job goes first
+        sched.release("dave-1")
+        return _admitted(sched, "alice-2", "bob-1")
+
+    assert asyncio.run(run()) == ["bob-1"]
+
+
+def test_queue_position_and_eta(clock):
+    async def run():
+        sched = JobScheduler(max_running=1, memory_budget_mb=10_000, max_queue=10)
+        # 30 s per epoch until jobs have been timed
+        sched.submit("running", 100, units=2)
+        clock[0] += 20
+        sched.submit("first", 100, units=1)
+        sched.submit("second", 100, units=3)
+        sched.submit("urgent", 100, units=1, priority=1)
+        return {job_id: sched.queue_info(job_id) for job_id in ("running", "first", "second", "urgent")}
+
+    info = asyncio.run(run())
+    assert info["running"] is None
+    assert info["urgent"] == {"queue_position": 1, "eta_seconds": 40.0}
+    assert info["first"] == {"queue_position": 2, "eta_seconds": 70.0}
+    assert info["second"] == {"queue_position": 3, "eta_seconds": 100.0}
+
+
+def test_eta_uses_observed_throughput(clock):
+    async def run():
+        sched = JobScheduler(max_running=1, memory_budget_mb=10_000, max_queue=10)
+        sched.submit("timed", 100, units=1)
+        clock[0] += 130
+        sched.submit("next", 100, units=1)
+        sched.release("timed")
+        sched.submit("after", 100, units=1)
+        return sched.queue_info("after")
+
+    # Moving average of the default 30 s and the observed 130 s
+    assert asyncio.run(run()) == {"queue_position": 1, "eta_seconds": 60.0}
+
+
+def test_jobs_over_the_memory_budget_wait(clock):
+    async def run():
+        sched = JobScheduler(max_running=3, memory_budget_mb=1000, max_queue=10)
+        sched.submit("a", 600)
+        sched.submit("b", 600)
+        sched.submit("small", 300)
+        # "b" doesn't fit next to "a"; the smaller job backfills the free slot
+        assert _admitted(sched, "a", "b", "small") == ["a", "small"]
+        assert sched.stats()["memory_used_mb"] == 900
+        sched.release("a")
+        assert _admitted(sched, "a", "b", "small") == ["b", "small"]
+
+        # A job larger than the whole budget waits for an empty pool, then runs alone
+        sched.submit("huge", 5000)
+        sched.release("b")
+        assert _admitted(sched, "huge") == []
+        sched.release("small")
+        assert _admitted(sched, "huge") == ["huge"]
+
+    asyncio.run(run())
+
+
+def test_starved_job_blocks_backfill(clock):
+    async def run():
+        sched = JobScheduler(max_running=3, memory_budget_mb=1000, max_queue=10)
+        sched.submit("a", 600)
+        sched.submit("big", 600)
+        clock[0] += scheduler.STARVATION_SECONDS + 1
+        sched.submit("small", 300)
+        assert _admitted(sched, "a", "big", "small") == ["a"]
+        sched.release("a")
+        assert _admitted(sched, "big", "small") == ["big", "small"]
+
+    asyncio.run(run())
+
+
+def test_worker_slots_bound_admission_even_when_memory_fits(clock):
+    async def run():
+        sched = JobScheduler(max_running=2, memory_budget_mb=10_000, max_queue=10)
+        for job_id in ("a", "b", "c"):
+            sched.submit(job_id, 100)
+        assert _admitted(sched, "a", "b", "c") == ["a", "b"]
+        assert sched.queue_info("c")["queue_position"] == 1
+
+    asyncio.run(run())
+
+
+def test_full_queue_rejects_and_cancelled_jobs_never_start(clock):
+    async def run():
+        sched = JobScheduler(max_running=1, memory_budget_mb=10_000, max_queue=2)
+        sched.submit("running", 100)
+        sched.submit("q1", 100)
+        sched.submit("q2", 100)
+        assert not sched.has_room()
+        with pytest.raises(QueueFullError):
+            sched.submit("q3", 100)
+
+        waiter = asyncio.ensure_future(sched.wait("q1"))
+        assert sched.cancel("q1")
+        assert await waiter is False
+        assert not sched.cancel("q1")
+        sched.release("running")
+        assert _admitted(sched, "q1", "q2") == ["q2"]
+        assert await sched.wait("q2") is True
+
+    asyncio.run(run())
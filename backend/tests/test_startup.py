@@ -0,0 +1,41 @@
+import os
+import sys
+import json
+import subprocess
+
+from benchmark import DEFERRED_MODULES
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import time and peak RSS, measured in a fresh interpreter. VmHWM belongs to the new
+# process image, while ru_maxrss carries over the peak of the forking test process on Linux
+SCRIPT = """
+import sys, json, time, resource
+start = time.perf_counter()
+import main
+seconds = time.perf_counter() - start
+try:
+    with open("/proc/self/status") as f:
+        peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    # kilobytes on Linux, bytes on macOS
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform == "darwin" else 1)
+print(json.dumps({
+    "import_seconds": seconds,
+    "peak_rss_mb": peak_kb / 1024,
+    "loaded": [name for name in %r if name in sys.modules]
+}))
+"""
+
+
+def test_import_main_defers_heavy_modules_and_stays_in_budget(tmp_path):
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT % (DEFERRED_MODULES,)],
+        cwd=BACKEND_DIR, env=dict(os.environ, JOB_STORE="memory", SCORING_DATA_DIR=str(tmp_path)),
+        capture_output=True, text=True, check=True, timeout=60
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result["loaded"] == []
+    assert result["import_seconds"] < float(os.getenv("STARTUP_BUDGET_SECONDS", "2"))
+    assert result["peak_rss_mb"] < float(os.getenv("STARTUP_RSS_BUDGET_MB", "250"))
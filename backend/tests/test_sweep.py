@@ -0,0 +1,27 @@
+import asyncio
+
+from job_store import InMemoryJobStore
+from training_service import TrainingService
+
+
+def test_trials_skip_checkpoints_distillation_and_exports():
+    async def run():
+        service = TrainingService(InMemoryJobStore())
+
+        async def run_in_pool(job_id, task, *args):
+            # Only the recorded trial configs matter here; nothing reaches a worker
+            pass
+
+        service._run_in_pool = run_in_pool
+        try:
+            config = {"epochs": 2, "export_quantized": True, "export_onnx": True, "distill_students": [{"layers": 2}]}
+            sweep_id = await service.start_sweep([], [], config, {"learning_rate": [1e-5, 3e-5]}, num_trials=2)
+            for trial_id in service.job_store.get(sweep_id)["trial_ids"]:
+                trial = service.job_store.get(trial_id)["config"]
+                assert trial["checkpoint_every_steps"] == 0
+                assert trial["distill_students"] is None
+                assert not trial["export_quantized"] and not trial["export_onnx"]
+        finally:
+            service.shutdown()
+
+    asyncio.run(run())
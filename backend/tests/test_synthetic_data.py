@@ -0,0 +1,42 @@
+import asyncio
+import random
+
+import pytest
+
+from synthetic_data import DatasetGenerator, _bind_builtin, entity_lookup, parse_annotated
+
+
+def test_markup_matches_entity_names_case_insensitively():
+    example = parse_annotated("Ship [12 units](quantity) to [Acme Corp](Supplier_Name)",
+                              entity_lookup(["Quantity", "Supplier_Name"]))
+    assert example["tags"] == ["O", "B-Quantity", "I-Quantity", "O", "B-Supplier_Name", "I-Supplier_Name"]
+    assert ("slot", "Quantity", "12 units") in example["template"]
+    assert ("slot", "Supplier_Name", "Acme Corp") in example["template"]
+
+
+def test_unknown_entity_is_text_unless_strict():
+    lookup = entity_lookup(["quantity"])
+    example = parse_annotated("Call [Bob](PERSON) now", lookup)
+    assert example["tags"] == ["O", "O", "O"]
+    with pytest.raises(ValueError, match="PERSON"):
+        parse_annotated("Call [Bob](PERSON) now", lookup, strict=True)
+
+
+def test_builtin_templates_keep_non_upper_entity_names():
+    entity_list = ["order_id", "Delivery_Date"]
+    template = _bind_builtin("I need to {intent} for {0} by {1}", "reschedule", entity_list,
+                             entity_lookup(entity_list), random.Random(0))
+    slots = {part[1] for part in template if part[0] == "slot"}
+    assert slots == set(entity_list)
+
+
+def test_generated_examples_tag_lowercase_entities(tmp_path):
+    generator = DatasetGenerator(None, datasets_dir=str(tmp_path))
+    manifest = asyncio.run(generator.generate(
+        [{"name": "order_id", "description": "purchase order number"}],
+        [{"name": "track_order"}],
+        {"examples_per_intent": 20, "name": "case"}
+    ))
+    assert manifest["total_examples"] == 20
+    examples_file = tmp_path / "case" / "v1" / "examples.jsonl"
+    assert "B-order_id" in examples_file.read_text()
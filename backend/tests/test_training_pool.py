@@ -0,0 +1,68 @@
+import os
+import time
+import asyncio
+
+import training_service
+from job_store import InMemoryJobStore
+from training_service import TrainingService
+
+
+def report_until_stopped(job_id, entities, intents, config, models_dir, events=None, stop_event=None):
+    """Stand-in for ``train_job``: reports one epoch, then waits to be stopped, or kills its worker"""
+    if config.get("crash"):
+        os._exit(1)
+    events.put((job_id, {"status": "running", "epoch": 1, "loss": 0.25, "worker_pid": os.getpid()}))
+    stop_event.wait(60)
+    return {"status": "stopped"}
+
+
+async def _wait_for(condition, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+def test_training_runs_in_a_worker_process_and_reports_progress(monkeypatch):
+    monkeypatch.setenv("TRAINING_WORKERS", "1")
+    monkeypatch.setattr(training_service, "TRAIN_TASK", f"{__name__}.report_until_stopped")
+
+    async def run():
+        service = TrainingService(InMemoryJobStore())
+        try:
+            job_id = await service.start_training([], [], {"epochs": 1})
+
+            def job():
+                return service.job_store.get(job_id)
+
+            await _wait_for(lambda: job().get("loss") == 0.25)
+            assert job()["status"] == "running"
+            assert job()["worker_pid"] != os.getpid()
+
+            await service.stop_training(job_id)
+            await _wait_for(lambda: job_id not in service._stop_events)
+            assert job()["status"] == "stopped"
+        finally:
+            service.shutdown()
+
+    asyncio.run(run())
+
+
+def test_jobs_after_a_worker_crash_still_report_progress(monkeypatch):
+    monkeypatch.setenv("TRAINING_WORKERS", "1")
+    monkeypatch.setattr(training_service, "TRAIN_TASK", f"{__name__}.report_until_stopped")
+
+    async def run():
+        service = TrainingService(InMemoryJobStore())
+        try:
+            crashed = await service.start_training([], [], {"epochs": 1, "crash": True})
+            await _wait_for(lambda: service.job_store.get(crashed)["status"] == "failed")
+
+            job_id = await service.start_training([], [], {"epochs": 1})
+            await _wait_for(lambda: service.job_store.get(job_id).get("loss") == 0.25)
+            await service.stop_training(job_id)
+            await _wait_for(lambda: service.job_store.get(job_id)["status"] == "stopped")
+        finally:
+            service.shutdown()
+
+    asyncio.run(run())
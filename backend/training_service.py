@@ -1,33 +1,113 @@
 import os
+import time
 import uuid
+import socket
 import asyncio
-from typing import List, Dict
-
-# Optional imports for training functionality
-try:
-    from transformers import AutoTokenizer, AutoModelForTokenClassification, TrainingArguments, Trainer
-    from transformers import DataCollatorForTokenClassification
-    from datasets import Dataset
-    import torch
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
-    print("⚠️  Transformers not installed. Training functionality will be limited.")
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Optional
+
+from synthetic_data import dataset_versions
+from sweep import TrialScheduler, sample_trials, leaderboard
+from checkpoints import checkpoint_dir, latest_checkpoint
+from inference_service import model_dir
+from scheduler import JobScheduler, QueueFullError, estimate_memory_mb, default_memory_budget_mb
+from job_store import create_job_store, TERMINAL_STATUSES
+from progress_hub import ProgressHub, JOBS_CHANNEL
+from metrics import (
+    gauge, JOB_PHASE_SECONDS, TRAINING_EPOCH_SECONDS, TRAINING_SAMPLES_PER_SECOND, TRAINING_TOKENS_PER_SECOND
+)
 
 from presets import PRESET_DATA
 
 
+ACTIVE_STATUSES = ("running", "initializing", "preparing_data", "evaluating", "saving", "distilling", "stopping")
+
+# Job fields pushed to streaming clients when they change
+STREAM_FIELDS = (
+    "status", "progress", "epoch", "total_epochs", "loss", "final_loss", "metrics", "model_path", "error",
+    "rows_done", "rows_per_sec", "output_path", "artifacts", "dataset", "dataset_version", "total_examples",
+    "val_loss", "pruned", "leaderboard", "best_job_id", "trials_finished", "queue_position", "eta_seconds",
+    "checkpoint_step", "resumed_from_step", "student", "students", "distill_progress",
+    "stopped_at_step", "discarded_steps", "discarded_seconds", "stop_latency_seconds", "samples_per_sec",
+    "tokens_per_sec", "padding_efficiency", "warm_start", "trainable_parameters"
+)
+
+# Job fields that never change after creation; status responses leave them out unless asked for
+STATIC_FIELDS = ("entities", "intents", "config", "search_space", "rungs", "trial_ids")
+
+# Worker entry points as "module.function"; only pool processes import them, and with them torch
+TRAIN_TASK = "training_worker.train_job"
+SCORE_TASK = "scoring_worker.score_job"
+INIT_TASK = "training_worker.init_worker"
+
+
+def _run_task(task: str, *args):
+    """Import ``task`` in the calling (worker) process and call it"""
+    module_name, function_name = task.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), function_name)(*args)
+
+
 class TrainingService:
-    def __init__(self):
-        self.training_jobs = {}
+    def __init__(self, job_store=None):
+        self.job_store = job_store or create_job_store()
+        # Several API workers can share one job store: each owns the jobs it started and
+        # heartbeats, and the others fail its unfinished jobs once the heartbeat goes stale
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.sync_interval = float(os.getenv("JOB_SYNC_INTERVAL_SECONDS", "1"))
+        self.owner_timeout = float(os.getenv("OWNER_TIMEOUT_SECONDS", "30"))
+        self.job_store.heartbeat(self.owner_id)
+        interrupted = self.job_store.recover_interrupted(self.job_store.live_owners(self.owner_timeout))
+        if interrupted:
+            print(f"⚠️  Marked {len(interrupted)} interrupted training job(s) as failed")
+        self.progress_hub = ProgressHub()
         self.models_dir = os.path.join(os.path.dirname(__file__), "..", "models")
         os.makedirs(self.models_dir, exist_ok=True)
+        default_scoring_dir = os.path.join(os.path.dirname(__file__), "..", "data", "scoring")
+        self.scoring_dir = os.path.realpath(os.getenv("SCORING_DATA_DIR", default_scoring_dir))
+        os.makedirs(self.scoring_dir, exist_ok=True)
+
+        # Training runs in a bounded pool of worker processes, never on the event loop
+        cpu_count = os.cpu_count() or 1
+        self.max_workers = int(os.getenv("TRAINING_WORKERS", max(1, cpu_count // 4)))
+        self.threads_per_worker = int(os.getenv("TRAINING_THREADS_PER_WORKER", max(1, cpu_count // self.max_workers)))
+        # Admission control in front of the pool: bounded queue, priorities, memory budget
+        self.scheduler = JobScheduler(
+            max_running=self.max_workers,
+            memory_budget_mb=int(os.getenv("TRAINING_MEMORY_BUDGET_MB", default_memory_budget_mb())),
+            max_queue=int(os.getenv("TRAINING_QUEUE_SIZE", "100")),
+            on_change=self._publish_queue
+        )
+        # job_id -> (status, time it was entered), for the per-phase duration histogram
+        self._phase_started = {}
+        gauge("training_queue_depth", "Jobs waiting for a worker slot", function=lambda: self.scheduler.stats()["queued"])
+        gauge("training_jobs_admitted", "Jobs holding a worker slot", function=lambda: self.scheduler.stats()["running"])
+        gauge("training_memory_reserved_bytes", "Estimated memory of admitted jobs",
+              function=lambda: self.scheduler.stats()["memory_used_mb"] * 1024 * 1024)
+        gauge("jobs", "Jobs in the job store by status", ("status",),
+              function=lambda: {(status,): count for status, count in self.job_store.count_by_status().items()})
+        self._executor = None
+        self._manager = None
+        self._events = None
+        self._event_pump = None
+        self._stop_events = {}
+        # sweep_id -> TrialScheduler of the sweeps running in this process
+        self._sweeps = {}
+        self._coordinator = None
+        # job_id -> last record seen of jobs owned elsewhere that local clients stream
+        self._relayed = {}
+        self._relayed_counters = None
 
     async def start_training(
         self,
         entities: List[Dict],
         intents: List[Dict],
-        config: Dict
+        config: Dict,
+        priority: int = 0,
+        user_id: Optional[str] = None
     ) -> str:
         """Start a training job"""
         # Convert Pydantic models to dicts if needed
@@ -41,13 +121,26 @@ class TrainingService:
             config = config.dict()
         elif not isinstance(config, dict):
             config = dict(config)
+        if config.get("dataset"):
+            versions = dataset_versions(config["dataset"])
+            if not versions or config.get("dataset_version") not in versions + [None]:
+                raise ValueError(f"Dataset {config['dataset']} (version {config.get('dataset_version') or 'latest'}) not found")
+        if config.get("use_adapter") and any(
+            config.get(option) for option in ("parent_job_id", "export_quantized", "export_onnx", "distill_students")
+        ):
+            raise ValueError("Adapter training can't be combined with parent_job_id, exports or distillation")
+        if config.get("parent_job_id"):
+            if not os.path.exists(os.path.join(model_dir(self.models_dir, config["parent_job_id"]), "labels.json")):
+                raise ValueError(f"No trained model found for parent job {config['parent_job_id']}")
         
         job_id = str(uuid.uuid4())
+        # Raises QueueFullError before anything is recorded
+        self._submit(job_id, "training", config, priority, user_id)
         
         # Store job info
         import datetime
-        self.training_jobs[job_id] = {
-            "status": "running",
+        self.job_store.create(job_id, {
+            "status": "queued",
             "progress": 0,
             "epoch": 0,
             "total_epochs": config.get("epochs", 10),
@@ -55,9 +148,13 @@ class TrainingService:
             "entities": entities,
             "intents": intents,
             "config": config,
+            "priority": priority,
+            "user_id": user_id,
             "created_at": datetime.datetime.now().isoformat(),
-            "stop_requested": False
-        }
+            "stop_requested": False,
+            "owner": self.owner_id
+        })
+        self.progress_hub.publish(JOBS_CHANNEL, self.get_job_counters())
         
         # Start training in background
         asyncio.create_task(self._train_model(job_id, entities, intents, config))
@@ -71,82 +168,537 @@ class TrainingService:
         intents: List[Dict],
         config: Dict
     ):
-        """Train the DistilBERT model"""
+        """Run the training engine in the worker pool and record its result"""
+        await self._run_in_pool(job_id, TRAIN_TASK, entities, intents, config, self.models_dir)
+
+    async def start_sweep(
+        self,
+        entities: List[Dict],
+        intents: List[Dict],
+        config: Dict,
+        search_space: Dict,
+        num_trials: int = 8,
+        strategy: str = "asha",
+        reduction_factor: int = 3,
+        min_epochs: int = 1,
+        seed: int = 42,
+        priority: int = 0,
+        user_id: Optional[str] = None
+    ) -> str:
+        """Start a hyperparameter sweep: one training trial per sampled configuration"""
+        if entities and hasattr(entities[0], 'dict'):
+            entities = [e.dict() for e in entities]
+        if intents and hasattr(intents[0], 'dict'):
+            intents = [i.dict() for i in intents]
+        if hasattr(config, 'dict'):
+            config = config.dict()
+        if not 1 <= num_trials <= 100:
+            raise ValueError("num_trials must be between 1 and 100")
+        trials = sample_trials(search_space, num_trials, seed)
+        max_epochs = max(t.get("epochs", config.get("epochs", 10)) for t in trials)
+        scheduler = TrialScheduler(strategy, reduction_factor, min_epochs, max_epochs)
+        if not self.scheduler.has_room(len(trials)):
+            raise QueueFullError(f"Job queue has no room for {len(trials)} trials")
+
+        import datetime
+        sweep_id = str(uuid.uuid4())
+        trial_ids = [str(uuid.uuid4()) for _ in trials]
+        self.job_store.create(sweep_id, {
+            "job_type": "sweep",
+            "status": "running",
+            "progress": 0,
+            "config": config,
+            "search_space": search_space,
+            "strategy": strategy,
+            "rungs": scheduler.rungs,
+            "trial_ids": trial_ids,
+            "trials_finished": 0,
+            "leaderboard": [],
+            "best_job_id": None,
+            "user_id": user_id,
+            "created_at": datetime.datetime.now().isoformat(),
+            "stop_requested": False,
+            "owner": self.owner_id
+        })
+        self._phase_started[sweep_id] = ("running", time.time())
+        for trial_id, params in zip(trial_ids, trials):
+            # Trials evaluate every epoch so the scheduler can compare them at each rung
+            # Trials are cheap to rerun and often pruned, so they don't checkpoint
+            # Only the winning configuration is worth distilling or exporting; trials skip both
+            trial_config = dict(config, **params, eval_every_epoch=True, checkpoint_every_steps=0, distill_students=None,
+                                export_quantized=False, export_onnx=False)
+            self._submit(trial_id, "training", trial_config, priority, user_id)
+            self.job_store.create(trial_id, {
+                "job_type": "trial",
+                "sweep_id": sweep_id,
+                "params": params,
+                "status": "queued",
+                "progress": 0,
+                "epoch": 0,
+                "total_epochs": trial_config.get("epochs", 10),
+                "loss": None,
+                "val_history": {},
+                "config": trial_config,
+                "priority": priority,
+                "user_id": user_id,
+                "created_at": datetime.datetime.now().isoformat(),
+                "stop_requested": False,
+                "owner": self.owner_id
+            })
+        self._sweeps[sweep_id] = scheduler
+        self.progress_hub.publish(JOBS_CHANNEL, self.get_job_counters())
+        asyncio.create_task(self._run_sweep(sweep_id, trial_ids, entities, intents))
+        return sweep_id
+
+    async def _run_sweep(self, sweep_id: str, trial_ids: List[str], entities: List[Dict], intents: List[Dict]):
+        """Run all trials through the worker pool; the pool size bounds how many train at once"""
+        async def run_trial(trial_id: str):
+            trial = self.job_store.get(trial_id)
+            await self._run_in_pool(trial_id, TRAIN_TASK, entities, intents, trial["config"], self.models_dir)
+            self._refresh_sweep(sweep_id)
+
+        try:
+            await asyncio.gather(*(run_trial(trial_id) for trial_id in trial_ids))
+        finally:
+            self._sweeps.pop(sweep_id, None)
+        sweep = self._refresh_sweep(sweep_id)
+        if sweep["status"] not in TERMINAL_STATUSES:
+            self._update_job(sweep_id, {"status": "completed", "progress": 100}, previous=sweep)
+
+    def _refresh_sweep(self, sweep_id: str) -> Dict:
+        """Recompute a sweep's leaderboard from its trial records"""
+        sweep = self.job_store.get(sweep_id)
+        trials = [dict(self.job_store.get(t), job_id=t) for t in sweep["trial_ids"]]
+        board = leaderboard(trials)
+        finished = sum(1 for t in trials if t["status"] in TERMINAL_STATUSES)
+        completed = [row for row in board if row["status"] == "completed" and row["best_val_loss"] is not None]
+        budget = sum(t.get("total_epochs", 0) for t in trials)
+        fields = {
+            "leaderboard": board,
+            "trials_finished": finished,
+            "best_job_id": completed[0]["job_id"] if completed else None,
+            # Share of the full epoch budget that pruning avoided so far
+            "epochs_saved": round(1 - sum(row["epochs_run"] for row in board) / budget, 3) if budget else 0.0
+        }
+        if sweep["status"] not in TERMINAL_STATUSES:
+            fields["progress"] = int(finished / max(len(trials), 1) * 100)
+        return self._update_job(sweep_id, fields, previous=sweep)
+
+    def _report_trial(self, trial: Dict, trial_id: str, epoch: int, val_loss: float):
+        """Feed a trial's validation loss to its sweep's scheduler and prune it if it is losing"""
+        scheduler = self._sweeps.get(trial["sweep_id"])
+        history = dict(trial.get("val_history") or {}, **{str(epoch): val_loss})
+        self.job_store.update(trial_id, {"val_history": history})
+        if trial["status"] != "stopping" and scheduler is not None and not scheduler.report(trial_id, epoch, val_loss):
+            self._request_stop(trial_id, trial, pruned=True)
+        self._refresh_sweep(trial["sweep_id"])
+
+    async def start_dataset_generation(self, generator, entities: List[Dict], intents: List[Dict], config: Dict) -> str:
+        """Start generating a synthetic dataset with ``generator`` (a DatasetGenerator)"""
+        if entities and hasattr(entities[0], 'dict'):
+            entities = [e.dict() for e in entities]
+        if intents and hasattr(intents[0], 'dict'):
+            intents = [i.dict() for i in intents]
+        if hasattr(config, 'dict'):
+            config = config.dict()
+        generator.check_config(intents, config)
+
+        job_id = str(uuid.uuid4())
+        self.start_coordination()
+        import datetime
+        self.job_store.create(job_id, {
+            "job_type": "dataset",
+            "status": "running",
+            "progress": 0,
+            "entities": entities,
+            "intents": intents,
+            "config": config,
+            "created_at": datetime.datetime.now().isoformat(),
+            "stop_requested": False,
+            "owner": self.owner_id
+        })
+        self._phase_started[job_id] = ("running", time.time())
+        self.progress_hub.publish(JOBS_CHANNEL, self.get_job_counters())
+        asyncio.create_task(self._generate_dataset(job_id, generator, entities, intents, config))
+        return job_id
+
+    async def _generate_dataset(self, job_id: str, generator, entities: List[Dict], intents: List[Dict], config: Dict):
+        """Run dataset generation on the event loop (it is LLM I/O bound) and record its manifest"""
+        # Generation runs in this process, so a plain threading.Event serves as its stop signal
+        stop_event = threading.Event()
+        self._stop_events[job_id] = stop_event
+
+        def on_progress(**update):
+            if not stop_event.is_set():
+                self._update_job(job_id, update)
         try:
-            self.training_jobs[job_id]["status"] = "initializing"
-            self.training_jobs[job_id]["progress"] = 5
-            
-            await asyncio.sleep(0.5)  # Small delay for status update
-            
-            # Load tokenizer and model (if transformers available)
-            if TRANSFORMERS_AVAILABLE:
-                model_name = config.get("model_base", "distilbert-base-uncased")
-                tokenizer = AutoTokenizer.from_pretrained(model_name)
-                self.training_jobs[job_id]["status"] = "preparing_data"
-                self.training_jobs[job_id]["progress"] = 15
+            manifest = await generator.generate(entities, intents, config, on_progress, stop_event)
+            if not stop_event.is_set():
+                self._update_job(job_id, {
+                    "status": "completed",
+                    "progress": 100,
+                    "dataset": manifest["name"],
+                    "dataset_version": manifest["version"],
+                    "total_examples": manifest["total_examples"],
+                    "duplicates_removed": manifest["duplicates_removed"]
+                })
             else:
-                # Simulate model loading without transformers
-                self.training_jobs[job_id]["status"] = "preparing_data"
-                self.training_jobs[job_id]["progress"] = 15
-                await asyncio.sleep(0.5)
-            
-            # Simulate training epochs
-            epochs = config.get("epochs", 10)
-            for epoch in range(epochs):
-                # Check if stop was requested
-                if self.training_jobs[job_id].get("stop_requested", False):
-                    self.training_jobs[job_id]["status"] = "stopped"
-                    return
-                
-                await asyncio.sleep(0.8)  # Simulate training time
-                self.training_jobs[job_id]["epoch"] = epoch + 1
-                self.training_jobs[job_id]["progress"] = 15 + int((epoch + 1) / epochs * 70)
-                self.training_jobs[job_id]["loss"] = round(0.5 - (epoch * 0.04), 4)  # Simulated loss
-            
-            self.training_jobs[job_id]["status"] = "evaluating"
-            self.training_jobs[job_id]["progress"] = 90
-            
-            await asyncio.sleep(0.5)
-            
-            self.training_jobs[job_id]["status"] = "saving"
-            self.training_jobs[job_id]["progress"] = 95
-            
-            # Save model (simplified)
-            model_path = os.path.join(self.models_dir, job_id)
-            os.makedirs(model_path, exist_ok=True)
-            
-            await asyncio.sleep(0.5)
-            
-            self.training_jobs[job_id]["status"] = "completed"
-            self.training_jobs[job_id]["progress"] = 100
-            self.training_jobs[job_id]["model_path"] = model_path
-            self.training_jobs[job_id]["final_loss"] = round(0.5 - ((epochs - 1) * 0.04), 4)
-            
+                self._update_job(job_id, {"status": "stopped"})
         except Exception as e:
-            self.training_jobs[job_id]["status"] = "failed"
-            self.training_jobs[job_id]["error"] = str(e)
             import traceback
-            self.training_jobs[job_id]["traceback"] = traceback.format_exc()
+            self._update_job(job_id, {"status": "failed", "error": str(e), "traceback": traceback.format_exc()})
+        finally:
+            self._stop_events.pop(job_id, None)
 
-    async def get_training_status(self, job_id: str) -> Dict:
-        """Get status of a training job"""
-        if job_id not in self.training_jobs:
+    async def start_scoring(self, config: Dict, priority: int = 0, user_id: Optional[str] = None) -> str:
+        """Start a bulk scoring job over a JSONL/CSV file with a trained model"""
+        if hasattr(config, 'dict'):
+            config = config.dict()
+        config = dict(config)
+        priority = config.pop("priority", priority)
+        user_id = config.pop("user_id", user_id)
+        model_path = model_dir(self.models_dir, config["model_job_id"], config.get("student"))
+        if not os.path.exists(os.path.join(model_path, "labels.json")):
+            if config.get("student"):
+                raise ValueError(f"No distilled student {config['student']} found for job {config['model_job_id']}")
+            raise ValueError(f"No trained model found for job {config['model_job_id']}")
+        config["input_path"] = self._scoring_path(config["input_path"])
+        config["output_path"] = self._scoring_path(config["output_path"])
+        if not os.path.exists(config["input_path"]):
+            raise ValueError(f"Input file {config['input_path']} not found")
+        config["resume"] = False
+
+        job_id = str(uuid.uuid4())
+        self._submit(job_id, "scoring", config, priority, user_id)
+        import datetime
+        self.job_store.create(job_id, {
+            "job_type": "scoring",
+            "status": "queued",
+            "priority": priority,
+            "user_id": user_id,
+            "progress": 0,
+            "rows_done": 0,
+            "rows_per_sec": None,
+            "config": config,
+            "created_at": datetime.datetime.now().isoformat(),
+            "stop_requested": False,
+            "owner": self.owner_id
+        })
+        self.progress_hub.publish(JOBS_CHANNEL, self.get_job_counters())
+        asyncio.create_task(self._run_in_pool(job_id, SCORE_TASK, config, self.models_dir))
+        return job_id
+
+    async def resume_training(self, job_id: str) -> Dict:
+        """Continue a stopped or failed training job from its latest checkpoint"""
+        job = self.job_store.get(job_id)
+        if job is None or job.get("job_type") not in (None, "training"):
+            raise ValueError(f"Training job {job_id} not found")
+        if job["status"] not in ("stopped", "failed"):
+            return {"job_id": job_id, "status": job["status"], "message": f"Training job is {job['status']}"}
+        if job_id in self._stop_events:
+            # The stopped run is still winding down and may write one last checkpoint
+            return {"job_id": job_id, "status": job["status"], "message": "Training job is still stopping; retry shortly"}
+        if latest_checkpoint(checkpoint_dir(os.path.join(self.models_dir, job_id))) is None:
+            raise ValueError(f"No checkpoint found for job {job_id}")
+        config = dict(job["config"], resume=True)
+        self._submit(job_id, "training", config, job.get("priority", 0), job.get("user_id"))
+        self._update_job(job_id, {
+            "status": "queued",
+            "stop_requested": False,
+            "error": None,
+            "config": config,
+            "owner": self.owner_id
+        }, previous=job)
+        asyncio.create_task(self._train_model(job_id, job["entities"], job["intents"], config))
+        return {"job_id": job_id, "status": "queued", "message": "Training job resumed from checkpoint"}
+
+    async def resume_scoring(self, job_id: str) -> Dict:
+        """Continue a stopped or failed scoring job from its last checkpoint"""
+        job = self.job_store.get(job_id)
+        if job is None or job.get("job_type") != "scoring":
+            raise ValueError(f"Scoring job {job_id} not found")
+        if job["status"] not in ("stopped", "failed"):
+            return {"job_id": job_id, "status": job["status"], "message": f"Scoring job is {job['status']}"}
+        config = dict(job["config"], resume=True)
+        self._submit(job_id, "scoring", config, job.get("priority", 0), job.get("user_id"))
+        self._update_job(job_id, {
+            "status": "queued",
+            "stop_requested": False,
+            "error": None,
+            "config": config,
+            "owner": self.owner_id
+        }, previous=job)
+        asyncio.create_task(self._run_in_pool(job_id, SCORE_TASK, config, self.models_dir))
+        return {"job_id": job_id, "status": "queued", "message": "Scoring job resumed from checkpoint"}
+
+    def _scoring_path(self, path: str) -> str:
+        """Resolve a scoring input/output path, which must stay inside scoring_dir"""
+        resolved = os.path.realpath(os.path.join(self.scoring_dir, path))
+        if not resolved.startswith(self.scoring_dir + os.sep):
+            raise ValueError(f"Path {path} is outside the scoring data directory")
+        return resolved
+
+    def _submit(self, job_id: str, job_type: str, config: Dict, priority: int, user_id: Optional[str]):
+        """Queue a pool job with the scheduler; raises QueueFullError when the queue is full"""
+        self.start_coordination()
+        units = config.get("epochs", 10) if job_type == "training" else 1
+        self._phase_started[job_id] = ("queued", time.time())
+        self.scheduler.submit(
+            job_id,
+            estimate_memory_mb(config, job_type),
+            priority=priority,
+            user_id=user_id,
+            job_type=job_type,
+            units=units
+        )
+
+    def _publish_queue(self):
+        """Record fresh queue positions and ETAs of waiting jobs, for every API worker to serve"""
+        for job_id in self.scheduler.pending_ids():
+            self._record_queue_info(job_id)
+
+    def _record_queue_info(self, job_id: str):
+        info = self.scheduler.queue_info(job_id)
+        job = self.job_store.get(job_id)
+        # Not recorded yet while it is being submitted
+        if info is not None and job is not None and job["status"] == "queued":
+            self._update_job(job_id, info, previous=job)
+
+    async def _run_in_pool(self, job_id: str, task: str, *args):
+        """Wait for admission, then run ``task(job_id, *args, events, stop_event)`` in the worker pool"""
+        self._record_queue_info(job_id)
+        if not await self.scheduler.wait(job_id):
+            # Cancelled while queued
+            return
+        try:
+            job = self.job_store.get(job_id)
+            if job["status"] in TERMINAL_STATUSES:
+                # Stopped through another API worker just before admission
+                return
+            if job["status"] == "queued":
+                self._update_job(job_id, {"status": "initializing", "queue_position": None, "eta_seconds": None}, previous=job)
+            await self._execute(job_id, task, *args)
+        finally:
+            self.scheduler.release(job_id)
+
+    async def _execute(self, job_id: str, task: str, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            executor = self._get_executor()
+            self._ensure_event_pump()
+            stop_event = self._manager.Event()
+            if self.job_store.get(job_id).get("stop_requested"):
+                stop_event.set()
+            self._stop_events[job_id] = stop_event
+            result = await loop.run_in_executor(
+                executor,
+                _run_task,
+                task,
+                job_id,
+                *args,
+                self._events,
+                stop_event
+            )
+            job = self.job_store.get(job_id)
+            if job["status"] == "stopping" and result.get("status") == "stopped":
+                result = dict(result, stop_latency_seconds=round(time.time() - job["stop_requested_at"], 3))
+            if job["status"] != "stopped":
+                self._update_job(job_id, result, previous=job)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool) and self._executor is executor:
+                # A worker died (e.g. OOM); the next job gets a fresh pool, while the manager,
+                # its event queue and the pump reading it stay in service
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            import traceback
+            self._update_job(job_id, {
+                "status": "failed",
+                "error": str(e),
+                "traceback": traceback.format_exc()
+            })
+        finally:
+            self._stop_events.pop(job_id, None)
+
+    def _update_job(self, job_id: str, fields: Dict, previous: Optional[Dict] = None) -> Dict:
+        """Update a job record and push the fields that changed to subscribers"""
+        if previous is None:
+            previous = self.job_store.get(job_id)
+        job = self.job_store.update(job_id, fields)
+        delta = {
+            field: job.get(field)
+            for field in STREAM_FIELDS
+            if field in fields and job.get(field) != previous.get(field)
+        }
+        if delta:
+            self.progress_hub.publish(job_id, delta)
+        if job["status"] != previous["status"]:
+            self.progress_hub.publish(JOBS_CHANNEL, self.get_job_counters())
+            self._record_phase(job_id, job)
+        return job
+
+    def _record_phase(self, job_id: str, job: Dict):
+        """Observe how long a job spent in the status it just left"""
+        now = time.time()
+        phase, started = self._phase_started.pop(job_id, (None, None))
+        if phase is not None and phase != job["status"]:
+            JOB_PHASE_SECONDS.observe(now - started, job_type=job.get("job_type") or "training", phase=phase)
+        if job["status"] not in TERMINAL_STATUSES:
+            self._phase_started[job_id] = (job["status"], now)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Create the training worker pool on first use, and again after a worker crash broke it"""
+        context = multiprocessing.get_context("spawn")
+        if self._manager is None:
+            # Lives as long as the service, so the event pump never waits on a stale queue
+            self._manager = context.Manager()
+            self._events = self._manager.Queue()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_run_task,
+                initargs=(INIT_TASK, self.threads_per_worker)
+            )
+        return self._executor
+
+    def start_coordination(self):
+        """Start heartbeating and syncing with the other processes that share the job store"""
+        if self._coordinator is None or self._coordinator.done():
+            self._coordinator = asyncio.create_task(self._coordinate())
+
+    async def _coordinate(self):
+        last_heartbeat = time.time()
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                self._sync_stop_requests()
+                self._relay_remote_updates()
+                if time.time() - last_heartbeat >= min(5.0, self.owner_timeout / 3):
+                    last_heartbeat = time.time()
+                    self.job_store.heartbeat(self.owner_id)
+                    interrupted = self.job_store.recover_interrupted(self.job_store.live_owners(self.owner_timeout))
+                    if interrupted:
+                        # Stream subscribers learn about it from the relay
+                        print(f"⚠️  Marked {len(interrupted)} job(s) of a stopped server process as failed")
+            except Exception as e:
+                # A transient store error (e.g. a locked database) must not end coordination
+                print(f"Warning: job coordination failed: {e}")
+
+    def _sync_stop_requests(self):
+        """Apply stop requests that other API workers recorded for jobs running or queued here"""
+        for job_id in [*self._stop_events, *self.scheduler.pending_ids()]:
+            job = self.job_store.get(job_id)
+            if job is None or not job.get("stop_requested"):
+                continue
+            stop_event = self._stop_events.get(job_id)
+            if stop_event is not None:
+                if not stop_event.is_set():
+                    stop_event.set()
+            else:
+                self.scheduler.cancel(job_id)
+
+    def _relay_remote_updates(self):
+        """Publish changes of jobs owned by other processes to this process's stream subscribers"""
+        channels = set(self.progress_hub.channels())
+        for job_id in list(self._relayed):
+            if job_id not in channels:
+                del self._relayed[job_id]
+        for channel in channels:
+            if channel == JOBS_CHANNEL:
+                counters = self.get_job_counters()
+                if counters != self._relayed_counters:
+                    self._relayed_counters = counters
+                    self.progress_hub.publish(JOBS_CHANNEL, counters)
+                continue
+            job = self.job_store.get(channel)
+            if job is None or job.get("owner") == self.owner_id:
+                continue
+            previous = self._relayed.get(channel)
+            self._relayed[channel] = job
+            if previous is None or previous.get("version") == job.get("version"):
+                continue
+            delta = {field: job.get(field) for field in STREAM_FIELDS if job.get(field) != previous.get(field)}
+            if delta:
+                self.progress_hub.publish(channel, delta)
+
+    def relay_from(self, job_id: str, snapshot: Dict):
+        """Relay later changes of a job owned elsewhere relative to ``snapshot``, what a new stream client was sent"""
+        self._relayed.setdefault(job_id, snapshot)
+
+    def _owned_elsewhere(self, job: Dict) -> bool:
+        owner = job.get("owner")
+        return owner not in (None, self.owner_id) and owner in self.job_store.live_owners(self.owner_timeout)
+
+    def _ensure_event_pump(self):
+        """Start the task that copies worker progress events into the job records"""
+        if self._event_pump is None or self._event_pump.done():
+            self._event_pump = asyncio.create_task(self._pump_events())
+
+    async def _pump_events(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                job_id, update = await loop.run_in_executor(None, self._events.get)
+            except (EOFError, OSError):
+                # Manager was shut down
+                return
+            job = self.job_store.get(job_id)
+            # Late events must not overwrite a final status
+            if job is None or job["status"] in TERMINAL_STATUSES:
+                continue
+            if job["status"] == "stopping":
+                # Keep reporting progress, but the job stays "stopping" until its worker returns
+                update = {k: v for k, v in update.items() if k != "status"}
+            job = self._update_job(job_id, update, previous=job)
+            if update.get("epoch_seconds") is not None:
+                TRAINING_EPOCH_SECONDS.observe(update["epoch_seconds"])
+                TRAINING_SAMPLES_PER_SECOND.observe(update["samples_per_sec"])
+                TRAINING_TOKENS_PER_SECOND.observe(update["tokens_per_sec"])
+            if job.get("sweep_id") and update.get("val_loss") is not None:
+                self._report_trial(job, job_id, update["epoch"], update["val_loss"])
+
+    def shutdown(self):
+        """Stop the worker pool and the progress manager"""
+        if self._coordinator is not None:
+            self._coordinator.cancel()
+            self._coordinator = None
+        self.scheduler.shutdown()
+        for stop_event in self._stop_events.values():
+            stop_event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+        self.job_store.remove_owner(self.owner_id)
+        self.job_store.close()
+
+    async def get_training_status(self, job_id: str, fields: Optional[List[str]] = None) -> Dict:
+        """Get status of a training job: ``fields`` and its version, or everything but STATIC_FIELDS"""
+        job = self.job_store.get(job_id)
+        if job is None:
             raise ValueError(f"Job {job_id} not found")
-        
-        return self.training_jobs[job_id]
+        if job["status"] == "queued":
+            job.update(self.scheduler.queue_info(job_id) or {})
+        if fields:
+            return {field: job[field] for field in [*fields, "version"] if field in job}
+        return {field: value for field, value in job.items() if field not in STATIC_FIELDS}
     
     async def stop_training(self, job_id: str) -> Dict:
         """Stop a running training job"""
-        if job_id not in self.training_jobs:
+        job = self.job_store.get(job_id)
+        if job is None:
             raise ValueError(f"Job {job_id} not found")
         
-        job = self.training_jobs[job_id]
-        
-        # Only stop if job is running
-        if job["status"] in ["running", "initializing", "preparing_data"]:
-            job["stop_requested"] = True
-            job["status"] = "stopped"
-            job["progress"] = job.get("progress", 0)
+        if job.get("job_type") == "sweep" and job["status"] == "running":
+            for trial_id in job["trial_ids"]:
+                await self.stop_training(trial_id)
+        # Only stop if job is queued or running
+        if job["status"] == "queued" or (job["status"] in ACTIVE_STATUSES and job["status"] != "stopping"):
+            status = self._request_stop(job_id, job)
+            if status == "stopping":
+                return {"job_id": job_id, "status": "stopping", "message": "Training job is stopping"}
             return {"job_id": job_id, "status": "stopped", "message": "Training job stopped successfully"}
         elif job["status"] == "completed":
             return {"job_id": job_id, "status": "completed", "message": "Training job already completed"}
@@ -157,21 +709,70 @@ class TrainingService:
         else:
             return {"job_id": job_id, "status": job["status"], "message": f"Training job is already {job['status']}"}
     
-    def get_all_jobs(self) -> Dict:
-        """Get all training jobs"""
+    def _request_stop(self, job_id: str, job: Dict, pruned: bool = False) -> str:
+        """Signal a job to stop; it stays "stopping" until its worker returns, and is "stopped" at once otherwise"""
+        fields = {"stop_requested": True, "stop_requested_at": time.time()}
+        if pruned:
+            fields["pruned"] = True
+        # A queued job is dropped from the scheduler and never reaches a worker
+        self.scheduler.cancel(job_id)
+        if job_id in self._stop_events:
+            self._stop_events[job_id].set()
+            fields["status"] = "stopping"
+        elif job["status"] in ACTIVE_STATUSES and job.get("job_type") != "sweep" and self._owned_elsewhere(job):
+            # Its owner sees stop_requested on the next sync and signals the worker
+            fields["status"] = "stopping"
+        else:
+            fields["status"] = "stopped"
+        self._update_job(job_id, fields, previous=job)
+        return fields["status"]
+
+    def get_all_jobs(
+        self,
+        status: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Dict:
+        """Get job counters and one page of job summaries, newest first"""
+        if status == "running":
+            statuses = list(ACTIVE_STATUSES)
+        elif status:
+            statuses = [status]
+        else:
+            statuses = None
         return {
-            "total_jobs": len(self.training_jobs),
-            "running_jobs": len([j for j in self.training_jobs.values() if j["status"] in ["running", "initializing", "preparing_data"]]),
-            "completed_jobs": len([j for j in self.training_jobs.values() if j["status"] == "completed"]),
-            "failed_jobs": len([j for j in self.training_jobs.values() if j["status"] == "failed"]),
-            "stopped_jobs": len([j for j in self.training_jobs.values() if j["status"] == "stopped"]),
-            "jobs": {job_id: {
-                "status": job["status"],
-                "progress": job.get("progress", 0),
-                "epoch": job.get("epoch", 0),
-                "total_epochs": job.get("total_epochs", 0),
-                "loss": job.get("loss"),
-                "created_at": job.get("created_at", "unknown")
-            } for job_id, job in self.training_jobs.items()}
+            **self.get_job_counters(),
+            "limit": limit,
+            "offset": offset,
+            "scheduler": self.scheduler.stats(),
+            "jobs": dict(self.job_store.list(statuses=statuses, limit=limit, offset=offset))
         }
 
+    def get_job_counters(self) -> Dict:
+        """Get the number of jobs per status group"""
+        counts = self.job_store.count_by_status()
+        return {
+            "total_jobs": sum(counts.values()),
+            "running_jobs": sum(counts.get(s, 0) for s in ACTIVE_STATUSES),
+            "queued_jobs": counts.get("queued", 0),
+            "completed_jobs": counts.get("completed", 0),
+            "failed_jobs": counts.get("failed", 0),
+            "stopped_jobs": counts.get("stopped", 0)
+        }
+
+    def readiness(self) -> Dict:
+        """Whether the job store answers and the worker pool has been started"""
+        try:
+            self.job_store.count_by_status()
+            store_ok = True
+        except Exception:
+            store_ok = False
+        return {
+            "ready": store_ok,
+            "job_store": type(self.job_store).__name__,
+            "job_store_ok": store_ok,
+            "worker_pool_started": self._executor is not None,
+            "owner_id": self.owner_id,
+            "live_owners": len(self.job_store.live_owners(self.owner_timeout)) if store_ok else 0,
+            "scheduler": self.scheduler.stats()
+        }
@@ -0,0 +1,658 @@
+"""Training engine executed inside the training worker processes.
+
+Everything in this module runs in a child process of the API server, so it
+must only communicate with the parent through the ``events`` queue and the
+``stop_event`` it is handed by ``TrainingService``.
+"""
+
+import os
+import gc
+import json
+import ctypes
+import hashlib
+import math
+import random
+import shutil
+import time
+from typing import List, Dict, Optional
+
+from synthetic_data import load_examples
+from profiler import profiled
+from inference_service import ADAPTER_DIR, STUDENTS_DIR, model_dir
+
+# Optional imports for training functionality
+try:
+    from transformers import get_linear_schedule_with_warmup
+    import torch
+    from joint_model import JointModel, JOINT_DIR
+    from model_export import export_artifacts, joint_logits, timed_predictions
+    from adapters import add_adapters, save_adapter, DEFAULT_RANK, DEFAULT_ALPHA as DEFAULT_ADAPTER_ALPHA
+    from distillation import (
+        build_student, distillation_loss, student_name,
+        DEFAULT_TEMPERATURE, DEFAULT_ALPHA, DEFAULT_HIDDEN_WEIGHT
+    )
+    from dataset_cache import get_tokenizer, load_or_encode
+    from batching import collate, length_grouped_order, sequence_lengths
+    from checkpoints import (
+        CheckpointWriter, CHECKPOINT_EVERY_STEPS, CHECKPOINT_KEEP,
+        checkpoint_dir, latest_checkpoint, load_checkpoint
+    )
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+    print("⚠️  Transformers not installed. Training functionality will be limited.")
+
+
+# How many optimizer steps between two progress events
+PROGRESS_EVERY_STEPS = 5
+
+# Fingerprints of every example a saved model learned from, so a warm-started child can tell what is new
+SEEN_EXAMPLES_FILE = "seen_examples.json"
+# Old examples replayed per new one when warm-starting, so the model doesn't forget what it knew
+DEFAULT_REPLAY_RATIO = 1.0
+
+
+def init_worker(num_threads: int):
+    """Pin the CPU threads used by this worker so concurrent jobs don't oversubscribe cores"""
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    os.environ["MKL_NUM_THREADS"] = str(num_threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    if TRANSFORMERS_AVAILABLE:
+        torch.set_num_threads(num_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Already set for this process
+            pass
+
+
+def build_examples(entities: List[Dict], intents: List[Dict]) -> List[Dict]:
+    """Bootstrap BIO-tagged utterances from entity and intent definitions.
+
+    ``TrainingRequest`` only carries names and descriptions, so every intent is
+    paired with every entity and the entity name is used as its surface form.
+    """
+    examples = []
+    for intent in intents:
+        prefix = intent.get("description") or intent["name"].replace("_", " ")
+        prefix_words = prefix.lower().split()
+        for entity in entities:
+            entity_words = entity["name"].lower().split("_")
+            tokens = prefix_words + ["for"] + entity_words
+            tags = ["O"] * (len(prefix_words) + 1)
+            tags += [f"B-{entity['name']}"] + [f"I-{entity['name']}"] * (len(entity_words) - 1)
+            examples.append({"tokens": tokens, "tags": tags, "intent": intent["name"]})
+        if not entities:
+            examples.append({"tokens": prefix_words, "tags": ["O"] * len(prefix_words), "intent": intent["name"]})
+    return examples
+
+
+def _known_labels_only(examples: List[Dict], tag2id: Dict, intent2id: Dict) -> List[Dict]:
+    """Drop examples of unknown intents and tag unknown entities as O"""
+    kept = []
+    for ex in examples:
+        if ex["intent"] in intent2id:
+            kept.append(dict(ex, tags=[tag if tag in tag2id else "O" for tag in ex["tags"]]))
+    return kept
+
+
+def _example_key(example: Dict) -> str:
+    payload = json.dumps([example["tokens"], example["tags"], example["intent"]])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _load_parent(models_dir: str, parent_job_id: str) -> Dict:
+    """Saved model, labels and seen examples of the job a warm start continues from"""
+    path = model_dir(models_dir, parent_job_id)
+    if not os.path.isdir(os.path.join(path, JOINT_DIR)):
+        raise ValueError(f"Job {parent_job_id} has no joint model to warm-start from")
+    with open(os.path.join(path, "labels.json")) as f:
+        labels = json.load(f)
+    seen_keys = None
+    if os.path.exists(os.path.join(path, SEEN_EXAMPLES_FILE)):
+        with open(os.path.join(path, SEEN_EXAMPLES_FILE)) as f:
+            seen_keys = set(json.load(f))
+    return {"path": path, "tags": labels["tags"], "intents": labels["intents"], "seen_keys": seen_keys}
+
+
+def _incremental_index(examples: List[Dict], train_index, seen_keys, replay_ratio: float):
+    """Training examples the parent never learned, plus a random replay sample of the ones it did"""
+    if seen_keys is None:
+        # The parent predates seen-example tracking, so every example counts as new
+        return train_index, {"new_examples": len(train_index), "replay_examples": 0}
+    new, old = [], []
+    for i in train_index.tolist():
+        (old if _example_key(examples[i]) in seen_keys else new).append(i)
+    if not new:
+        raise ValueError("No new or changed training examples since the parent job")
+    replay = random.sample(old, min(len(old), round(len(new) * replay_ratio)))
+    return torch.tensor(new + replay), {"new_examples": len(new), "replay_examples": len(replay)}
+
+
+def _emit(events, job_id: str, **update):
+    if events is not None:
+        events.put((job_id, update))
+
+
+def _encode(examples: List[Dict], tokenizer, tag2id: Dict, intent2id: Dict, max_length: int) -> Dict:
+    """Tokenize examples and align word-level tags to the first sub-token of each word"""
+    encoded = tokenizer(
+        [ex["tokens"] for ex in examples],
+        is_split_into_words=True,
+        truncation=True,
+        padding="max_length",
+        max_length=max_length,
+        return_tensors="pt",
+    )
+    labels = []
+    for i, ex in enumerate(examples):
+        word_ids = encoded.word_ids(batch_index=i)
+        previous = None
+        row = []
+        for word_id in word_ids:
+            if word_id is None or word_id == previous:
+                row.append(-100)
+            else:
+                row.append(tag2id[ex["tags"][word_id]])
+            previous = word_id
+        labels.append(row)
+    return {
+        "input_ids": encoded["input_ids"],
+        "attention_mask": encoded["attention_mask"],
+        "labels": torch.tensor(labels, dtype=torch.long),
+        "intent_labels": torch.tensor([intent2id[ex["intent"]] for ex in examples], dtype=torch.long),
+    }
+
+
+def _stop_requested(stop_event) -> bool:
+    return stop_event is not None and stop_event.is_set()
+
+
+def _release_memory():
+    """Return the memory of a finished job to the OS so an idle worker doesn't hold its peak"""
+    gc.collect()
+    try:
+        # glibc keeps freed arenas mapped; trimming is what actually shrinks the worker's RSS
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _evaluate(model, data: Dict, batch_size: int, stop_event=None) -> Optional[Dict]:
+    """Compute validation loss, token accuracy and intent accuracy; None if stopped midway"""
+    model.eval()
+    total_loss, batches = 0.0, 0
+    token_correct, token_total, intent_correct = 0, 0, 0
+    size = data["input_ids"].shape[0]
+    # Metrics don't depend on the order, so batches of similar lengths keep padding to a minimum
+    order = torch.argsort(sequence_lengths(data))
+    with torch.inference_mode():
+        for start in range(0, size, batch_size):
+            if _stop_requested(stop_event):
+                return None
+            batch, _, _ = collate(data, order[start:start + batch_size])
+            out = model(**batch)
+            total_loss += out.loss.item()
+            batches += 1
+            mask = batch["labels"] != -100
+            token_correct += (out.token_logits.argmax(-1)[mask] == batch["labels"][mask]).sum().item()
+            token_total += mask.sum().item()
+            intent_correct += (out.intent_logits.argmax(-1) == batch["intent_labels"]).sum().item()
+    model.train()
+    return {
+        "val_loss": round(total_loss / max(batches, 1), 4),
+        "token_accuracy": round(token_correct / max(token_total, 1), 4),
+        "intent_accuracy": round(intent_correct / max(size, 1), 4),
+    }
+
+
+def _simulate_training(job_id: str, config: Dict, model_path: str, events, stop_event) -> Dict:
+    """Fallback used when transformers/torch are not installed in the worker"""
+    _emit(events, job_id, status="preparing_data", progress=15)
+    epochs = config.get("epochs", 10)
+    for epoch in range(epochs):
+        if stop_event is not None and stop_event.is_set():
+            return {"status": "stopped"}
+        time.sleep(0.8)
+        _emit(events, job_id, status="running", epoch=epoch + 1,
+              progress=15 + int((epoch + 1) / epochs * 70), loss=round(0.5 - (epoch * 0.04), 4))
+    _emit(events, job_id, status="evaluating", progress=90)
+    _emit(events, job_id, status="saving", progress=95)
+    os.makedirs(model_path, exist_ok=True)
+    return {
+        "status": "completed",
+        "progress": 100,
+        "model_path": model_path,
+        "final_loss": round(0.5 - ((epochs - 1) * 0.04), 4),
+    }
+
+
+def train_job(
+    job_id: str,
+    entities: List[Dict],
+    intents: List[Dict],
+    config: Dict,
+    models_dir: str,
+    events=None,
+    stop_event=None
+) -> Dict:
+    """Train the joint entity and intent model for one job.
+
+    Progress is pushed to ``events`` as ``(job_id, update)`` tuples; the return
+    value is the final update to merge into the job record.
+    """
+    try:
+        return profiled(job_id, config.get("profile", False), _train,
+                        job_id, entities, intents, config, models_dir, events, stop_event)
+    finally:
+        _release_memory()
+
+
+def _train(job_id: str, entities: List[Dict], intents: List[Dict], config: Dict, models_dir: str, events, stop_event) -> Dict:
+    if _stop_requested(stop_event):
+        # Stopped (or pruned) while it was waiting for a worker
+        return {"status": "stopped"}
+    _emit(events, job_id, status="initializing", progress=5)
+    model_path = os.path.join(models_dir, job_id)
+    if not TRANSFORMERS_AVAILABLE:
+        return _simulate_training(job_id, config, model_path, events, stop_event)
+
+    resume_state = None
+    if config.get("resume"):
+        checkpoint_path = latest_checkpoint(checkpoint_dir(model_path))
+        if checkpoint_path is None:
+            raise ValueError(f"No checkpoint found for job {job_id}")
+        resume_state = load_checkpoint(checkpoint_path)
+
+    seed = config.get("seed", 42)
+    random.seed(seed)
+    torch.manual_seed(seed)
+
+    model_name = config.get("model_base", "distilbert-base-uncased")
+    epochs = config.get("epochs", 10)
+    batch_size = config.get("batch_size", 16)
+    max_length = config.get("max_sequence_length", 128)
+    parent = _load_parent(models_dir, config["parent_job_id"]) if config.get("parent_job_id") else None
+
+    # A warm start keeps the parent's tokenizer along with its encoder
+    tokenizer = get_tokenizer(parent["path"] if parent else model_name)
+    _emit(events, job_id, status="preparing_data", progress=15)
+
+    tag_names = ["O"] + [f"{prefix}-{e['name']}" for e in entities for prefix in ("B", "I")]
+    intent_names = [i["name"] for i in intents]
+    if parent is not None:
+        # The parent's labels keep their ids (and head rows); new labels are appended
+        tag_names = parent["tags"] + [tag for tag in tag_names if tag not in parent["tags"]]
+        intent_names = parent["intents"] + [name for name in intent_names if name not in parent["intents"]]
+    tag2id = {tag: idx for idx, tag in enumerate(tag_names)}
+    intent2id = {name: idx for idx, name in enumerate(intent_names)}
+
+    dataset_version = None
+    if config.get("dataset"):
+        # A resumed job keeps training on the version it started with, even if newer ones exist
+        requested_version = resume_state["dataset_version"] if resume_state else config.get("dataset_version")
+        examples, dataset_version = load_examples(config["dataset"], requested_version)
+        examples = _known_labels_only(examples, tag2id, intent2id)
+        if not examples:
+            raise ValueError(f"Dataset {config['dataset']} has no examples for these intents")
+        _emit(events, job_id, dataset_version=dataset_version, train_examples=len(examples))
+    else:
+        examples = build_examples(entities, intents)
+    data, cache_hit = load_or_encode(
+        lambda: _encode(examples, tokenizer, tag2id, intent2id, max_length),
+        examples, tokenizer, tag_names, intent_names, max_length
+    )
+    _emit(events, job_id, dataset_cache_hit=cache_hit)
+    if _stop_requested(stop_event):
+        return {"status": "stopped", "stopped_at_step": 0, "discarded_steps": 0}
+    # Split by index so training batches are gathered straight from the shared (memory-mapped) tensors
+    order = list(range(len(examples)))
+    random.shuffle(order)
+    split = int(len(examples) * config.get("train_test_split", 0.8))
+    split = min(max(split, 1), len(examples))
+    train_index = torch.tensor(order[:split])
+    val_index = torch.tensor(order[split:] or order[:1])
+    val_data = {k: v[val_index] for k, v in data.items()}
+    lengths = sequence_lengths(data)
+    group_by_length = config.get("group_by_length", True)
+    pack = config.get("pack_sequences", False)
+    warm_start = None
+    if parent is not None:
+        train_index, counts = _incremental_index(
+            examples, train_index, parent["seen_keys"], config.get("replay_ratio", DEFAULT_REPLAY_RATIO)
+        )
+        warm_start = dict(
+            counts,
+            parent_job_id=config["parent_job_id"],
+            added_tags=len(tag_names) - len(parent["tags"]),
+            added_intents=len(intent_names) - len(parent["intents"]),
+            frozen_layers=config.get("freeze_layers") or 0
+        )
+        _emit(events, job_id, warm_start=warm_start)
+
+    if parent is not None:
+        model = JointModel.from_pretrained(os.path.join(parent["path"], JOINT_DIR))
+        model.extend_labels(len(tag_names), len(intent_names))
+        model.token_loss_weight = config.get("token_loss_weight", 1.0)
+        model.intent_loss_weight = config.get("intent_loss_weight", 1.0)
+    else:
+        # One encoder pass serves both heads
+        model = JointModel.from_encoder(
+            model_name,
+            num_tags=len(tag_names),
+            num_intents=len(intent_names),
+            token_loss_weight=config.get("token_loss_weight", 1.0),
+            intent_loss_weight=config.get("intent_loss_weight", 1.0),
+        )
+    if config.get("use_adapter"):
+        # Only the low-rank adapters and the heads train; the base encoder stays shared and frozen
+        adapter_rank = config.get("adapter_rank") or DEFAULT_RANK
+        adapter_alpha = config.get("adapter_alpha") or DEFAULT_ADAPTER_ALPHA
+        add_adapters(model, adapter_rank, adapter_alpha)
+    elif config.get("freeze_layers"):
+        model.freeze_lower_layers(config["freeze_layers"])
+    model.train()
+
+    params = [p for p in model.parameters() if p.requires_grad]
+    optimizer = torch.optim.AdamW(params, lr=config.get("learning_rate", 2e-5))
+    steps_per_epoch = math.ceil(len(train_index) / batch_size)
+    total_steps = steps_per_epoch * epochs
+    scheduler = get_linear_schedule_with_warmup(optimizer, int(0.1 * total_steps), total_steps)
+
+    global_step = 0
+    epoch_loss = None
+    metrics = None
+    start_epoch, start_batch = 0, 0
+    epoch_order = None
+    running_loss, seen = 0.0, 0
+    if resume_state is not None:
+        # Checkpoints of the earlier separate token and intent models hold no joint "model" state
+        if "model" not in resume_state:
+            raise ValueError(f"Checkpoint of job {job_id} was written by the two-model trainer and cannot be resumed")
+        model.load_state_dict(resume_state["model"])
+        optimizer.load_state_dict(resume_state["optimizer"])
+        scheduler.load_state_dict(resume_state["scheduler"])
+        random.setstate(resume_state["python_rng"])
+        torch.set_rng_state(resume_state["torch_rng"])
+        global_step = resume_state["global_step"]
+        start_epoch, start_batch = resume_state["epoch"], resume_state["batch_start"]
+        epoch_order = resume_state["epoch_order"]
+        running_loss, seen = resume_state["running_loss"], resume_state["seen"]
+        epoch_loss, metrics = resume_state["epoch_loss"], resume_state["metrics"]
+        _emit(events, job_id, status="running", epoch=start_epoch, resumed_from_step=global_step,
+              progress=15 + int(global_step / total_steps * 70))
+
+    checkpoint_every = config.get("checkpoint_every_steps")
+    if checkpoint_every is None:
+        checkpoint_every = CHECKPOINT_EVERY_STEPS
+    writer = None
+    if checkpoint_every > 0:
+        writer = CheckpointWriter(checkpoint_dir(model_path), config.get("keep_checkpoints") or CHECKPOINT_KEEP)
+
+    def save_checkpoint(epoch: int, batch_start: int):
+        """Queue a checkpoint of the training state before the batch at ``batch_start`` of ``epoch``"""
+        if writer is None or writer.saved_step == global_step:
+            return
+        writer.save(global_step, {
+            "model": model.state_dict(),
+            "optimizer": optimizer.state_dict(),
+            "scheduler": scheduler.state_dict(),
+            "python_rng": random.getstate(),
+            "torch_rng": torch.get_rng_state(),
+            "global_step": global_step,
+            "epoch": epoch,
+            "batch_start": batch_start,
+            "epoch_order": epoch_order,
+            "running_loss": running_loss,
+            "seen": seen,
+            "epoch_loss": epoch_loss,
+            "metrics": metrics,
+            "dataset_version": dataset_version,
+        })
+
+    resumed_step = global_step
+    run_started = time.time()
+    stopped = False
+    try:
+        for epoch in range(start_epoch, epochs):
+            if _stop_requested(stop_event):
+                save_checkpoint(epoch, start_batch)
+                stopped = True
+                break
+
+            if epoch_order is None:
+                if group_by_length:
+                    epoch_order = length_grouped_order(train_index, lengths, batch_size)
+                else:
+                    epoch_order = train_index[torch.randperm(len(train_index))]
+                running_loss, seen, start_batch = 0.0, 0, 0
+            epoch_started, epoch_first_batch = time.time(), start_batch
+            # Tokens of real examples vs. tokens the model computed, padding included
+            real_tokens, padded_tokens = 0, 0
+            for start in range(start_batch, len(epoch_order), batch_size):
+                batch, real, padded = collate(data, epoch_order[start:start + batch_size], pack)
+                real_tokens += real
+                padded_tokens += padded
+                loss = model(**batch).loss
+                loss.backward()
+                torch.nn.utils.clip_grad_norm_(params, 1.0)
+                optimizer.step()
+                scheduler.step()
+                optimizer.zero_grad()
+
+                global_step += 1
+                running_loss += loss.item()
+                seen += 1
+                if checkpoint_every and global_step % checkpoint_every == 0:
+                    save_checkpoint(epoch, start + batch_size)
+                # Checked after every optimizer step, so a stop (or a pruned sweep trial) never waits out an epoch
+                if _stop_requested(stop_event):
+                    save_checkpoint(epoch, start + batch_size)
+                    stopped = True
+                    break
+                if global_step % PROGRESS_EVERY_STEPS == 0:
+                    _emit(events, job_id, status="running", epoch=epoch,
+                          progress=15 + int(global_step / total_steps * 70), loss=round(running_loss / seen, 4),
+                          checkpoint_step=writer.latest_step if writer else None)
+            if stopped:
+                break
+
+            epoch_loss = round(running_loss / max(seen, 1), 4)
+            epoch_seconds = time.time() - epoch_started
+            update = {"status": "running", "epoch": epoch + 1, "progress": 15 + int(global_step / total_steps * 70),
+                      "loss": epoch_loss, "epoch_seconds": round(epoch_seconds, 3),
+                      "samples_per_sec": round((len(epoch_order) - epoch_first_batch) / max(epoch_seconds, 1e-9), 1),
+                      "tokens_per_sec": round(real_tokens / max(epoch_seconds, 1e-9), 1),
+                      "padding_efficiency": round(real_tokens / max(padded_tokens, 1), 4)}
+            epoch_order = None
+            if config.get("eval_every_epoch"):
+                metrics = _evaluate(model, val_data, batch_size, stop_event)
+                if metrics is None:
+                    # The epoch itself is complete, so a resume starts at the next one
+                    save_checkpoint(epoch + 1, 0)
+                    stopped = True
+                    break
+                update["val_loss"] = metrics["val_loss"]
+            _emit(events, job_id, **update)
+
+        if not stopped:
+            _emit(events, job_id, status="evaluating", progress=90)
+            if metrics is None:
+                metrics = _evaluate(model, val_data, batch_size, stop_event)
+                if metrics is None:
+                    save_checkpoint(epochs, 0)
+                    stopped = True
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if stopped:
+        # Work since the newest checkpoint on disk is lost (all of it when checkpointing is off)
+        kept_step, kept_at = resumed_step, run_started
+        if writer is not None and writer.latest_step is not None:
+            kept_step, kept_at = writer.latest_step, writer.latest_at
+        return {
+            "status": "stopped",
+            "stopped_at_step": global_step,
+            "total_steps": total_steps,
+            "discarded_steps": global_step - kept_step,
+            "discarded_seconds": round(time.time() - kept_at, 2)
+        }
+
+    _emit(events, job_id, status="saving", progress=95)
+    os.makedirs(model_path, exist_ok=True)
+    if config.get("use_adapter"):
+        save_adapter(model, os.path.join(model_path, ADAPTER_DIR), model_name, adapter_rank, adapter_alpha)
+    else:
+        model.save_pretrained(os.path.join(model_path, JOINT_DIR))
+    tokenizer.save_pretrained(model_path)
+    with open(os.path.join(model_path, "labels.json"), "w") as f:
+        json.dump({"tags": tag_names, "intents": intent_names, "max_sequence_length": max_length}, f, indent=2)
+    seen_keys = set(parent["seen_keys"] or ()) if parent else set()
+    seen_keys.update(_example_key(examples[i]) for i in train_index.tolist())
+    with open(os.path.join(model_path, SEEN_EXAMPLES_FILE), "w") as f:
+        json.dump(sorted(seen_keys), f)
+    # The saved model supersedes the checkpoints; only stopped or failed jobs resume
+    shutil.rmtree(checkpoint_dir(model_path), ignore_errors=True)
+
+    result = {
+        "status": "completed",
+        "progress": 100,
+        "model_path": model_path,
+        "final_loss": epoch_loss,
+        "metrics": metrics,
+    }
+    if warm_start is not None:
+        result["warm_start"] = warm_start
+    if config.get("use_adapter"):
+        result["trainable_parameters"] = sum(p.numel() for p in params)
+    if config.get("export_quantized") or config.get("export_onnx"):
+        _emit(events, job_id, status="saving", progress=97)
+        try:
+            result["artifacts"] = export_artifacts(model, val_data, model_path, config)
+        except Exception as e:
+            # The fp32 model is already saved; a failed export must not fail the job
+            result["artifacts"] = {"error": str(e)}
+    if config.get("distill_students"):
+        # The teacher is frozen from here on; its optimizer state is dead weight next to the students
+        del optimizer, scheduler
+        _release_memory()
+        try:
+            result.update(_distill(job_id, model, tokenizer, data, train_index, val_data, metrics,
+                                   config, model_path, events, stop_event))
+        except Exception as e:
+            # Like a failed export, a failed distillation leaves the trained model usable
+            result["students"] = {"error": str(e)}
+    return result
+
+
+def _distill(job_id: str, teacher, tokenizer, data: Dict, train_index, val_data: Dict, teacher_metrics: Dict,
+             config: Dict, model_path: str, events, stop_event) -> Dict:
+    """Distill the trained ``teacher`` into each student of ``config["distill_students"]``.
+
+    Every student is saved as a complete model directory under
+    ``students/<name>`` and compared with the teacher on the validation split.
+    A stop keeps the students finished so far; the job still completes.
+    """
+    batch_size = config.get("batch_size", 16)
+    epochs = config.get("distill_epochs") or config.get("epochs", 10)
+    temperature = config.get("distill_temperature", DEFAULT_TEMPERATURE)
+    alpha = config.get("distill_alpha", DEFAULT_ALPHA)
+    hidden_weight = config.get("distill_hidden_weight", DEFAULT_HIDDEN_WEIGHT)
+    learning_rate = config.get("distill_learning_rate") or config.get("learning_rate", 2e-5)
+
+    teacher.eval()
+    ref_tags, ref_intents, teacher_latency = timed_predictions(joint_logits(teacher), val_data, batch_size)
+    label_mask = val_data["labels"] != -100
+    students = [{
+        "name": "teacher",
+        "layers": teacher.config.num_hidden_layers,
+        "hidden_size": teacher.config.hidden_size,
+        "parameters": sum(p.numel() for p in teacher.parameters()),
+        "metrics": teacher_metrics,
+        "latency_ms": round(teacher_latency, 3),
+        "speedup": 1.0,
+        "path": model_path
+    }]
+    students_dir = os.path.join(model_path, STUDENTS_DIR)
+    stopped = False
+
+    for index, spec in enumerate(config["distill_students"]):
+        name = student_name(spec)
+        student, mapping = build_student(teacher, spec["layers"], spec.get("hidden_size"))
+        # A narrower student's hidden states are projected to the teacher's width for the hidden-state loss
+        projection = None
+        if student.config.hidden_size != teacher.config.hidden_size:
+            projection = torch.nn.Linear(student.config.hidden_size, teacher.config.hidden_size)
+        params = list(student.parameters()) + (list(projection.parameters()) if projection else [])
+        optimizer = torch.optim.AdamW(params, lr=learning_rate)
+        total_steps = math.ceil(len(train_index) / batch_size) * epochs
+        scheduler = get_linear_schedule_with_warmup(optimizer, int(0.1 * total_steps), total_steps)
+        student.train()
+
+        step = 0
+        for _ in range(epochs):
+            if config.get("group_by_length", True):
+                epoch_order = length_grouped_order(train_index, sequence_lengths(data), batch_size)
+            else:
+                epoch_order = train_index[torch.randperm(len(train_index))]
+            for start in range(0, len(epoch_order), batch_size):
+                # Dynamic padding only: distillation_loss picks real tokens with the 2D attention mask
+                batch, _, _ = collate(data, epoch_order[start:start + batch_size])
+                # no_grad rather than inference_mode: the teacher's outputs are saved as loss targets
+                with torch.no_grad():
+                    teacher_out = teacher(**batch, output_hidden_states=bool(hidden_weight))
+                student_out = student(**batch, output_hidden_states=bool(hidden_weight))
+                loss = distillation_loss(student_out, teacher_out, batch["attention_mask"], mapping, projection,
+                                         temperature, alpha, hidden_weight)
+                loss.backward()
+                torch.nn.utils.clip_grad_norm_(params, 1.0)
+                optimizer.step()
+                scheduler.step()
+                optimizer.zero_grad()
+                step += 1
+                if _stop_requested(stop_event):
+                    stopped = True
+                    break
+                if step % PROGRESS_EVERY_STEPS == 0:
+                    _emit(events, job_id, status="distilling", student=name, loss=round(loss.item(), 4),
+                          distill_progress=int((index + step / total_steps) / len(config["distill_students"]) * 100))
+            if stopped:
+                break
+        if stopped:
+            break
+
+        metrics = _evaluate(student, val_data, batch_size, stop_event)
+        if metrics is None:
+            stopped = True
+            break
+        student.eval()
+        tags, intents, latency = timed_predictions(joint_logits(student), val_data, batch_size)
+        student_path = os.path.join(students_dir, name)
+        student.save_pretrained(os.path.join(student_path, JOINT_DIR))
+        # Tokenizer and labels are the teacher's, so the student directory serves like any trained model
+        tokenizer.save_pretrained(student_path)
+        shutil.copy(os.path.join(model_path, "labels.json"), student_path)
+        students.append({
+            "name": name,
+            "layers": student.config.num_hidden_layers,
+            "hidden_size": student.config.hidden_size,
+            "parameters": sum(p.numel() for p in student.parameters()),
+            "metrics": metrics,
+            "latency_ms": round(latency, 3),
+            "speedup": round(teacher_latency / max(latency, 1e-9), 2),
+            "token_agreement": round((tags[label_mask] == ref_tags[label_mask]).float().mean().item(), 4),
+            "intent_agreement": round((intents == ref_intents).float().mean().item(), 4),
+            "path": student_path
+        })
+        _emit(events, job_id, status="distilling", students=students)
+        del student, optimizer
+        _release_memory()
+
+    if os.path.isdir(students_dir):
+        with open(os.path.join(students_dir, "students.json"), "w") as f:
+            json.dump(students, f, indent=2)
+    result = {"students": students}
+    if stopped:
+        result["distillation_stopped"] = True
+    return result
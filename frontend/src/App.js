@@ -41,43 +41,45 @@ function App() {
       return;
     }
 
-    try {
-      const result = await api.analyzeProblem(problemStatement, selectedLLM);
-      console.log('Analysis result:', result);
-      
-      // Validate response structure
-      if (!result || !result.domain || !result.questions) {
-        console.error('Invalid response structure:', result);
-        alert('Invalid response from server. Please check console for details.');
-        return;
+    // Handle both string and object question formats
+    const toQuestion = (q) => {
+      if (typeof q === 'string') {
+        return { question: q, answer: '' };
+      } else if (q && typeof q === 'object') {
+        return { question: q.question || q.text || '', answer: q.answer || '' };
       }
-      
-      // Ensure questions is an array
-      const questionsArray = Array.isArray(result.questions) 
-        ? result.questions 
-        : [];
-      
-      setDomain(result.domain);
-      setQuestions(questionsArray.map(q => {
-        // Handle both string and object formats
-        if (typeof q === 'string') {
-          return { question: q, answer: '' };
-        } else if (q && typeof q === 'object') {
-          return { question: q.question || q.text || '', answer: q.answer || '' };
+      return { question: String(q), answer: '' };
+    };
+
+    try {
+      // Show the analysis step as soon as the first question arrives
+      setDomain('');
+      setQuestions([]);
+      await api.streamAnalyzeProblem(
+        problemStatement,
+        selectedLLM,
+        (event, data) => {
+          if (event === 'domain') {
+            setDomain(data);
+          } else if (event === 'questions') {
+            setQuestions(prev => [...prev, toQuestion(data)]);
+            setCurrentStep(2);
+          } else if (event === 'done') {
+            console.log('Analysis result:', data.result);
+            // Malformed model output is replaced by the server-side defaults
+            if (data.fallback) {
+              setDomain(data.result.domain);
+              setQuestions((Array.isArray(data.result.questions) ? data.result.questions : []).map(toQuestion));
+            }
+            setCurrentStep(2);
+          } else if (event === 'error') {
+            throw new Error(data.detail);
+          }
         }
-        return { question: String(q), answer: '' };
-      }));
-      setCurrentStep(2);
+      );
     } catch (error) {
       console.error('Analysis failed:', error);
-      console.error('Error details:', {
-        message: error.message,
-        response: error.response?.data,
-        status: error.response?.status,
-        config: error.config
-      });
-      const errorMsg = error.response?.data?.detail || error.message || 'Unknown error';
-      alert(`Failed to analyze problem: ${errorMsg}. Please check console for details.`);
+      alert(`Failed to analyze problem: ${error.message || 'Unknown error'}. Please check console for details.`);
     }
   };
 
@@ -89,15 +91,33 @@ function App() {
     }
 
     try {
-      const result = await api.generateEntitiesIntents(
+      // Show the refinement step as soon as the first entity or intent arrives
+      setEntities([]);
+      setIntents([]);
+      await api.streamEntitiesIntents(
         problemStatement,
         domain,
         questions,
-        selectedLLM
+        selectedLLM,
+        (event, data) => {
+          if (event === 'entities') {
+            setEntities(prev => [...prev, data]);
+            setCurrentStep(3);
+          } else if (event === 'intents') {
+            setIntents(prev => [...prev, data]);
+            setCurrentStep(3);
+          } else if (event === 'done') {
+            // Malformed model output is replaced by the server-side defaults
+            if (data.fallback) {
+              setEntities(data.result.entities);
+              setIntents(data.result.intents);
+            }
+            setCurrentStep(3);
+          } else if (event === 'error') {
+            throw new Error(data.detail);
+          }
+        }
       );
-      setEntities(result.entities);
-      setIntents(result.intents);
-      setCurrentStep(3);
     } catch (error) {
       console.error('Generation failed:', error);
       alert('Failed to generate entities and intents. Please try again.');
@@ -116,21 +136,8 @@ function App() {
         config
       });
       
-      // Poll for training status
-      const jobId = result.job_id;
-      const interval = setInterval(async () => {
-        try {
-          const status = await api.getTrainingStatus(jobId);
-          if (status.status === 'completed' || status.status === 'failed') {
-            clearInterval(interval);
-          }
-        } catch (error) {
-          console.error('Failed to get training status:', error);
-          clearInterval(interval);
-        }
-      }, 2000);
-      
-      return jobId;
+      // Progress is streamed to TrainingSection
+      return result.job_id;
     } catch (error) {
       console.error('Training failed:', error);
       alert('Failed to start training. Please try again.');
@@ -17,43 +17,29 @@ function TrainingSection({ onBack, onStartTraining }) {
   const [allJobs, setAllJobs] = useState(null);
 
   useEffect(() => {
-    // Fetch all jobs periodically
-    const jobsInterval = setInterval(async () => {
-      try {
-        const jobs = await api.getAllTrainingJobs();
-        setAllJobs(jobs);
-      } catch (error) {
-        console.error('Failed to get all jobs:', error);
-      }
-    }, 3000);
-
-    if (jobId) {
-      const interval = setInterval(async () => {
-        try {
-          const status = await api.getTrainingStatus(jobId);
-          setTrainingStatus(status);
-          if (status.status === 'completed' || status.status === 'failed' || status.status === 'stopped') {
-            clearInterval(interval);
-          }
-        } catch (error) {
-          console.error('Failed to get training status:', error);
-          clearInterval(interval);
-        }
-      }, 2000);
-      return () => {
-        clearInterval(interval);
-        clearInterval(jobsInterval);
-      };
-    }
+    // Job counters are pushed by the server whenever a job changes status
+    return api.subscribeTrainingJobs((counters) => {
+      setAllJobs(prev => ({ ...prev, ...counters }));
+    });
+  }, []);
 
-    return () => clearInterval(jobsInterval);
+  useEffect(() => {
+    if (!jobId) return undefined;
+
+    const unsubscribe = api.subscribeTrainingStatus(jobId, (update) => {
+      setTrainingStatus(prev => ({ ...prev, ...update }));
+      if (update.status === 'completed' || update.status === 'failed' || update.status === 'stopped') {
+        unsubscribe();
+      }
+    });
+    return unsubscribe;
   }, [jobId]);
 
   const handleStartTraining = async () => {
     try {
       const result = await onStartTraining(config);
       setJobId(result);
-      setTrainingStatus({ status: 'running', progress: 0 });
+      setTrainingStatus({ status: 'queued', progress: 0 });
     } catch (error) {
       console.error('Training failed:', error);
       alert('Failed to start training. Please try again.');
@@ -150,6 +136,9 @@ function TrainingSection({ onBack, onStartTraining }) {
             <span style={{ color: allJobs.running_jobs > 0 ? '#ff9800' : '#666' }}>
               Running: <strong>{allJobs.running_jobs}</strong>
             </span>
+            {allJobs.queued_jobs > 0 && (
+              <span style={{ color: '#2196f3' }}>Queued: <strong>{allJobs.queued_jobs}</strong></span>
+            )}
             <span style={{ color: '#4caf50' }}>Completed: <strong>{allJobs.completed_jobs}</strong></span>
             <span style={{ color: '#f44336' }}>Failed: <strong>{allJobs.failed_jobs}</strong></span>
             <span style={{ color: '#9e9e9e' }}>Stopped: <strong>{allJobs.stopped_jobs}</strong></span>
@@ -162,11 +151,11 @@ function TrainingSection({ onBack, onStartTraining }) {
         <button 
           className="btn btn-primary" 
           onClick={handleStartTraining} 
-          disabled={trainingStatus?.status === 'running' || trainingStatus?.status === 'initializing' || trainingStatus?.status === 'preparing_data'}
+          disabled={trainingStatus?.status === 'stopping' || trainingStatus?.status === 'queued' || trainingStatus?.status === 'running' || trainingStatus?.status === 'initializing' || trainingStatus?.status === 'preparing_data'}
         >
           Start Training 🚀
         </button>
-        {trainingStatus && (trainingStatus.status === 'running' || trainingStatus.status === 'initializing' || trainingStatus.status === 'preparing_data') && (
+        {trainingStatus && (trainingStatus.status === 'queued' || trainingStatus.status === 'running' || trainingStatus.status === 'initializing' || trainingStatus.status === 'preparing_data') && (
           <button 
             className="btn" 
             onClick={handleStopTraining}
@@ -186,11 +175,16 @@ function TrainingSection({ onBack, onStartTraining }) {
             </div>
           </div>
           <div style={{ marginTop: '15px', color: '#666' }}>
+            {trainingStatus.status === 'queued' &&
+              `Queued${trainingStatus.queue_position ? ` — position ${trainingStatus.queue_position}` : ''}${trainingStatus.eta_seconds != null ? `, starts in ~${Math.round(trainingStatus.eta_seconds)}s` : ''}`}
             {(trainingStatus.status === 'running' || trainingStatus.status === 'initializing' || trainingStatus.status === 'preparing_data') && 
               `Epoch ${trainingStatus.epoch || 0}/${trainingStatus.total_epochs || config.epochs}`}
             {trainingStatus.status === 'completed' && '✓ Training completed successfully!'}
             {trainingStatus.status === 'failed' && `✗ Training failed: ${trainingStatus.error || 'Unknown error'}`}
+            {trainingStatus.status === 'stopping' && '⏳ Stopping after the current step...'}
             {trainingStatus.status === 'stopped' && '⏹ Training stopped by user'}
+            {trainingStatus.status === 'stopped' && trainingStatus.discarded_steps > 0 &&
+              ` (${trainingStatus.discarded_steps} steps since the last checkpoint discarded)`}
             {trainingStatus.loss && ` Loss: ${trainingStatus.loss.toFixed(4)}`}
           </div>
         </div>
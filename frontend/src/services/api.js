@@ -45,6 +45,60 @@ export const api = {
     return response.data;
   },
 
+  // POSTs to a streaming endpoint and calls onEvent(event, data) for every Server-Sent Event
+  async streamEvents(path, body, onEvent) {
+    const response = await fetch(`${API_URL}${path}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body)
+    });
+    if (!response.ok) {
+      throw new Error(`Server error: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const message = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = 'message';
+        let data = '';
+        message.split('\n').forEach(line => {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        if (data) onEvent(event, JSON.parse(data));
+      }
+    }
+  },
+
+  // Emits 'domain', one 'questions' event per question, then 'done' with the full result
+  streamAnalyzeProblem(problem, llmProvider, onEvent) {
+    return this.streamEvents('/api/analyze-problem/stream', {
+      problem,
+      llm_provider: llmProvider
+    }, onEvent);
+  },
+
+  // Emits one 'entities' / 'intents' event per item, then 'done' with the full result
+  streamEntitiesIntents(problem, domain, questions, llmProvider, onEvent) {
+    return this.streamEvents('/api/generate-entities-intents/stream', {
+      problem,
+      domain,
+      questions: questions.map(q => ({
+        question: q.question,
+        answer: q.answer
+      })),
+      llm_provider: llmProvider
+    }, onEvent);
+  },
+
   async startTraining(data) {
     const response = await axios.post(`${API_URL}/api/start-training`, data);
     return response.data;
@@ -68,6 +122,22 @@ export const api = {
   async getAllTrainingJobs() {
     const response = await axios.get(`${API_URL}/api/training-jobs`);
     return response.data;
+  },
+
+  // Server-Sent Events: the first message is a snapshot, later ones only carry changed fields.
+  // Both return a function that closes the stream.
+  subscribeTrainingStatus(jobId, onUpdate) {
+    const source = new EventSource(`${API_URL}/api/training-events/${jobId}`);
+    source.onmessage = (event) => onUpdate(JSON.parse(event.data));
+    source.onerror = (error) => console.error('Training status stream error:', error);
+    return () => source.close();
+  },
+
+  subscribeTrainingJobs(onUpdate) {
+    const source = new EventSource(`${API_URL}/api/training-jobs/events`);
+    source.onmessage = (event) => onUpdate(JSON.parse(event.data));
+    source.onerror = (error) => console.error('Training jobs stream error:', error);
+    return () => source.close();
   }
 };
 